@@ -1,24 +1,22 @@
+import logging
 import os
 from typing import Dict, Optional
-import requests
-from pydantic import BaseModel  # if using structured data validation
-
-# For local NLP/LLM inference
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
-
-# For OpenAI API or similar LLM services
-import openai
 
 # For environment variables
 from dotenv import load_dotenv
 
+from intent_matcher import IntentMatcher
+
+# transformers (local NLP/LLM inference) and openai (LLM services) are imported where they are
+# used, so importing this module does not pay for them
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 from typing import Dict, Optional
 
 ## LLM/LLM.py
 
+logger = logging.getLogger(__name__)
+
 # Define intents and expected entities
 INTENTS = {
     "create_pool": ["token1", "token2", "apy"],
@@ -37,30 +35,41 @@ FEW_SHOT_EXAMPLES = [
     {"user_input": "Help me with DeFi basics", "intent": "general_help", "entities": {}}
 ]
 
+# Naive keyword matching fallback for demo purposes, checked in order
+KEYWORD_RULES = [
+    ("create_pool", ["create pool", "liquidity pool"]),
+    ("create_token", ["create token", "launch token"]),
+    ("join_pool", ["join pool"]),
+    ("general_help", ["help"]),
+]
+
+# Compiled once; call rebuild_intent_matcher() after editing FEW_SHOT_EXAMPLES or KEYWORD_RULES
+intent_matcher = IntentMatcher(FEW_SHOT_EXAMPLES, KEYWORD_RULES)
+
+def rebuild_intent_matcher() -> IntentMatcher:
+    global intent_matcher
+    intent_matcher = IntentMatcher(FEW_SHOT_EXAMPLES, KEYWORD_RULES)
+    return intent_matcher
+
 def recognize_intent(user_text: str) -> Dict[str, Optional[Dict]]:
     # Placeholder function that simulates LLM-driven intent recognition
     # In production, replace with actual LLM call or API integration
-    
-    user_text_lower = user_text.lower()
-
-    for example in FEW_SHOT_EXAMPLES:
-        if example["user_input"].lower() in user_text_lower or all(
-            token.lower() in user_text_lower for token in example["user_input"].split()
-        ):
-            return {"intent": example["intent"], "entities": example["entities"]}
-    
-    # Naive keyword matching fallback for demo purposes
-    if "create pool" in user_text_lower or "liquidity pool" in user_text_lower:
-        # Extract tokens and apy with regex or NLP (to be developed)
+    match = intent_matcher.match(user_text)
+    if match is None:
+        return {"intent": None, "entities": {}}
+
+    intent, entities = match
+    if entities is not None:
+        # Few-shot example hit
+        return {"intent": intent, "entities": entities}
+    # Keyword hit: extract tokens and apy etc. with regex or NLP (to be developed)
+    if intent == "create_pool":
         return {"intent": "create_pool", "entities": extract_pool_entities(user_text)}
-    if "create token" in user_text_lower or "launch token" in user_text_lower:
+    if intent == "create_token":
         return {"intent": "create_token", "entities": extract_token_entities(user_text)}
-    if "join pool" in user_text_lower:
+    if intent == "join_pool":
         return {"intent": "join_pool", "entities": extract_join_pool_entities(user_text)}
-    if "help" in user_text_lower:
-        return {"intent": "general_help", "entities": {}}
-    
-    return {"intent": None, "entities": {}}
+    return {"intent": intent, "entities": {}}
 
 # Placeholder extractors to be replaced with proper NLP/entity extraction
 def extract_pool_entities(text: str) -> Dict:
@@ -118,14 +127,10 @@ REQUIRED_PARAMS = {
     "create_token": ["token_name", "supply"]
 }
 
-# Simple dialog state to track incomplete intents and collected entities per user session
-class DialogState:
-    def __init__(self):
-        self.current_intent = None
-        self.collected_entities = {}
-        self.waiting_for = None  # Which entity we are waiting for
+from session_store import DEFAULT_SESSION_ID, DialogState, SessionStore
 
-dialog_state = DialogState()
+# Simple dialog state to track incomplete intents and collected entities per user session
+session_store = SessionStore()
 
 def extract_entities(text: str) -> Dict:
     """
@@ -151,9 +156,7 @@ def generate_parameter_prompt(param_name: str) -> str:
     }
     return prompts.get(param_name, f"Please provide {param_name}.")
 
-def handle_multiturn_dialog(user_input: str) -> str:
-    global dialog_state
-
+def _multiturn_dialog(dialog_state: DialogState, user_input: str) -> str:
     if dialog_state.current_intent is None:
         # Start new intent recognition
         intent_info = recognize_intent(user_input)
@@ -195,6 +198,12 @@ def handle_multiturn_dialog(user_input: str) -> str:
             dialog_state.waiting_for = None
             return confirm_intent_action(intent, entities)
 
+def handle_multiturn_dialog(user_input: str, session_id: str = DEFAULT_SESSION_ID) -> str:
+    dialog_state = session_store.get(session_id)
+    response = _multiturn_dialog(dialog_state, user_input)
+    session_store.save(session_id, dialog_state)
+    return response
+
 def confirm_intent_action(intent: str, entities: Dict) -> str:
     if intent == "create_pool":
         return f"Creating liquidity pool for {entities['token1']} and {entities['token2']} with {entities['apy']}% APY. Confirm? (yes/no)"
@@ -216,31 +225,31 @@ def process_confirmation_response(user_input: str) -> Tuple[bool, str]:
     else:
         return None, "Please reply with 'yes' or 'no' to confirm or cancel."
 
-# To handle confirmation after prompt
-awaiting_confirmation = False
-
-def conversation_manager(user_input: str) -> str:
-    global awaiting_confirmation, dialog_state
-
-    if awaiting_confirmation:
+def _conversation_turn(dialog_state: DialogState, user_input: str) -> str:
+    if dialog_state.awaiting_confirmation:
         confirmed, msg = process_confirmation_response(user_input)
         if confirmed is True:
-            awaiting_confirmation = False
+            dialog_state.awaiting_confirmation = False
             # Here, call to backend contract deployment or further processing would happen
             return msg + " (This is where we'll integrate Web3 actions.)"
         elif confirmed is False:
-            awaiting_confirmation = False
-            dialog_state = DialogState()  # Reset dialog state on cancel
+            dialog_state.reset()  # Reset dialog state on cancel
             return msg
         else:
             return msg  # Invalid confirmation answer
 
     else:
-        response = handle_multiturn_dialog(user_input)
+        response = _multiturn_dialog(dialog_state, user_input)
         if response.lower().startswith("creating liquidity pool") or response.lower().startswith("creating token"):
-            awaiting_confirmation = True
+            dialog_state.awaiting_confirmation = True
         return response
 
+def conversation_manager(user_input: str, session_id: str = DEFAULT_SESSION_ID) -> str:
+    dialog_state = session_store.get(session_id)
+    response = _conversation_turn(dialog_state, user_input)
+    session_store.save(session_id, dialog_state)
+    return response
+
 
 # Example interactive loop (for local testing)
 if __name__ == "__main__":
@@ -253,31 +262,32 @@ if __name__ == "__main__":
 
 ## STEP
 
-import re
+import entity_extractor
 
+# One compiled scan finds every entity; these redefinitions replace the placeholders above
 def extract_pool_entities(text: str) -> Dict:
-    tokens = re.findall(r'\b[A-Z]{2,5}\b', text)
-    apy_match = re.search(r'(\d+)%', text)
-    return {
-        "token1": tokens[0] if len(tokens) > 0 else None,
-        "token2": tokens[1] if len(tokens) > 1 else None,
-        "apy": apy_match.group(1) if apy_match else None
-    }
+    return entity_extractor.extract(text).pool_entities()
 
 def extract_token_entities(text: str) -> Dict:
-    token_name_match = re.search(r'named (\w+)', text)
-    supply_match = re.search(r'supply of (\d+)', text)
-    return {
-        "token_name": token_name_match.group(1) if token_name_match else None,
-        "supply": supply_match.group(1) if supply_match else None
-    }
+    return entity_extractor.extract(text).token_entities()
+
+def extract_join_pool_entities(text: str) -> Dict:
+    return entity_extractor.extract(text).join_pool_entities()
 
 
 ## END OF STEP
 
-import openai
+_api_client = None
 
 def recognize_intent_with_api(user_text: str) -> Dict:
+    """
+    LLM intent recognition through the shared pooled transport (timeouts, retries,
+    circuit breaker). Falls back to the local recognize_intent when the API is unavailable.
+    """
+    global _api_client
+    import json
+    from llm_transport import CircuitOpenError, create_openai_client, default_transport
+
     prompt = f"""
 You are a helpful AI that extracts user intent and entities for DeFi actions.
 User input: "{user_text}"
@@ -291,17 +301,32 @@ Respond with JSON containing:
 }}
 """
 
-    response = openai.ChatCompletion.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=150,
-        temperature=0
-    )
+    try:
+        import httpx
+        from openai import OpenAIError
+    except ImportError as e:
+        logger.warning("OpenAI SDK not installed, using local recognizer: %s", e)
+        return recognize_intent(user_text)
+
+    try:
+        if _api_client is None:
+            _api_client = create_openai_client(os.getenv("OPENAI_API_KEY"))
+        response = default_transport.call(lambda: _api_client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=150,
+            temperature=0
+        ))
+    except CircuitOpenError:
+        return recognize_intent(user_text)
+    except (OpenAIError, httpx.HTTPError) as e:
+        # Only SDK and transport failures mean the API is unavailable; anything else is a bug
+        logger.warning("LLM API error, using local recognizer: %s", e)
+        return recognize_intent(user_text)
     # Parse JSON from response. Assuming LLM returns JSON string.
-    import json
     try:
         parsed = json.loads(response.choices[0].message.content)
         return parsed
-    except Exception as e:
-        print("Error parsing LLM response:", e)
+    except (ValueError, TypeError, IndexError) as e:
+        logger.warning("Error parsing LLM response: %s", e)
         return {"intent": None, "entities": {}}
@@ -1,5 +1,9 @@
 import re
-from typing import Dict, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
+
+import entity_extractor
+from entity_extractor import use_registry
+from session_store import DEFAULT_SESSION_ID, DialogState, SessionStore
 
 # Define intents and expected entities
 INTENTS = {
@@ -24,72 +28,182 @@ REQUIRED_PARAMS = {
     "create_token": ["token_name", "supply"]
 }
 
-# Dialog State to handle multi-turn conversations
-class DialogState:
-    def __init__(self):
-        self.current_intent = None
-        self.collected_entities = {}
-        self.waiting_for = None  # entity name we expect next
-
-dialog_state = DialogState()
-awaiting_confirmation = False
+# Dialog state lives per session; pass SessionStore(SQLiteSessionBackend(path)) to persist it
+session_store = SessionStore()
 
+# All entity patterns are compiled into one scanner (entity_extractor.extract); these
+# per-intent views keep the original extractor signatures
 def extract_pool_entities(text: str) -> Dict:
-    tokens = re.findall(r'\b[A-Z]{2,5}\b', text)
-    apy_match = re.search(r'(\d+)%', text)
-    return {
-        "token1": tokens[0] if len(tokens) > 0 else None,
-        "token2": tokens[1] if len(tokens) > 1 else None,
-        "apy": apy_match.group(1) if apy_match else None
-    }
+    return entity_extractor.extract(text).pool_entities()
 
 def extract_token_entities(text: str) -> Dict:
-    token_name_match = re.search(r'named (\w+)', text)
-    supply_match = re.search(r'supply of (\d+)', text)
-    return {
-        "token_name": token_name_match.group(1) if token_name_match else None,
-        "supply": supply_match.group(1) if supply_match else None
-    }
+    return entity_extractor.extract(text).token_entities()
 
 def extract_join_pool_entities(text: str) -> Dict:
-    pool_id_match = re.search(r'pool (\d+)', text)
-    return {
-        "pool_id": pool_id_match.group(1) if pool_id_match else None
-    }
+    return entity_extractor.extract(text).join_pool_entities()
+
+def extract_query_entities(text: str) -> Dict:
+    return entity_extractor.extract(text).query_entities()
+
+# Local keyword stage of the recognizer cascade, checked in order
+LOCAL_INTENT_PATTERNS = [
+    ("join_pool", re.compile(r'\bjoin\b.*\bpool\b', re.IGNORECASE)),
+    ("create_pool", re.compile(r'\b(create|make|open|start)\b.*\bpool\b|\bliquidity pool\b', re.IGNORECASE)),
+    ("create_token", re.compile(r'\b(create|launch|mint|deploy)\b.*\btoken\b', re.IGNORECASE)),
+    ("query_info", re.compile(r'\b(status|info|details)\b.*\b(token|pool)\b', re.IGNORECASE)),
+    ("general_help", re.compile(r'\bhelp\b', re.IGNORECASE)),
+]
+
+# Every number in the text, with its separators ("3,5", "1,000,000") and a trailing %
+_NUMBER = re.compile(r'(?<![\w.,])\d+(?:[.,]\d+)*%?')
+
+def _unconsumed_number(user_text: str, extraction, names) -> bool:
+    """True if some number in the text isn't wholly inside one of the given entities' spans."""
+    spans = [(span.start, span.end) for span in extraction.spans if span.name in names]
+    for match in _NUMBER.finditer(user_text):
+        end = match.end() - match.group().endswith("%")
+        if not any(start <= match.start() and end <= stop for start, stop in spans):
+            return True
+    return False
+
+def recognize_intent_local(user_text: str) -> Tuple[dict, float]:
+    """
+    Keyword + regex recognition without a model call. Returns (result, confidence):
+    a single unambiguous keyword hit scores 0.95, several competing hits 0.5, and the
+    score is scaled by the fraction of the intent's entities that were extracted. A number
+    the extractor only partly read ("3,5%" as 5) or didn't use keeps the turn below the
+    local threshold, so the LLM decides.
+    """
+    matched = [intent for intent, pattern in LOCAL_INTENT_PATTERNS if pattern.search(user_text)]
+    if not matched:
+        return {"intent": None, "entities": {}}, 0.0
+
+    intent = matched[0]
+    extraction = entity_extractor.extract(user_text)
+    entities = extraction.for_intent(intent)
+    confidence = 0.95 if len(matched) == 1 else 0.5
+    expected = INTENTS.get(intent, [])
+    if expected:
+        confidence *= sum(1 for name in expected if entities.get(name)) / len(expected)
+        if _unconsumed_number(user_text, extraction, entities):
+            confidence = min(confidence, 0.5)
+    if intent == "create_pool" and entities.get("token1"):
+        tokens = (entities["token1"], entities.get("token2"))
+        # A pool of a token with itself means one of them was misread; with a registry, an unknown
+        # all-caps word is as likely shouting ("WITH") as a new ticker, so the LLM decides both
+        if tokens[0] == tokens[1] or (token_registry is not None and
+                                      any(token and token not in token_registry.tokens for token in tokens)):
+            confidence = min(confidence, 0.5)
+    return {"intent": intent, "entities": entities}, confidence
 
 import os
-import openai
 import json
+import time
+import contextvars
+import threading
 from dotenv import load_dotenv
 
 # Load environment variables from .env
 
 load_dotenv()  # loads .env file variables
-print(os.environ.get("OPENAI_API_KEY"))
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise ValueError("OPENAI_API_KEY missing. Please add it to .env or environment variables")
 
+import instrumentation
+from conversation_context import ConversationContext
+from intent_cache import IntentCache, normalize_text
+from llm_transport import CircuitOpenError, create_async_openai_client, create_openai_client, default_transport
+from rate_limiter import HIGH, NORMAL, RateLimitShed, estimate_tokens, rate_limiter_from_env
+from single_flight import SingleFlight
+from stream_parser import StreamingJSONParser
+from token_registry import DEFAULT_PATH as DEFAULT_REGISTRY_PATH, load_registry
 
+# Known token symbols/names (token_registry.json) so "Ethereum" or "USCD" resolve locally, and
+# lowercase "usdc" too when it answers a token prompt
+TOKEN_REGISTRY_ENABLED = os.getenv("TOKEN_REGISTRY_ENABLED", "1").lower() not in ("0", "false", "no")
+TOKEN_REGISTRY_PATH = os.getenv("TOKEN_REGISTRY_PATH", DEFAULT_REGISTRY_PATH)
+token_registry = load_registry(TOKEN_REGISTRY_PATH) if TOKEN_REGISTRY_ENABLED else None
+use_registry(token_registry)
+TOKEN_PARAMS = ("token1", "token2")
 
-import json
-from openai import OpenAI
-from openai import OpenAIError
-client = OpenAI(api_key=api_key)
-# Initialize the client once (put this near your main setup code)
-client = OpenAI()
+# Heavy dependencies (openai/httpx, asyncio) load on first use so importing this module stays cheap.
+# Tests and benchmarks may assign their own clients to these before the first call.
+client = None
+async_client = None
 
-def recognize_intent(user_text: str) -> dict:
-    """
-    Calls OpenAI GPT to extract intent and entities from user input.
-    """
-    prompt = f"""
-You are a helpful AI assistant specialized in understanding DeFi user intents and extracting entities.
-User input: \"{user_text}\"
-Reply ONLY with a JSON object with fields:
-{{
+def _require_api_key() -> str:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY missing. Please add it to .env or environment variables")
+    return api_key
+
+def get_client():
+    """Initialize the client once, on the first sync OpenAI call."""
+    global client
+    if client is None:
+        client = create_openai_client(_require_api_key())
+    return client
+
+def get_async_client():
+    """Async client for conversation_manager_async; one event loop can multiplex many sessions on it."""
+    global async_client
+    if async_client is None:
+        async_client = create_async_openai_client(_require_api_key())
+    return async_client
+
+class _NoOpenAIError(Exception):
+    """Stands in for openai.OpenAIError when the SDK isn't installed (fake clients); never raised."""
+
+_openai_error_class = None
+
+def _openai_error():
+    # Resolved once, on first use, so importing LLM1 doesn't import the SDK; without it an except
+    # clause naming OpenAIError would raise ImportError in place of the exception being handled
+    global _openai_error_class
+    if _openai_error_class is None:
+        try:
+            from openai import OpenAIError
+        except ImportError:
+            OpenAIError = _NoOpenAIError
+        _openai_error_class = OpenAIError
+    return _openai_error_class
+
+# Retries, hedging and the circuit breaker for every OpenAI call (see llm_transport.py)
+transport = default_transport
+
+INTENT_MODEL = "gpt-4o-mini"
+# Bump whenever the recognize_intent prompt changes so stale cached answers are not reused
+PROMPT_VERSION = "v1"
+
+# temperature=0 makes answers deterministic, so repeats ("help", "join pool 12345") can skip the API call
+intent_cache = IntentCache(
+    maxsize=int(os.getenv("INTENT_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("INTENT_CACHE_TTL", "600")),
+    enabled=os.getenv("INTENT_CACHE_ENABLED", "1").lower() not in ("0", "false", "no"),
+)
+
+# Conversation context for the LLM (conversation_context.py): recent turns of the session,
+# trimmed to CONTEXT_TOKEN_BUDGET, with older ones folded into an entity summary
+CONVERSATION_CONTEXT_ENABLED = os.getenv("CONVERSATION_CONTEXT_ENABLED", "0").lower() in ("1", "true", "yes")
+CONTEXT_MAX_TURNS = int(os.getenv("CONTEXT_MAX_TURNS", "6"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "120"))
+CONTEXT_INSTRUCTION = ("If the user input changes or refers to an earlier request (\"make it 9% instead\"), reply with "
+                       "that request's intent and its entities, updated.")
+
+# Identical messages arriving while their first copy is still upstream wait for that call
+# instead of making their own (same key as the intent cache)
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "1").lower() not in ("0", "false", "no")
+
+# Client-side RPM/TPM budgets (LLM_RPM_LIMIT, LLM_TPM_LIMIT); None when neither is set.
+# Turns from sessions already in a conversation queue ahead of brand-new ones
+rate_limiter = rate_limiter_from_env()
+_llm_priority = contextvars.ContextVar("llm_priority", default=NORMAL)
+
+# Upper bound on in-flight async OpenAI calls per process (0 = unlimited)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "0"))
+_llm_semaphore = None
+
+INTENT_JSON_FIELDS = """{
   "intent": one of ["create_pool", "create_token", "join_pool", "query_info", "general_help", null],
-  "entities": {{
+  "entities": {
     "token1": string or null,
     "token2": string or null,
     "apy": string or null,
@@ -98,28 +212,632 @@ Reply ONLY with a JSON object with fields:
     "pool_id": string or null,
     "entity_type": string or null,
     "entity_id": string or null
-  }}
-}}
+  }
+}"""
+
+# Micro-batching: wait up to INTENT_BATCH_WAIT_MS to group concurrent turns into one request (0 = off)
+INTENT_BATCH_WAIT_MS = float(os.getenv("INTENT_BATCH_WAIT_MS", "0"))
+INTENT_BATCH_MAX = int(os.getenv("INTENT_BATCH_MAX", "16"))
+_intent_batcher = None
+_intent_batcher_lock = threading.Lock()  # concurrent first turns would each start a batcher
+
+# Local-first cascade: turns the keyword stage scores at or above this never leave the process
+LOCAL_CASCADE_ENABLED = os.getenv("LOCAL_CASCADE_ENABLED", "1").lower() not in ("0", "false", "no")
+LOCAL_MIN_CONFIDENCE = float(os.getenv("LOCAL_MIN_CONFIDENCE", "0.8"))
+cascade_stats = {"local": 0, "escalated": 0, "fallback": 0}
+
+# Stream dialog-turn completions and stop reading once the intent's entities are in
+INTENT_STREAMING_ENABLED = os.getenv("INTENT_STREAMING_ENABLED", "0").lower() in ("1", "true", "yes")
+
+# Compact structured output: schema-constrained JSON with short keys and null entities omitted
+INTENT_COMPACT_OUTPUT = os.getenv("INTENT_COMPACT_OUTPUT", "0").lower() in ("1", "true", "yes")
+COMPACT_PROMPT_VERSION = "c1"
+COMPACT_ENTITY_KEYS = {
+    "t1": "token1", "t2": "token2", "apy": "apy", "n": "token_name",
+    "s": "supply", "p": "pool_id", "et": "entity_type", "eid": "entity_id",
+}
+# Never formatted: the user text goes in its own message after it, so every call shares
+# this exact prefix and upstream prompt caching can reuse it
+COMPACT_SYSTEM_PROMPT = (
+    "Classify the user's DeFi request. Reply with JSON {\"i\": intent, \"e\": entities}. "
+    "intent: create_pool, create_token, join_pool, query_info, general_help or null. "
+    "entities: t1, t2 = token symbols; apy = APY number; n = token name; s = token supply; "
+    "p = pool id; et = entity type (pool or token); eid = entity id. "
+    "Copy values from the text as strings. Omit entities the text does not give."
+)
+COMPACT_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "intent_compact",
+        "strict": False,  # strict mode would force every key to be present, nulls included
+        "schema": {
+            "type": "object",
+            "properties": {
+                "i": {"type": ["string", "null"], "enum": list(INTENTS) + [None]},
+                "e": {
+                    "type": "object",
+                    "properties": {key: {"type": "string"} for key in COMPACT_ENTITY_KEYS},
+                    "additionalProperties": False,
+                },
+            },
+            "required": ["i"],
+            "additionalProperties": False,
+        },
+    },
+}
+# Completion budget for the intent the local stage guesses; a truncated reply is retried at the cap
+COMPACT_MAX_TOKENS = {"general_help": 12, "join_pool": 24, "query_info": 32, "create_token": 40, "create_pool": 40}
+COMPACT_MAX_TOKENS_CAP = 64
+
+# Similarity cache behind the exact one: paraphrases reuse a stored intent (see semantic_cache.py)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "0").lower() in ("1", "true", "yes")
+# "transformer" is opt-in until its threshold has been measured (`bench_semantic_cache.py transformer`)
+SEMANTIC_CACHE_EMBEDDER = os.getenv("SEMANTIC_CACHE_EMBEDDER", "hashing")
+# Cosine similarity needed for a hit; the scales differ per embedder. 0.65 is the lowest with no
+# wrong intents in bench_semantic_cache.py for the hashing embedder (43% hits there); 0.92 for the
+# transformer is a placeholder
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD",
+                                           "0.65" if SEMANTIC_CACHE_EMBEDDER == "hashing" else "0.92"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "4096"))
+_semantic_cache = None
+
+# On-box seq2seq recognizer (local_intent_model.py): answers the turns the keyword stage
+# escalates, in dynamic batches, instead of OpenAI
+LOCAL_MODEL_ENABLED = os.getenv("LOCAL_MODEL_ENABLED", "0").lower() in ("1", "true", "yes")
+LOCAL_MODEL_BATCH_MAX = int(os.getenv("LOCAL_MODEL_BATCH_MAX", "32"))
+LOCAL_MODEL_BATCH_WAIT_MS = float(os.getenv("LOCAL_MODEL_BATCH_WAIT_MS", "5"))
+_local_model = None
+_local_model_batcher = None
+# Concurrent first turns would each build the model (and race transformers' lazy imports)
+_local_model_lock = threading.RLock()
+
+# Append-only turn log (turn_log.py), off while TURN_LOG_PATH is empty. Fields of the turn in
+# progress are collected in a context variable, so threads and asyncio tasks each get their own
+TURN_LOG_PATH = os.getenv("TURN_LOG_PATH", "")
+TURN_LOG_MAX_BYTES = int(os.getenv("TURN_LOG_MAX_BYTES", str(64 * 1024 * 1024)))
+TURN_LOG_BACKUPS = int(os.getenv("TURN_LOG_BACKUPS", "5"))
+_turn_log = None
+_turn_record = contextvars.ContextVar("turn_record", default=None)
+
+def _copy_intent_result(result: dict) -> dict:
+    # Callers mutate the entities dict while slot filling, so never hand out the cached object
+    return {"intent": result.get("intent"), "entities": dict(result.get("entities") or {})}
+
+def get_semantic_cache():
+    """
+    Builds the similarity cache on first use. If numpy/transformers are missing or the
+    embedding model can't be loaded (no Hugging Face access, corrupt cache), the cache is
+    disabled for the life of the process and turns go on to the LLM.
+    """
+    global _semantic_cache, SEMANTIC_CACHE_ENABLED
+    if _semantic_cache is None:
+        try:
+            from semantic_cache import HashingEmbedder, SemanticCache, TransformerEmbedder
+            embed = HashingEmbedder() if SEMANTIC_CACHE_EMBEDDER == "hashing" else TransformerEmbedder()
+            _semantic_cache = SemanticCache(embed, embed.dim, capacity=SEMANTIC_CACHE_SIZE,
+                                            threshold=SEMANTIC_CACHE_THRESHOLD)
+        except Exception as e:
+            print("Semantic cache disabled:", e)
+            SEMANTIC_CACHE_ENABLED = False
+    return _semantic_cache
+
+def _cached_intent(user_text: str, cache_key: tuple) -> Optional[dict]:
+    cached = intent_cache.get(cache_key)
+    if cached is not None:
+        _note_turn(source="cache")
+        return _copy_intent_result(cached)
+    # The semantic cache matches on the utterance alone, so it can't answer for a given context
+    if SEMANTIC_CACHE_ENABLED and not cache_key[3] and get_semantic_cache() is not None:
+        cached = _semantic_cache.lookup(user_text)
+        if cached is not None:
+            _note_turn(source="semantic_cache")
+        return cached
+    return None
+
+def _remember_intent(cache_key: tuple, result: dict) -> None:
+    intent_cache.set(cache_key, _copy_intent_result(result))
+    if SEMANTIC_CACHE_ENABLED and not cache_key[3] and get_semantic_cache() is not None:
+        _semantic_cache.store(cache_key[0], result.get("intent"))
+
+def get_turn_log():
+    global _turn_log
+    if _turn_log is None and TURN_LOG_PATH:
+        from turn_log import TurnLogWriter
+        _turn_log = TurnLogWriter(TURN_LOG_PATH, max_bytes=TURN_LOG_MAX_BYTES, backups=TURN_LOG_BACKUPS)
+    return _turn_log
+
+def _note_turn(**fields) -> None:
+    # Adds fields to the turn being logged; a no-op when the log is off
+    record = _turn_record.get()
+    if record is not None:
+        record.update(fields)
+
+def _begin_turn() -> Optional[dict]:
+    if not TURN_LOG_PATH:
+        return None
+    record = {"ts": time.time(), "source": None, "intent": None, "entities": None, "usage": None}
+    _turn_record.set(record)
+    return record
+
+def _end_turn(record: dict, session_id: str, user_input: str, response: str, started: float) -> None:
+    _turn_record.set(None)
+    record.update(session_id=session_id, input=user_input, response=response,
+                  total_ms=(time.perf_counter() - started) * 1000)
+    get_turn_log().append(record)
+
+def _intent_cache_key(user_text: str, context: str = "", prompt_version: Optional[str] = None) -> tuple:
+    if prompt_version is None:
+        prompt_version = COMPACT_PROMPT_VERSION if INTENT_COMPACT_OUTPUT else PROMPT_VERSION
+    return (normalize_text(user_text), INTENT_MODEL, prompt_version, context)
+
+def _compact_intent_request(user_text: str, context: str = "") -> dict:
+    guess, _ = recognize_intent_local(user_text)
+    messages = [{"role": "system", "content": COMPACT_SYSTEM_PROMPT}]
+    if context:
+        messages.append({"role": "system", "content": f"{CONTEXT_INSTRUCTION}\nConversation so far:\n{context}"})
+    messages.append({"role": "user", "content": user_text})
+    return dict(
+        model=INTENT_MODEL,
+        messages=messages,
+        response_format=COMPACT_RESPONSE_FORMAT,
+        temperature=0,
+        max_tokens=COMPACT_MAX_TOKENS.get(guess["intent"], COMPACT_MAX_TOKENS_CAP),
+    )
+
+def _expand_compact(parsed: dict) -> dict:
+    entities = parsed.get("e") or {}
+    return {
+        "intent": parsed.get("i"),
+        "entities": {COMPACT_ENTITY_KEYS.get(key, key): value for key, value in entities.items() if value is not None},
+    }
+
+def _truncated(response, request: dict) -> bool:
+    # Only compact requests run on a guessed budget; the verbose prompt keeps its fixed 150
+    return (request["max_tokens"] < COMPACT_MAX_TOKENS_CAP and "response_format" in request
+            and response.choices[0].finish_reason == "length")
+
+def _intent_request(user_text: str, context: str = "") -> dict:
+    """
+    Keyword arguments for chat.completions.create, shared by the sync and async paths.
+    """
+    if INTENT_COMPACT_OUTPUT:
+        return _compact_intent_request(user_text, context)
+    # The context goes above the input line and is empty for most turns, so the prompt is unchanged for them
+    context_block = f"Conversation so far:\n{context}\n{CONTEXT_INSTRUCTION}\n" if context else ""
+    prompt = f"""
+You are a helpful AI assistant specialized in understanding DeFi user intents and extracting entities.
+{context_block}User input: \"{user_text}\"
+Reply ONLY with a JSON object with fields:
+{INTENT_JSON_FIELDS}
 Ensure valid JSON without extra text.
     """
+    return dict(
+        model=INTENT_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0,
+        max_tokens=150,
+        top_p=1,
+        frequency_penalty=0,
+        presence_penalty=0
+    )
+
+def _admit(request: dict) -> int:
+    """Waits for the rate limiter, if any; returns the tokens charged. Raises RateLimitShed."""
+    if rate_limiter is None:
+        return 0
+    charged = estimate_tokens(request)
+    rate_limiter.acquire(charged, _llm_priority.get())
+    return charged
+
+async def _admit_async(request: dict) -> int:
+    if rate_limiter is None:
+        return 0
+    charged = estimate_tokens(request)
+    await rate_limiter.acquire_async(charged, _llm_priority.get())
+    return charged
+
+def _settle(charged: int, response) -> None:
+    if charged:
+        usage = getattr(response, "usage", None)
+        rate_limiter.settle(charged, usage.total_tokens if usage is not None else None)
+
+def _session_priority(state: DialogState) -> int:
+    return HIGH if state.resumed else NORMAL
+
+def _parse_intent_response(response, cache_key: tuple) -> dict:
+    if instrumentation.enabled:
+        instrumentation.record_usage("recognize_intent", getattr(response, "usage", None))
+    usage = getattr(response, "usage", None)
+    _note_turn(source="llm", usage=usage and {"prompt_tokens": usage.prompt_tokens,
+                                              "completion_tokens": usage.completion_tokens})
+    json_str = response.choices[0].message.content.strip()
+    parsed = json.loads(json_str)
+    if "i" in parsed and "intent" not in parsed:
+        parsed = _expand_compact(parsed)
+    _remember_intent(cache_key, parsed)
+    return parsed
+
+def recognize_intent(user_text: str, context: str = "") -> dict:
+    """
+    Calls OpenAI GPT to extract intent and entities from user input.
+    Results are cached per (normalized text, model, prompt version, conversation context).
+    """
+    cache_key = _intent_cache_key(user_text, context)
+    cached = _cached_intent(user_text, cache_key)
+    if cached is not None:
+        return cached
+    if SINGLE_FLIGHT_ENABLED:
+        return single_flight.do(cache_key, lambda: _recognize_upstream(user_text, cache_key))
+    return _recognize_upstream(user_text, cache_key)
+
+def _recognize_upstream(user_text: str, cache_key: tuple) -> dict:
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-            max_tokens=150,
-            top_p=1,
-            frequency_penalty=0,
-            presence_penalty=0
-        )
-        json_str = response.choices[0].message.content.strip()
-        parsed = json.loads(json_str)
-        return parsed
-    except (json.JSONDecodeError, KeyError, OpenAIError) as e:
+        request = _intent_request(user_text, cache_key[3])
+        charged = _admit(request)
+        response = transport.call(lambda: get_client().chat.completions.create(**request))
+        _settle(charged, response)
+        if _truncated(response, request):
+            request["max_tokens"] = COMPACT_MAX_TOKENS_CAP
+            charged = _admit(request)
+            response = transport.call(lambda: get_client().chat.completions.create(**request))
+            _settle(charged, response)
+        return _parse_intent_response(response, cache_key)
+    except (CircuitOpenError, RateLimitShed, _openai_error()) as e:
+        return _upstream_fallback(user_text, e)
+    except (json.JSONDecodeError, KeyError) as e:
         print("OpenAI API or JSON Parsing error:", e)
         # Fallback to empty/no intent
         return {"intent": None, "entities": {}}
 
+async def recognize_intent_async(user_text: str, context: str = "") -> dict:
+    """
+    Async variant of recognize_intent on AsyncOpenAI; awaits the HTTP call instead of blocking the loop.
+    """
+    cache_key = _intent_cache_key(user_text, context)
+    cached = _cached_intent(user_text, cache_key)
+    if cached is not None:
+        return cached
+    if SINGLE_FLIGHT_ENABLED:
+        return await single_flight.do_async(cache_key, lambda: _recognize_upstream_async(user_text, cache_key))
+    return await _recognize_upstream_async(user_text, cache_key)
+
+async def _recognize_upstream_async(user_text: str, cache_key: tuple) -> dict:
+    global _llm_semaphore
+    import asyncio
+
+    try:
+        request = _intent_request(user_text, cache_key[3])
+        make_call = lambda: get_async_client().chat.completions.create(**request)
+        charged = await _admit_async(request)
+        if LLM_MAX_CONCURRENCY > 0:
+            if _llm_semaphore is None:
+                _llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+            async with _llm_semaphore:
+                response = await transport.acall(make_call)
+        else:
+            response = await transport.acall(make_call)
+        _settle(charged, response)
+        if _truncated(response, request):
+            request["max_tokens"] = COMPACT_MAX_TOKENS_CAP
+            charged = await _admit_async(request)
+            response = await transport.acall(make_call)
+            _settle(charged, response)
+        return _parse_intent_response(response, cache_key)
+    except (CircuitOpenError, RateLimitShed, _openai_error()) as e:
+        return _upstream_fallback(user_text, e)
+    except (json.JSONDecodeError, KeyError) as e:
+        print("OpenAI API or JSON Parsing error:", e)
+        return {"intent": None, "entities": {}}
+
+def _coalesced(result: dict) -> dict:
+    # What a follower in single_flight gets; the leader's turn carries source and usage
+    _note_turn(source="coalesced")
+    return _copy_intent_result(result)
+
+single_flight = SingleFlight(copy=_coalesced)
+
+def _upstream_fallback(user_text: str, error: Exception) -> dict:
+    # Retries are exhausted, the breaker is open or the rate limiter shed the call: answer from
+    # the keyword stage, whatever its confidence
+    if not isinstance(error, (CircuitOpenError, RateLimitShed)):
+        print("OpenAI API error, using local recognizer:", error)
+    cascade_stats["fallback"] += 1
+    _note_turn(source="fallback")
+    return recognize_intent_local(user_text)[0]
+
+class _StreamedIntent:
+    """Folds streamed (path, value) events into an intent result and knows when it can stop."""
+
+    def __init__(self, on_intent: Optional[Callable[[Optional[str]], None]]):
+        self.parser = StreamingJSONParser()
+        self.on_intent = on_intent
+        self.result = {"intent": None, "entities": {}}
+        self.intent_seen = False
+
+    def feed(self, text: str) -> None:
+        for path, value in self.parser.feed(text):
+            if path[0] == "i":
+                path = ("intent",)
+            elif path[0] == "e" and len(path) == 2:
+                path = ("entities", COMPACT_ENTITY_KEYS.get(path[1], path[1]))
+            if path == ("intent",):
+                self.result["intent"] = value
+                self.intent_seen = True
+                if self.on_intent is not None:
+                    # Let the dialog layer pick its next prompt while entities are still streaming
+                    self.on_intent(value)
+            elif len(path) == 2 and path[0] == "entities":
+                self.result["entities"][path[1]] = value
+
+    def has_required_fields(self) -> bool:
+        return self.intent_seen and all(
+            name in self.result["entities"] for name in INTENTS.get(self.result["intent"], [])
+        )
+
+def _chunk_text(chunk) -> str:
+    return (chunk.choices[0].delta.content or "") if chunk.choices else ""
+
+def recognize_intent_streaming(user_text: str, on_intent: Optional[Callable[[Optional[str]], None]] = None,
+                               cancel_when_complete: bool = True, context: str = "") -> dict:
+    """
+    Streaming variant of recognize_intent. on_intent fires as soon as the "intent" field is
+    complete; with cancel_when_complete the stream is closed once every entity the intent
+    needs has arrived, skipping the rest of the completion.
+    """
+    cache_key = _intent_cache_key(user_text, context)
+    cached = _cached_intent(user_text, cache_key)
+    if cached is not None:
+        if on_intent is not None:
+            on_intent(cached["intent"])
+        return cached
+
+    streamed = _StreamedIntent(on_intent)
+    try:
+        request = _intent_request(user_text, context)
+        _admit(request)  # streamed chunks carry no usage, so the estimate stands
+        # Not hedged: a duplicate stream could not be discarded without reading it
+        stream = transport.call(lambda: get_client().chat.completions.create(**request, stream=True), hedge=False)
+        try:
+            for chunk in stream:
+                streamed.feed(_chunk_text(chunk))
+                if cancel_when_complete and streamed.has_required_fields():
+                    break
+        finally:
+            stream.close()
+    except (CircuitOpenError, RateLimitShed, _openai_error()) as e:
+        return _streaming_fallback(streamed, user_text, e)
+    except KeyError as e:
+        print("OpenAI API or JSON Parsing error:", e)
+        return {"intent": None, "entities": {}}
+    return _finish_streamed_intent(streamed, cache_key)
+
+async def recognize_intent_streaming_async(user_text: str, on_intent: Optional[Callable[[Optional[str]], None]] = None,
+                                           cancel_when_complete: bool = True, context: str = "") -> dict:
+    cache_key = _intent_cache_key(user_text, context)
+    cached = _cached_intent(user_text, cache_key)
+    if cached is not None:
+        if on_intent is not None:
+            on_intent(cached["intent"])
+        return cached
+
+    streamed = _StreamedIntent(on_intent)
+    try:
+        request = _intent_request(user_text, context)
+        await _admit_async(request)
+        stream = await transport.acall(
+            lambda: get_async_client().chat.completions.create(**request, stream=True), hedge=False)
+        try:
+            async for chunk in stream:
+                streamed.feed(_chunk_text(chunk))
+                if cancel_when_complete and streamed.has_required_fields():
+                    break
+        finally:
+            await stream.close()
+    except (CircuitOpenError, RateLimitShed, _openai_error()) as e:
+        return _streaming_fallback(streamed, user_text, e)
+    except KeyError as e:
+        print("OpenAI API or JSON Parsing error:", e)
+        return {"intent": None, "entities": {}}
+    return _finish_streamed_intent(streamed, cache_key)
+
+def _streaming_fallback(streamed: _StreamedIntent, user_text: str, error: Exception) -> dict:
+    if streamed.intent_seen:
+        # Dropped mid-stream after on_intent fired; keep that answer (uncached) rather than contradict it
+        print("OpenAI stream interrupted:", error)
+        return streamed.result
+    result = _upstream_fallback(user_text, error)
+    if streamed.on_intent is not None:
+        streamed.on_intent(result["intent"])
+    return result
+
+def _finish_streamed_intent(streamed: _StreamedIntent, cache_key: tuple) -> dict:
+    if not streamed.intent_seen:
+        print("OpenAI API or JSON Parsing error: no intent in streamed completion")
+        return {"intent": None, "entities": {}}
+    # A cancelled stream still holds every entity its intent needs, so it is safe to cache
+    if streamed.parser.done or streamed.has_required_fields():
+        _remember_intent(cache_key, streamed.result)
+    return streamed.result
+
+def _batch_intent_request(texts: List[str]) -> dict:
+    # One copy of the instructions for all N utterances
+    prompt = f"""
+You are a helpful AI assistant specialized in understanding DeFi user intents and extracting entities.
+User inputs (JSON array): {json.dumps(texts)}
+Reply ONLY with a JSON array holding one object per user input, in the same order, each with fields:
+{INTENT_JSON_FIELDS}
+Ensure valid JSON without extra text.
+    """
+    return dict(
+        model=INTENT_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0,
+        max_tokens=min(150 * len(texts), 4096),
+        top_p=1,
+        frequency_penalty=0,
+        presence_penalty=0
+    )
+
+def _parse_batch_response(response, expected: int) -> list:
+    parsed = json.loads(response.choices[0].message.content.strip())
+    if not isinstance(parsed, list) or len(parsed) != expected:
+        raise ValueError(f"expected a JSON array of {expected} results")
+    return parsed
+
+def recognize_intents(texts: List[str]) -> List[dict]:
+    """
+    Recognizes many utterances with a single OpenAI call. Cached and duplicate texts are
+    not resent; if the batch reply can't be parsed, each item falls back to recognize_intent.
+    """
+    results: List[Optional[dict]] = [None] * len(texts)
+    pending: Dict[tuple, List[int]] = {}
+    for i, text in enumerate(texts):
+        # The batch prompt asks for the verbose fields whatever INTENT_COMPACT_OUTPUT says
+        cache_key = _intent_cache_key(text, prompt_version=PROMPT_VERSION)
+        cached = _cached_intent(text, cache_key)
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.setdefault(cache_key, []).append(i)
+    if not pending:
+        return results
+
+    keys = list(pending)
+    batch_texts = [texts[pending[key][0]] for key in keys]
+    parsed = None
+    shed = None
+    if len(batch_texts) > 1:
+        try:
+            request = _batch_intent_request(batch_texts)
+            charged = _admit(request)
+            response = transport.call(lambda: get_client().chat.completions.create(**request))
+            _settle(charged, response)
+            if instrumentation.enabled:
+                instrumentation.record_usage("recognize_intents", getattr(response, "usage", None))
+            parsed = _parse_batch_response(response, len(batch_texts))
+        except RateLimitShed as e:
+            shed = e  # per-item calls would only deepen the queue
+        except (json.JSONDecodeError, KeyError, ValueError, CircuitOpenError, _openai_error()) as e:
+            print("Batched intent recognition failed, falling back to per-item calls:", e)
+
+    for j, key in enumerate(keys):
+        item = parsed[j] if parsed is not None else None
+        if isinstance(item, dict):
+            _remember_intent(key, item)
+        elif shed is not None:
+            item = _upstream_fallback(batch_texts[j], shed)
+        else:
+            item = recognize_intent(batch_texts[j])
+        for i in pending[key]:
+            results[i] = _copy_intent_result(item)
+    return results
+
+def _recognize_intents_batched(texts: List[str]) -> List[dict]:
+    # One batch answers several turns, so none of their turn records gets its per-item notes
+    # (each caller notes source="batch" itself)
+    _turn_record.set(None)
+    return recognize_intents(texts)
+
+def get_intent_batcher():
+    global _intent_batcher
+    with _intent_batcher_lock:
+        if _intent_batcher is None:
+            from intent_batcher import IntentBatcher
+            # The batch runs with its highest-priority caller's contextvars, so one resumed session admits it as HIGH
+            _intent_batcher = IntentBatcher(_recognize_intents_batched, max_batch=INTENT_BATCH_MAX,
+                                            max_wait=INTENT_BATCH_WAIT_MS / 1000,
+                                            pick_context=lambda contexts: min(
+                                                contexts, key=lambda context: context.get(_llm_priority, NORMAL)))
+    return _intent_batcher
+
+def _recognize_local_first(user_text: str) -> Optional[dict]:
+    if not LOCAL_CASCADE_ENABLED:
+        return None
+    result, confidence = recognize_intent_local(user_text)
+    if confidence >= LOCAL_MIN_CONFIDENCE:
+        cascade_stats["local"] += 1
+        _note_turn(source="local")
+        return result
+    cascade_stats["escalated"] += 1
+    return None
+
+def cascade_snapshot() -> dict:
+    total = cascade_stats["local"] + cascade_stats["escalated"]
+    return dict(cascade_stats, local_fraction=cascade_stats["local"] / total if total else 0.0)
+
+def get_local_intent_model():
+    """Loads the model weights; server.py calls this before fork so workers share them."""
+    global _local_model
+    with _local_model_lock:
+        if _local_model is None:
+            from local_intent_model import model_from_env
+            _local_model = model_from_env()
+    return _local_model
+
+def get_local_model_batcher():
+    # Its thread is started lazily, i.e. after fork in server workers
+    global _local_model_batcher
+    with _local_model_lock:
+        if _local_model_batcher is None:
+            from intent_batcher import IntentBatcher
+            _local_model_batcher = IntentBatcher(get_local_intent_model().recognize_batch,
+                                                 max_batch=LOCAL_MODEL_BATCH_MAX,
+                                                 max_wait=LOCAL_MODEL_BATCH_WAIT_MS / 1000)
+    return _local_model_batcher
+
+def _recognize_turn(user_text: str, context: str = "") -> dict:
+    # Dialog entry point: local stage first, then the micro-batching queue or a direct LLM call.
+    # Neither the local model nor the batched prompt takes a context, so a turn with one goes to the LLM.
+    local = _recognize_local_first(user_text)
+    if local is not None:
+        return local
+    if context:
+        if INTENT_STREAMING_ENABLED:
+            return recognize_intent_streaming(user_text, context=context)
+        return recognize_intent(user_text, context)
+    if LOCAL_MODEL_ENABLED:
+        _note_turn(source="local_model")
+        return get_local_model_batcher().recognize(user_text)
+    if INTENT_BATCH_WAIT_MS > 0:
+        _note_turn(source="batch")
+        return get_intent_batcher().recognize(user_text)
+    if INTENT_STREAMING_ENABLED:
+        return recognize_intent_streaming(user_text)
+    return recognize_intent(user_text)
+
+async def _recognize_turn_async(user_text: str, context: str = "") -> dict:
+    local = _recognize_local_first(user_text)
+    if local is not None:
+        return local
+    if context:
+        if INTENT_STREAMING_ENABLED:
+            return await recognize_intent_streaming_async(user_text, context=context)
+        return await recognize_intent_async(user_text, context)
+    if LOCAL_MODEL_ENABLED:
+        import asyncio
+        _note_turn(source="local_model")
+        return await asyncio.wrap_future(get_local_model_batcher().submit(user_text))
+    if INTENT_BATCH_WAIT_MS > 0:
+        import asyncio
+        _note_turn(source="batch")
+        return await asyncio.wrap_future(get_intent_batcher().submit(user_text))
+    if INTENT_STREAMING_ENABLED:
+        return await recognize_intent_streaming_async(user_text)
+    return await recognize_intent_async(user_text)
+
+def classify(user_text: str) -> dict:
+    """
+    Recognizes one utterance outside any dialog (batch_classify.py): the same stages as a new
+    turn, with the one that answered ("local", "cache", "llm", "fallback", ...) as "source".
+    """
+    record = {"source": None}
+    token = _turn_record.set(record)
+    try:
+        result = _recognize_turn(user_text)
+    finally:
+        _turn_record.reset(token)
+    return dict(_copy_intent_result(result), source=record["source"])
+
 def get_missing_param(intent: str, collected_entities: Dict) -> Optional[str]:
     for param in REQUIRED_PARAMS.get(intent, []):
         if param not in collected_entities or not collected_entities[param]:
@@ -159,47 +877,107 @@ def process_confirmation_response(user_input: str) -> Tuple[Optional[bool], str]
     else:
         return None, "Please reply with 'yes' or 'no' to confirm or cancel."
 
-def handle_multiturn_dialog(user_input: str) -> str:
-    global dialog_state
+def _start_dialog(state: DialogState, intent_info: dict) -> str:
+    # First turn of an intent: store it and ask for the first missing parameter
+    intent = intent_info.get("intent")
+    entities = intent_info.get("entities", {})
+    _note_turn(intent=intent, entities=dict(entities or {}))
 
-    if dialog_state.current_intent is None:
-        # Start new intent recognition
-        intent_info = recognize_intent(user_input)
-        intent = intent_info.get("intent")
-        entities = intent_info.get("entities", {})
-
-        if intent in REQUIRED_PARAMS:
-            dialog_state.current_intent = intent
-            dialog_state.collected_entities = entities
-            missing_param = get_missing_param(intent, entities)
-
-            if missing_param:
-                dialog_state.waiting_for = missing_param
-                return generate_parameter_prompt(missing_param)
-            else:
-                # All parameters present, confirm action
-                return confirm_intent_action(intent, entities)
-        elif intent is None:
-            return "Sorry, I didn't understand that. Could you please rephrase?"
+    if intent in REQUIRED_PARAMS:
+        state.current_intent = intent
+        state.collected_entities = entities
+        missing_param = get_missing_param(intent, entities)
+
+        if missing_param:
+            state.waiting_for = missing_param
+            return generate_parameter_prompt(missing_param)
         else:
-            # Intents with no params or simple responses
+            # All parameters present, confirm action
             return confirm_intent_action(intent, entities)
+    elif intent is None:
+        return "Sorry, I didn't understand that. Could you please rephrase?"
+    else:
+        # Intents with no params or simple responses
+        return confirm_intent_action(intent, entities)
 
+def _continue_dialog(state: DialogState, user_input: str) -> str:
+    # We are waiting for a param from user
+    _fill_slot(state, user_input)
+    _note_turn(source="slot", intent=state.current_intent, entities=dict(state.collected_entities))
+    _remember_turn(state, user_input, state.current_intent, state.collected_entities)
+    next_missing = get_missing_param(state.current_intent, state.collected_entities)
+    if next_missing:
+        state.waiting_for = next_missing
+        return generate_parameter_prompt(next_missing)
     else:
-        # We are waiting for a param from user
-        param = dialog_state.waiting_for
-        dialog_state.collected_entities[param] = user_input.strip()
-        next_missing = get_missing_param(dialog_state.current_intent, dialog_state.collected_entities)
-        if next_missing:
-            dialog_state.waiting_for = next_missing
-            return generate_parameter_prompt(next_missing)
-        else:
-            intent = dialog_state.current_intent
-            entities = dialog_state.collected_entities
-            dialog_state.current_intent = None
-            dialog_state.collected_entities = {}
-            dialog_state.waiting_for = None
-            return confirm_intent_action(intent, entities)
+        intent = state.current_intent
+        entities = state.collected_entities
+        state.current_intent = None
+        state.collected_entities = {}
+        state.waiting_for = None
+        return confirm_intent_action(intent, entities)
+
+def _fill_slot(state: DialogState, user_input: str) -> None:
+    param = state.waiting_for
+    if param in TOKEN_PARAMS and token_registry is not None:
+        symbols = entity_extractor.extract(user_input, lowercase_symbols=True).symbols
+        words = user_input.split()
+        if not symbols and len(words) == 1:
+            # The prompt asked for a symbol, so a lone word is read as one ("uscd", "link")
+            symbol = token_registry.resolve(words[0].upper())
+            symbols = [symbol] if symbol else []
+        if symbols:
+            # "apt and usdc" answers the token2 question too
+            for name in TOKEN_PARAMS[TOKEN_PARAMS.index(param):]:
+                if symbols and not state.collected_entities.get(name):
+                    state.collected_entities[name] = symbols.pop(0)
+            return
+    state.collected_entities[param] = user_input.strip()
+
+def _context_text(state: DialogState) -> str:
+    return state.context.render() if CONVERSATION_CONTEXT_ENABLED and state.context else ""
+
+def _remember_turn(state: DialogState, user_input: str, intent: Optional[str], entities: Dict) -> None:
+    if not CONVERSATION_CONTEXT_ENABLED:
+        return
+    if state.context is None:
+        state.context = ConversationContext(CONTEXT_MAX_TURNS, CONTEXT_TOKEN_BUDGET)
+    state.context.add(user_input, intent, entities)
+
+def _multiturn_dialog(state: DialogState, user_input: str) -> str:
+    if state.current_intent is None:
+        # Start new intent recognition
+        started = time.perf_counter()
+        _llm_priority.set(_session_priority(state))
+        intent_info = _recognize_turn(user_input, _context_text(state))
+        _note_turn(recognize_ms=(time.perf_counter() - started) * 1000)
+        _remember_turn(state, user_input, intent_info.get("intent"), intent_info.get("entities") or {})
+        return _start_dialog(state, intent_info)
+    else:
+        return _continue_dialog(state, user_input)
+
+async def _multiturn_dialog_async(state: DialogState, user_input: str) -> str:
+    if state.current_intent is None:
+        started = time.perf_counter()
+        _llm_priority.set(_session_priority(state))
+        intent_info = await _recognize_turn_async(user_input, _context_text(state))
+        _note_turn(recognize_ms=(time.perf_counter() - started) * 1000)
+        _remember_turn(state, user_input, intent_info.get("intent"), intent_info.get("entities") or {})
+        return _start_dialog(state, intent_info)
+    else:
+        return _continue_dialog(state, user_input)
+
+def handle_multiturn_dialog(user_input: str, session_id: str = DEFAULT_SESSION_ID) -> str:
+    state = session_store.get(session_id)
+    response = _multiturn_dialog(state, user_input)
+    session_store.save(session_id, state)
+    return response
+
+async def handle_multiturn_dialog_async(user_input: str, session_id: str = DEFAULT_SESSION_ID) -> str:
+    state = session_store.get(session_id)
+    response = await _multiturn_dialog_async(state, user_input)
+    session_store.save(session_id, state)
+    return response
 
 def handle_user_message(user_text: str) -> str:
     result = recognize_intent(user_text)
@@ -219,29 +997,85 @@ def handle_user_message(user_text: str) -> str:
     else:
         return "Sorry, I didn't understand that. Could you please rephrase?"
 
-def conversation_manager(user_input: str) -> str:
-    global awaiting_confirmation, dialog_state
-
-    if awaiting_confirmation:
-        confirmed, msg = process_confirmation_response(user_input)
-        if confirmed is True:
-            awaiting_confirmation = False
-            # Placeholder for backend integration (e.g., contract deployment)
-            return msg + " (This is where we'll integrate Web3 actions.)"
-        elif confirmed is False:
-            awaiting_confirmation = False
-            dialog_state = DialogState()  # Reset dialog state on cancel
-            return msg
-        else:
-            return msg
+def _handle_confirmation(state: DialogState, user_input: str) -> str:
+    confirmed, msg = process_confirmation_response(user_input)
+    if confirmed is True:
+        # Done with this intent; leaving current_intent set would read the next message as a slot value
+        state.reset()
+        # Placeholder for backend integration (e.g., contract deployment)
+        return msg + " (This is where we'll integrate Web3 actions.)"
+    elif confirmed is False:
+        state.reset()  # Reset dialog state on cancel
+        return msg
     else:
-        response = handle_multiturn_dialog(user_input)
-        if response.lower().startswith("creating liquidity pool") or response.lower().startswith("creating token") or response.lower().startswith("joining pool"):
-            awaiting_confirmation = True
-        return response
+        return msg
+
+def _after_dialog_response(state: DialogState, response: str) -> str:
+    if response.lower().startswith("creating liquidity pool") or response.lower().startswith("creating token") or response.lower().startswith("joining pool"):
+        state.awaiting_confirmation = True
+    return response
+
+def conversation_manager(user_input: str, session_id: str = DEFAULT_SESSION_ID) -> str:
+    started = time.perf_counter()
+    record = _begin_turn()
+    state = session_store.get(session_id)
+    if state.awaiting_confirmation:
+        _note_turn(source="confirmation")
+        response = _handle_confirmation(state, user_input)
+    else:
+        response = _after_dialog_response(state, _multiturn_dialog(state, user_input))
+    session_store.save(session_id, state)
+    if record is not None:
+        _end_turn(record, session_id, user_input, response, started)
+    return response
+
+async def conversation_manager_async(user_input: str, session_id: str = DEFAULT_SESSION_ID) -> str:
+    """
+    Async entry point: only the OpenAI call is awaited, so many conversations can share one event loop.
+    """
+    started = time.perf_counter()
+    record = _begin_turn()
+    state = session_store.get(session_id)
+    if state.awaiting_confirmation:
+        _note_turn(source="confirmation")
+        response = _handle_confirmation(state, user_input)
+    else:
+        response = _after_dialog_response(state, await _multiturn_dialog_async(state, user_input))
+    session_store.save(session_id, state)
+    if record is not None:
+        _end_turn(record, session_id, user_input, response, started)
+    return response
+
+# Stages timed by instrumentation.enable(); streamed completions carry no usage block, so
+# only the blocking and batched calls report tokens
+METRIC_STAGES = [
+    "conversation_manager", "conversation_manager_async",
+    "recognize_intent", "recognize_intent_async", "recognize_intent_streaming",
+    "recognize_intent_streaming_async", "recognize_intents", "recognize_intent_local",
+    "get_missing_param", "generate_parameter_prompt", "confirm_intent_action",
+    "process_confirmation_response",
+]
+# Timed in entity_extractor itself: LLM1, semantic_cache and local_intent_model all call
+# the scanner through the module, so the per-intent views above need no stage of their own
+EXTRACTOR_METRIC_STAGES = ["extract", "extract_many"]
+
+instrumentation.register_source("intent_cache", intent_cache.stats)
+instrumentation.register_source("cascade", cascade_snapshot)
+instrumentation.register_source("turn_log", lambda: _turn_log.stats() if _turn_log is not None else {})
+instrumentation.register_source("semantic_cache", lambda: _semantic_cache.stats() if _semantic_cache is not None else {})
+instrumentation.register_source("token_registry", lambda: token_registry.stats if token_registry is not None else {})
+instrumentation.register_source("single_flight", lambda: single_flight.snapshot())
+instrumentation.register_source("rate_limiter", lambda: rate_limiter.snapshot() if rate_limiter is not None else {})
+instrumentation.register_source("transport", lambda: dict(transport.stats, breaker_open=transport.breaker.state != "closed"))
+if instrumentation.ENABLED_BY_ENV:
+    import sys
+    instrumentation.enable(sys.modules[__name__], METRIC_STAGES)
+    instrumentation.enable(entity_extractor, EXTRACTOR_METRIC_STAGES)
 
 # Example interactive loop (local testing)
 if __name__ == "__main__":
+    if instrumentation.METRICS_PORT:
+        instrumentation.serve_metrics(instrumentation.METRICS_PORT)
     print("Welcome to Aptos Assistant DeFi Suite chatbot!")
     while True:
         user_in = input("You: ")
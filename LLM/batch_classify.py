@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+## LLM/batch_classify.py
+#
+# Offline intent labelling of a JSONL dump, one utterance per line: {"text": "..."} (other
+# fields are passed through to the output) or a bare JSON string. Each line goes through
+# LLM1.classify, i.e. the local cascade, the intent cache and the LLM as configured by the
+# usual environment variables, on a pool of --workers threads.
+#   - input is streamed; at most --max-in-flight lines are read ahead of the output, so
+#     memory stays flat however big the file is
+#   - output lines come in input order: input fields + intent, entities, source
+#     (a line that can't be parsed, or whose classification raises, gets "error" instead)
+#   - progress and throughput go to stderr every --progress seconds
+#   - with --checkpoint, the input byte offset and output size of the last written line are
+#     saved every --checkpoint-every lines and on Ctrl-C; --resume continues from there,
+#     truncating output written after the checkpoint so no line is duplicated. On stdin the
+#     lines up to the checkpoint are read and skipped instead of seeked over.
+# Run with: python batch_classify.py dump.jsonl -o labels.jsonl --checkpoint labels.ckpt [--resume]
+
+import LLM1
+
+
+def read_lines(source, start: int):
+    """(offset after the line, line) for every line of a binary stream; start is where it is positioned."""
+    offset = start
+    for line in source:
+        offset += len(line)
+        yield offset, line
+
+
+def label(raw: bytes, field: str) -> dict:
+    try:
+        record = json.loads(raw)
+        if isinstance(record, str):
+            record = {field: record}
+        text = record[field]
+    except (ValueError, TypeError, KeyError) as e:
+        return {"input": raw.decode("utf-8", "replace").rstrip("\n"), "error": f"{type(e).__name__}: {e}"}
+    try:
+        record.update(LLM1.classify(str(text)))
+    except Exception as e:  # one bad line (an LLM error past the retries, ...) must not end the run
+        record["error"] = f"{type(e).__name__}: {e}"
+    return record
+
+
+def load_checkpoint(path: str) -> dict:
+    if not path or not os.path.exists(path):
+        return {"offset": 0, "lines": 0, "output_bytes": 0}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path: str, checkpoint: dict) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)  # a crash mid-write leaves the previous checkpoint intact
+
+
+class Progress:
+    def __init__(self, interval: float, done: int):
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.resumed_at = done
+        self.done = done
+        self.sources = Counter()
+        self._next = self.started + interval
+
+    def add(self, result: dict) -> None:
+        self.done += 1
+        self.sources["error" if "error" in result else result.get("source") or "other"] += 1
+        if self.interval > 0 and time.perf_counter() >= self._next:
+            self._next += self.interval
+            self.report()
+
+    def report(self, final: bool = False) -> None:
+        elapsed = time.perf_counter() - self.started
+        rate = (self.done - self.resumed_at) / elapsed if elapsed else 0.0
+        sources = " ".join(f"{name}={count}" for name, count in self.sources.most_common())
+        print(f"{'done: ' if final else ''}{self.done} lines, {rate:.1f} lines/s, {elapsed:.1f} s ({sources})",
+              file=sys.stderr, flush=True)
+
+
+def run(source, output, field: str = "text", workers: int = 8, max_in_flight: int = 0,
+        checkpoint_path: str = "", checkpoint_every: int = 1000, checkpoint: dict = None,
+        seekable: bool = True, progress_interval: float = 5.0) -> dict:
+    """
+    Labels every line of `source` (binary, positioned at checkpoint["offset"] if seekable)
+    into `output` (binary, at checkpoint["output_bytes"]). Returns the final checkpoint.
+    """
+    checkpoint = dict(checkpoint or {"offset": 0, "lines": 0, "output_bytes": 0})
+    progress = Progress(progress_interval, checkpoint["lines"])
+    max_in_flight = max_in_flight or workers * 4
+    lines = read_lines(source, checkpoint["offset"] if seekable else 0)
+    if not seekable and checkpoint["offset"]:
+        for offset, _ in lines:
+            if offset >= checkpoint["offset"]:
+                break
+    pending = deque()  # (offset after the line, future), in input order
+
+    def write_oldest() -> None:
+        offset, future = pending.popleft()
+        data = (json.dumps(future.result()) + "\n").encode()
+        output.write(data)
+        checkpoint["offset"] = offset
+        checkpoint["lines"] += 1
+        checkpoint["output_bytes"] += len(data)
+        progress.add(future.result())
+        if checkpoint_path and checkpoint["lines"] % checkpoint_every == 0:
+            output.flush()
+            save_checkpoint(checkpoint_path, checkpoint)
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for offset, raw in lines:
+            if not raw.strip():
+                continue
+            if len(pending) >= max_in_flight:
+                write_oldest()
+            pending.append((offset, pool.submit(label, raw, field)))
+        while pending:
+            write_oldest()
+    finally:
+        # On Ctrl-C, lines still in flight are dropped; the checkpoint covers everything written
+        for _, future in pending:
+            future.cancel()
+        pool.shutdown(wait=False)
+        output.flush()
+        if checkpoint_path:
+            save_checkpoint(checkpoint_path, checkpoint)
+        progress.report(final=True)
+    return checkpoint
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input", nargs="?", default="-", help="JSONL file, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL file, or - for stdout")
+    parser.add_argument("--field", default="text", help="input field holding the utterance")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("BATCH_WORKERS", "8")))
+    parser.add_argument("--max-in-flight", type=int, default=0, help="lines read ahead of the output (default 4 x workers)")
+    parser.add_argument("--checkpoint", default="", metavar="PATH")
+    parser.add_argument("--checkpoint-every", type=int, default=1000, metavar="LINES")
+    parser.add_argument("--resume", action="store_true", help="continue from --checkpoint")
+    parser.add_argument("--progress", type=float, default=5.0, metavar="SECONDS", help="0 to disable")
+    parser.add_argument("--stub-llm", default="", metavar="LATENCY",
+                        help="answer intents with fake_llm at this latency spec instead of OpenAI (dry runs)")
+    args = parser.parse_args()
+    if args.resume and not args.checkpoint:
+        parser.error("--resume needs --checkpoint")
+    if args.resume and args.output == "-":
+        parser.error("--resume needs --output, to truncate what was written after the checkpoint")
+    if args.resume and not os.path.exists(args.output):
+        parser.error(f"--resume: {args.output} does not exist")
+
+    if args.stub_llm:
+        from fake_llm import FakeLLMClient, parse_latency
+        LLM1.client = FakeLLMClient(parse_latency(args.stub_llm, seed=1))
+    checkpoint = load_checkpoint(args.checkpoint) if args.resume else None
+
+    source = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    seekable = args.input != "-"
+    if checkpoint and seekable:
+        source.seek(checkpoint["offset"])
+    if args.output == "-":
+        output = sys.stdout.buffer
+    else:
+        output = open(args.output, "r+b" if checkpoint else "wb")
+        if checkpoint:
+            output.truncate(checkpoint["output_bytes"])
+            output.seek(checkpoint["output_bytes"])
+    try:
+        run(source, output, args.field, args.workers, args.max_in_flight, args.checkpoint,
+            args.checkpoint_every, checkpoint, seekable, args.progress)
+    except KeyboardInterrupt:
+        print("interrupted; rerun with --resume to continue", file=sys.stderr)
+        return 130
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+        if source is not sys.stdin.buffer:
+            source.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import sys
+import time
+
+from fake_openai_server import FakeOpenAIServer
+
+## LLM/bench_async_sessions.py
+#
+# Throughput of conversation_manager_async vs the number of concurrent sessions,
+# against the local fake completion endpoint (no network, no API key needed). Each
+# session has its own session_id and runs create-pool dialogs (request -> APY slot ->
+# confirmation) with an APY only it uses, so a state leaking between sessions shows up
+# as another session's APY in a reply. Scaling vs 1 session is reported, not enforced:
+# it depends on the machine.
+# Run with: python bench_async_sessions.py [latency_seconds]
+# Exits non-zero if a turn misses the endpoint or a session sees another's state.
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["INTENT_CACHE_ENABLED"] = "0"  # every turn must reach the endpoint
+os.environ["LOCAL_CASCADE_ENABLED"] = "0"  # the keyword stage would answer "help" turns itself
+
+import LLM1
+from openai import AsyncOpenAI
+
+DIALOGS_PER_SESSION = 2
+TURNS_PER_DIALOG = 3  # only the first reaches the LLM
+
+
+async def run_sessions(sessions: int) -> tuple:
+    """(turns/s, replies that were not this session's confirmation prompt or confirmation)"""
+    leaks = []
+
+    async def session(sid: int):
+        session_id = f"bench-{sessions}-{sid}"
+        for dialog in range(DIALOGS_PER_SESSION):
+            apy = f"{sid}.{dialog}"
+            # Distinct text per request, or single-flight would coalesce the sessions' calls
+            await LLM1.conversation_manager_async(f"create a liquidity pool with APT and USDC (desk {session_id}-{dialog})",
+                                                  session_id)
+            reply = await LLM1.conversation_manager_async(apy, session_id)
+            if f" {apy}% APY" not in reply:
+                leaks.append((session_id, apy, reply))
+            reply = await LLM1.conversation_manager_async("yes", session_id)
+            if not reply.startswith("Confirmed."):
+                leaks.append((session_id, "yes", reply))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    return sessions * DIALOGS_PER_SESSION * TURNS_PER_DIALOG / elapsed, leaks
+
+
+async def main(latency: float) -> int:
+    with FakeOpenAIServer(latency=latency) as server:
+        LLM1.async_client = AsyncOpenAI(base_url=server.base_url, api_key="test", max_retries=0)
+        results = {}
+        leaks = []
+        print(f"fake endpoint latency {latency * 1000:.0f} ms, {DIALOGS_PER_SESSION} dialogs of "
+              f"{TURNS_PER_DIALOG} turns per session")
+        print(f"{'sessions':>9} {'turns/s':>9} {'vs 1':>7}")
+        for sessions in (1, 10, 100, 300):
+            results[sessions], run_leaks = await run_sessions(sessions)
+            leaks += run_leaks
+            print(f"{sessions:>9} {results[sessions]:>9.1f} {results[sessions] / results[1]:>6.1f}x")
+        await LLM1.async_client.close()
+        expected = sum((1, 10, 100, 300)) * DIALOGS_PER_SESSION
+
+    if server.requests != expected:
+        print(f"FAIL: {server.requests} of {expected} dialog requests reached the endpoint")
+        return 1
+    if leaks:
+        print(f"FAIL: {len(leaks)} replies out of their session's dialog, e.g. {leaks[0]}")
+        return 1
+    print("sessions isolated: every confirmation prompt carried its own session's APY")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(float(sys.argv[1]) if len(sys.argv) > 1 else 0.05)))
@@ -0,0 +1,100 @@
+import json
+import os
+import statistics
+import sys
+import time
+
+## LLM/bench_compact_output.py
+#
+# Tokens and latency per recognize_intent call, verbose prompt vs INTENT_COMPACT_OUTPUT,
+# on the first turn of every conversation in replay_corpus.jsonl. The fake LLM answers
+# like the real model would in each mode (all eight keys with nulls vs short keys, nulls
+# omitted) and takes time per token: prefill per prompt token plus decode per completion
+# token, so output tokens dominate the way they do upstream. "cacheable" is the request
+# prefix that is byte-identical across calls.
+# Run with: python bench_compact_output.py [ms_per_output_token]
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["INTENT_CACHE_ENABLED"] = "0"
+
+import LLM1
+from fake_llm import FakeLLMClient
+from fake_openai_server import default_responder, guess_intent, prompt_user_text
+
+ENTITY_KEYS = ["token1", "token2", "apy", "token_name", "supply", "pool_id", "entity_type", "entity_id"]
+FIRST_TOKEN_MS = 150.0
+PREFILL_MS_PER_TOKEN = 0.02
+
+
+def load_inputs() -> list:
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "replay_corpus.jsonl")
+    with open(path) as f:
+        return [json.loads(line)["turns"][0] for line in f if line.strip()]
+
+
+def make_responder(ms_per_token: float):
+    def respond(body: dict) -> str:
+        if body.get("response_format"):
+            content = default_responder(body)
+        else:
+            guessed = guess_intent(prompt_user_text(body))
+            entities = {key: guessed["entities"].get(key) for key in ENTITY_KEYS}
+            content = json.dumps({"intent": guessed["intent"], "entities": entities}, indent=2)
+        prompt_tokens = sum(len(m["content"]) for m in body["messages"]) // 4
+        time.sleep((prompt_tokens * PREFILL_MS_PER_TOKEN + len(content) // 4 * ms_per_token) / 1000)
+        return content
+    return respond
+
+
+def cacheable_tokens(request: dict) -> int:
+    # Characters shared by two different utterances' requests, up to where they diverge
+    other = LLM1._intent_request("\x00")
+    first = "".join(m["content"] for m in request["messages"])
+    second = "".join(m["content"] for m in other["messages"])
+    shared = 0
+    while shared < min(len(first), len(second)) and first[shared] == second[shared]:
+        shared += 1
+    return shared // 4
+
+
+def measure(compact: bool, inputs: list, ms_per_token: float) -> dict:
+    LLM1.INTENT_COMPACT_OUTPUT = compact
+    llm = FakeLLMClient(latency=lambda: FIRST_TOKEN_MS / 1000, responder=make_responder(ms_per_token))
+    usage, latencies, cacheable = [], [], []
+    original_create = llm.create
+
+    def create(**body):
+        response = original_create(**body)
+        usage.append(response.usage)
+        return response
+
+    llm.chat.completions.create = create
+    LLM1.client = llm
+    for text in inputs:
+        cacheable.append(cacheable_tokens(LLM1._intent_request(text)))
+        start = time.perf_counter()
+        LLM1.recognize_intent(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "prompt": statistics.mean(u.prompt_tokens for u in usage),
+        "cacheable": statistics.mean(cacheable),
+        "completion": statistics.mean(u.completion_tokens for u in usage),
+        "latency_ms": statistics.mean(latencies),
+        "calls": llm.calls / len(inputs),
+    }
+
+
+if __name__ == "__main__":
+    ms_per_token = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    inputs = load_inputs()
+    verbose = measure(False, inputs, ms_per_token)
+    compact = measure(True, inputs, ms_per_token)
+    print(f"{len(inputs)} first turns; fake LLM: {FIRST_TOKEN_MS:.0f} ms to first token, "
+          f"{ms_per_token:.0f} ms per output token (means per turn)")
+    print(f"{'':<12} {'prompt tok':>10} {'cacheable':>10} {'output tok':>10} {'latency ms':>11} {'calls':>6}")
+    for name, row in (("verbose", verbose), ("compact", compact)):
+        print(f"{name:<12} {row['prompt']:>10.1f} {row['cacheable']:>10.1f} {row['completion']:>10.1f} "
+              f"{row['latency_ms']:>11.1f} {row['calls']:>6.2f}")
+    print(f"{'saved':<12} {verbose['prompt'] - compact['prompt']:>10.1f} {'':>10} "
+          f"{verbose['completion'] - compact['completion']:>10.1f} {verbose['latency_ms'] - compact['latency_ms']:>11.1f}"
+          f"   ({1 - compact['latency_ms'] / verbose['latency_ms']:.0%} of turn latency)")
@@ -0,0 +1,103 @@
+import os
+import re
+import sys
+
+## LLM/bench_context.py
+#
+# A long conversation of requests and follow-ups that refer back to them ("make it 9%
+# instead", "what about pool 4412"), run with CONVERSATION_CONTEXT_ENABLED off and on.
+# Reports prompt tokens per LLM call as the conversation grows (they should level off at
+# the context budget) and round trips per completed intent: without context a follow-up
+# isn't understood and the user has to restate the whole request.
+# The fake LLM reads follow-ups against the "Conversation so far" block the way the real
+# model is asked to, so the round-trip numbers show the mechanism, not model quality.
+# Run with: python bench_context.py [cycles]
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import LLM1
+from conversation_context import count_tokens
+from fake_llm import FakeLLMClient
+from fake_openai_server import guess_intent, prompt_user_text
+from session_store import SessionStore
+
+_LINE = re.compile(r'(?:Earlier:|-> )\s*(\w+)((?: \w+=\S+)*)\s*$')
+
+
+def cycle(n: int) -> list:
+    """(message, what the user says instead when it isn't understood); numbers vary so the intent cache misses."""
+    return [
+        (f"create a liquidity pool with APT and USDC at {n + 5}% APY", None),
+        (f"make it {n + 9}% instead", f"create a liquidity pool with APT and USDC at {n + 9}% APY"),
+        (f"join pool {4400 + 2 * n}", None),
+        (f"what about pool {4401 + 2 * n}", f"join pool {4401 + 2 * n}"),
+        (f"create a liquidity pool with SOL and USDT at {n + 4}% APY", None),
+        (f"actually {n + 6}%", f"create a liquidity pool with SOL and USDT at {n + 6}% APY"),
+    ]
+
+
+def context_responder(prompt_tokens: list):
+    def respond(body: dict) -> str:
+        content = body["messages"][-1]["content"]
+        prompt_tokens.append(sum(len(m["content"]) for m in body["messages"]) // 4)  # as the fake's usage
+        text = prompt_user_text(body)
+        guessed = guess_intent(text)
+        context = re.search(r'Conversation so far:\n(.*?)\n(?:If the user|User input)', content, re.S)
+        if guessed["intent"] is None and context:
+            for line in reversed(context.group(1).splitlines()):
+                match = _LINE.search(line)
+                if match and match.group(1) != "unclear":
+                    entities = dict(pair.split("=", 1) for pair in match.group(2).split())
+                    apy, pool = re.search(r'(\d+(?:\.\d+)?)%', text), re.search(r'pool (\d+)', text)
+                    if apy:
+                        entities["apy"] = apy.group(1)
+                    if pool:
+                        entities["pool_id"] = pool.group(1)
+                    guessed = {"intent": match.group(1), "entities": entities}
+                    break
+        return LLM1.json.dumps(guessed)
+    return respond
+
+
+def run(enabled: bool, cycles: int) -> dict:
+    LLM1.CONVERSATION_CONTEXT_ENABLED = enabled
+    LLM1.intent_cache.clear()
+    LLM1.session_store = SessionStore()
+    prompt_tokens = []
+    LLM1.client = FakeLLMClient(responder=context_responder(prompt_tokens))
+    user_turns = completed = 0
+    for n in range(cycles):
+        for message, restated in cycle(n):
+            for text in (message, restated):
+                if text is None:
+                    break
+                user_turns += 1
+                response = LLM1.conversation_manager(text, "long")
+                if not response.startswith("Sorry"):
+                    break
+            if response.endswith("(yes/no)"):
+                user_turns += 1
+                LLM1.conversation_manager("yes", "long")
+                completed += 1
+    state = LLM1.session_store.get("long")
+    return {"calls": LLM1.client.calls, "prompt_tokens": prompt_tokens, "user_turns": user_turns,
+            "completed": completed, "context_tokens": state.context.tokens() if state.context else 0,
+            "context_measured": count_tokens(state.context.render()) if state.context else 0}
+
+
+if __name__ == "__main__":
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    LLM1.LOCAL_CASCADE_ENABLED = False  # every request goes to the LLM, so each one shows its prompt size
+    print(f"{cycles * len(cycle(0))} requests in one session, context budget {LLM1.CONTEXT_TOKEN_BUDGET} tokens, "
+          f"{LLM1.CONTEXT_MAX_TURNS} turns")
+    for enabled in (False, True):
+        result = run(enabled, cycles)
+        tokens = result["prompt_tokens"]
+        marks = [1, 10, len(tokens) // 2, len(tokens)]
+        print(f"context {'on' if enabled else 'off'}: prompt tokens at call "
+              + ", ".join(f"#{n}={tokens[n - 1]}" for n in marks) + f" (max {max(tokens)})")
+        print(f"  {result['calls']} LLM calls, {result['user_turns']} user turns for {result['completed']} intents "
+              f"= {result['calls'] / result['completed']:.2f} calls and "
+              f"{result['user_turns'] / result['completed']:.2f} turns per intent")
+        if enabled:
+            print(f"  final context {result['context_tokens']} tokens (re-counted: {result['context_measured']})")
@@ -0,0 +1,90 @@
+import json
+import os
+import sys
+import time
+
+## LLM/bench_entity_extractor.py
+#
+# Checks and times the local stage with the token registry LLM1 installs:
+#   extraction   EXTRACTION_CASES through entity_extractor.extract, and extract_many
+#                must agree with extract on every case
+#   cascade      CASCADE_CASES through LLM1.recognize_intent_local: an expected intent
+#                must be answered locally with exactly those entities, None must escalate
+#   timing       extract per utterance vs extract_many on the replay corpus turns
+# Run with: python bench_entity_extractor.py [rounds]
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import LLM1
+from entity_extractor import extract, extract_many
+
+EXTRACTION_CASES = [
+    ("Create a liquidity pool with APT and USDC at 7% APY", "create_pool",
+     {"token1": "APT", "token2": "USDC", "apy": "7"}),
+    ("Start a pool for BTC USDT with 3.5% APY", "create_pool", {"token1": "BTC", "token2": "USDT", "apy": "3.5"}),
+    ("pool ETH and USDC at 0.25% please", "create_pool", {"token1": "ETH", "token2": "USDC", "apy": "0.25"}),
+    ("Launch a new token named CryptoGold with a supply of 1000000", "create_token",
+     {"token_name": "CryptoGold", "supply": "1000000"}),
+    ("Join pool 12345", "join_pool", {"pool_id": "12345"}),
+    ("What is the status of token CryptoGold?", "query_info", {"entity_type": "token", "entity_id": "CryptoGold"}),
+]
+
+# (utterance, intent answered locally or None = must go to the LLM, entities when answered)
+CASCADE_CASES = [
+    ("Create a liquidity pool with APT and USDC at 7% APY", "create_pool",
+     {"token1": "APT", "token2": "USDC", "apy": "7"}),
+    ("Start a pool for BTC USDT with 3.5% APY", "create_pool", {"token1": "BTC", "token2": "USDT", "apy": "3.5"}),
+    ("Join pool 12345", "join_pool", {"pool_id": "12345"}),
+    ("create a pool with apt and usdc at 5% APY", "create_pool", {"token1": "APT", "token2": "USDC", "apy": "5"}),
+    ("create a pool with APT at 5%", None, None),
+    # Lowercase words outside a token slot are English, not symbols
+    ("I think the apt move is to create a pool with either SOL and usdt at 4%", None, None),
+    # Numbers the extractor would only partly read, or not use at all
+    ("Create a liquidity pool with APT and USDC at 3,5% APY", None, None),
+    ("Launch a token named Nova with a supply of 1,000,000", None, None),
+    ("Create a liquidity pool with APT and USDC at 7% APY for 30 days", None, None),
+]
+
+
+def check_extraction() -> int:
+    texts = [text for text, _, _ in EXTRACTION_CASES]
+    for (text, intent, expected), bulk in zip(EXTRACTION_CASES, extract_many(texts)):
+        got = extract(text).for_intent(intent)
+        assert got == expected, f"{text!r}: extracted {got}, expected {expected}"
+        assert bulk.for_intent(intent) == got, f"{text!r}: extract_many gave {bulk.for_intent(intent)}"
+    return len(EXTRACTION_CASES)
+
+
+def check_cascade() -> int:
+    for text, intent, entities in CASCADE_CASES:
+        result, confidence = LLM1.recognize_intent_local(text)
+        local = confidence >= LLM1.LOCAL_MIN_CONFIDENCE
+        if intent is None:
+            assert not local, f"{text!r}: answered locally as {result} at {confidence:.2f}, expected the LLM"
+        else:
+            assert local and result == {"intent": intent, "entities": entities}, \
+                f"{text!r}: {result} at {confidence:.2f}, expected {intent} {entities} locally"
+    return len(CASCADE_CASES)
+
+
+def corpus_texts() -> list:
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "replay_corpus.jsonl")) as f:
+        return [turn for line in f if line.strip() for turn in json.loads(line)["turns"]]
+
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"extraction: {check_extraction()}/{len(EXTRACTION_CASES)} cases ok")
+    print(f"cascade: {check_cascade()}/{len(CASCADE_CASES)} cases ok")
+    texts = corpus_texts()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            extract(text)
+    single = (time.perf_counter() - start) / (rounds * len(texts))
+    start = time.perf_counter()
+    for _ in range(rounds):
+        extract_many(texts)
+    bulk = (time.perf_counter() - start) / (rounds * len(texts))
+    print(f"{len(texts)} corpus turns x {rounds}: extract {single * 1e6:.2f} us/text, "
+          f"extract_many {bulk * 1e6:.2f} us/text")
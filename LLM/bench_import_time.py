@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Tuple
+
+## LLM/bench_import_time.py
+#
+# Startup regression guard: imports each dialog module in a fresh interpreter under
+# `python -X importtime`, reports the slowest imports and fails if a module exceeds
+# its budget or pulls in a heavy dependency at import time.
+# Run with: python bench_import_time.py [budget_ms]
+
+MODULES = ["LLM", "LLM1"]
+# Must only be imported on first use
+HEAVY_MODULES = ["openai", "httpx", "transformers", "torch", "numpy", "asyncio", "sqlite3", "requests", "pydantic"]
+# Mostly stdlib typing/re/json; openai alone used to add several hundred ms
+DEFAULT_BUDGET_MS = 50.0
+
+
+def import_profile(module: str, env: Dict[str, str]) -> List[Tuple[str, int, int]]:
+    """Returns (module, self_us, cumulative_us) rows from -X importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main(budget_ms: float) -> int:
+    failed = False
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, PYTHONPYCACHEPREFIX=cache_dir, OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", ""))
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        for module in MODULES:
+            import_profile(module, env)  # warm the bytecode cache, as a deployed worker would have it
+            rows = import_profile(module, env)
+            total_ms = next(cum for name, _, cum in rows if name == module) / 1000
+            heavy = sorted({name.split(".")[0] for name, _, _ in rows} & set(HEAVY_MODULES))
+
+            print(f"import {module}: {total_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+            for name, self_us, cum_us in sorted(rows, key=lambda r: -r[1])[:5]:
+                print(f"  {self_us / 1000:6.2f} ms self {cum_us / 1000:7.2f} ms cumulative  {name}")
+            if heavy:
+                print(f"  FAIL: heavy modules imported eagerly: {', '.join(heavy)}")
+                failed = True
+            if total_ms > budget_ms:
+                print("  FAIL: over budget")
+                failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET_MS))
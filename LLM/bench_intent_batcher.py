@@ -0,0 +1,84 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+## LLM/bench_intent_batcher.py
+#
+# Concurrent sessions with distinct escalating messages, local cascade off, through the
+# micro-batching queue (INTENT_BATCH_WAIT_MS) at several wait windows vs one call per turn.
+# Reports upstream calls, average batch size and wall time.
+# cancellation_check: callers that give up (an asyncio timeout cancels the wrapped future)
+# must not take the batcher thread down; the requests after them still have to resolve.
+# Run with: python bench_intent_batcher.py [sessions] [latency_spec]
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import LLM1
+from fake_llm import FakeLLMClient, parse_latency
+from intent_batcher import IntentBatcher
+from session_store import SessionStore
+
+WAITS_MS = [0, 2, 5, 20]
+
+
+def run(sessions: int, latency: str, wait_ms: float) -> tuple:
+    LLM1.INTENT_BATCH_WAIT_MS = wait_ms
+    LLM1._intent_batcher = None
+    LLM1.intent_cache.clear()
+    LLM1.session_store = SessionStore()
+    LLM1.client = FakeLLMClient(parse_latency(latency, seed=1))
+    barrier = threading.Barrier(sessions)
+
+    def session(n: int) -> None:
+        barrier.wait()
+        LLM1.conversation_manager(f"I want to do something with pool {4000 + n}", f"batch-{n}")
+
+    threads = [threading.Thread(target=session, args=(n,)) for n in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stats = LLM1._intent_batcher.stats() if LLM1._intent_batcher is not None else {"avg_batch_size": 1.0}
+    return LLM1.client.calls, stats["avg_batch_size"], elapsed
+
+
+def cancellation_check() -> dict:
+    def slow_batch(texts):
+        time.sleep(0.05)
+        return [{"intent": None, "entities": {}, "text": text} for text in texts]
+
+    batcher = IntentBatcher(slow_batch, max_batch=8, max_wait=0.02)
+    # Cancelled while still queued: dropped from the batch
+    first, dropped, third = batcher.submit("a"), batcher.submit("b"), batcher.submit("c")
+    dropped.cancel()
+    results = [first.result(timeout=2)["text"], third.result(timeout=2)["text"]]
+
+    async def timed_out() -> None:
+        try:
+            await asyncio.wait_for(asyncio.wrap_future(batcher.submit("d")), timeout=0.001)
+        except asyncio.TimeoutError:
+            pass
+
+    asyncio.run(timed_out())
+    # The batcher thread must still be serving
+    results.append(batcher.submit("e").result(timeout=2)["text"])
+    batcher.close()
+    assert results == ["a", "c", "e"], results
+    return batcher.stats()
+
+
+if __name__ == "__main__":
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = sys.argv[2] if len(sys.argv) > 2 else "lognormal:300:0.3"
+    LLM1.LOCAL_CASCADE_ENABLED = False
+    print(f"{sessions} sessions, distinct messages, LLM latency {latency} ms")
+    print(f"{'wait ms':>7} {'upstream calls':>14} {'avg batch':>9} {'wall s':>7}")
+    for wait_ms in WAITS_MS:
+        calls, batch_size, elapsed = run(sessions, latency, wait_ms)
+        print(f"{wait_ms:>7} {calls:>14} {batch_size:>9.1f} {elapsed:>7.2f}")
+    stats = cancellation_check()
+    print(f"cancellation: next request resolved, {stats['cancelled']} cancelled dropped, {stats['items']} served")
@@ -0,0 +1,87 @@
+import random
+import string
+import time
+from typing import Dict, List, Optional, Tuple
+
+from intent_matcher import IntentMatcher
+
+## LLM/bench_intent_matcher.py
+#
+# Microbenchmark: compiled IntentMatcher vs the original per-call loop over
+# FEW_SHOT_EXAMPLES from LLM/LLM.py. Run with: python bench_intent_matcher.py
+
+KEYWORD_RULES = [
+    ("create_pool", ["create pool", "liquidity pool"]),
+    ("create_token", ["create token", "launch token"]),
+    ("join_pool", ["join pool"]),
+    ("general_help", ["help"]),
+]
+
+BASE_EXAMPLES = [
+    {"user_input": "Create a liquidity pool with APT and USDC at 7% APY", "intent": "create_pool", "entities": {"token1": "APT", "token2": "USDC", "apy": "7"}},
+    {"user_input": "Launch a new token named CryptoGold with a supply of 1000000", "intent": "create_token", "entities": {"token_name": "CryptoGold", "supply": "1000000"}},
+    {"user_input": "Join pool 12345", "intent": "join_pool", "entities": {"pool_id": "12345"}},
+    {"user_input": "What is the status of token CryptoGold?", "intent": "query_info", "entities": {"entity_type": "token", "entity_id": "CryptoGold"}},
+    {"user_input": "Help me with DeFi basics", "intent": "general_help", "entities": {}}
+]
+
+INPUTS = [
+    "Create a liquidity pool with APT and USDC at 7% APY",
+    "Launch a new token named CryptoGold with a supply of 1000000",
+    "Join pool 12345",
+    "What is the status of token CryptoGold?",
+    "Help me with DeFi basics",
+    "please create pool for BTC and ETH",
+    "launch token Moon",
+    "can you help",
+    "what's the weather like",
+]
+
+
+def legacy_match(examples: List[Dict], user_text: str) -> Optional[Tuple[str, Optional[Dict]]]:
+    # The loop recognize_intent ran before the matcher was compiled
+    user_text_lower = user_text.lower()
+    for example in examples:
+        if example["user_input"].lower() in user_text_lower or all(
+            token.lower() in user_text_lower for token in example["user_input"].split()
+        ):
+            return example["intent"], example["entities"]
+    for intent, keywords in KEYWORD_RULES:
+        if any(k in user_text_lower for k in keywords):
+            return intent, None
+    return None
+
+
+def synthetic_examples(n: int, seed: int = 7) -> List[Dict]:
+    rng = random.Random(seed)
+    examples = []
+    for i in range(n):
+        words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 9))) for _ in range(rng.randint(3, 8))]
+        examples.append({"user_input": " ".join(words), "intent": f"synthetic_{i}", "entities": {}})
+    # Real examples last so the legacy loop pays for the whole list on every hit
+    return examples + BASE_EXAMPLES
+
+
+def timeit(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in INPUTS:
+            fn(text)
+    return (time.perf_counter() - start) / (rounds * len(INPUTS))
+
+
+if __name__ == "__main__":
+    print(f"{'examples':>9} {'legacy us/call':>15} {'compiled us/call':>17} {'speedup':>8} {'compile ms':>11}")
+    for n in (5, 100, 1000, 5000):
+        examples = synthetic_examples(n - len(BASE_EXAMPLES)) if n > len(BASE_EXAMPLES) else list(BASE_EXAMPLES)
+        t0 = time.perf_counter()
+        matcher = IntentMatcher(examples, KEYWORD_RULES)
+        compile_ms = (time.perf_counter() - t0) * 1000
+
+        for text in INPUTS:
+            assert matcher.match(text) == legacy_match(examples, text), text
+
+        rounds = max(1, 2000 // n)
+        legacy = timeit(lambda t: legacy_match(examples, t), rounds)
+        compiled = timeit(matcher.match, rounds * 10)
+        print(f"{n:>9} {legacy * 1e6:>15.1f} {compiled * 1e6:>17.1f} {legacy / compiled:>7.1f}x {compile_ms:>11.1f}")
@@ -0,0 +1,57 @@
+import json
+import os
+import sys
+import time
+
+## LLM/bench_local_model.py
+#
+# Throughput of local_intent_model.Seq2SeqIntentModel vs batch size, fp32 vs int8 dynamic
+# quantization, on the replay corpus utterances (mixed lengths, so length bucketing matters).
+# Also reports how often the model's intent agrees with the keyword stage on the turns
+# that stage is confident about.
+# Run with: python bench_local_model.py [threads] [model_name]
+
+import LLM1
+from local_intent_model import DEFAULT_MODEL, Seq2SeqIntentModel
+
+BATCH_SIZES = [1, 2, 4, 8, 16, 32]
+ROUNDS = 3
+
+
+def load_texts() -> list:
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "replay_corpus.jsonl")) as f:
+        texts = [turn for line in f if line.strip() for turn in json.loads(line)["turns"]]
+    # Slot answers ("APT", "yes") never reach the recognizer; keep whole requests
+    return [text for text in texts if len(text.split()) > 2]
+
+
+def throughput(model: Seq2SeqIntentModel, texts: list, batch_size: int) -> float:
+    model.recognize_batch(texts[:batch_size])  # warm-up
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for i in range(0, len(texts), batch_size):
+            model.recognize_batch(texts[i:i + batch_size])
+    return ROUNDS * len(texts) / (time.perf_counter() - start)
+
+
+def agreement(model: Seq2SeqIntentModel, texts: list) -> str:
+    confident = [(text, result["intent"]) for text in texts
+                 for result, confidence in [LLM1.recognize_intent_local(text)] if confidence >= LLM1.LOCAL_MIN_CONFIDENCE]
+    predicted = model.labels([text for text, _ in confident])
+    agreed = sum(1 for (_, expected), label in zip(confident, predicted) if label == expected)
+    return f"{agreed}/{len(confident)}"
+
+
+if __name__ == "__main__":
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1)
+    model_name = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_MODEL
+    texts = load_texts()
+    print(f"{model_name}, {threads} threads, {len(texts)} utterances x {ROUNDS} rounds")
+    models = {
+        "fp32": Seq2SeqIntentModel(model_name, threads=threads),
+        "int8": Seq2SeqIntentModel(model_name, threads=threads, quantize=True),
+    }
+    print(f"agreement with keyword stage: " + ", ".join(f"{name} {agreement(m, texts)}" for name, m in models.items()))
+    print(f"{'batch':>5} " + " ".join(f"{name + ' utt/s':>12}" for name in models))
+    for batch_size in BATCH_SIZES:
+        print(f"{batch_size:>5} " + " ".join(f"{throughput(m, texts, batch_size):>12.1f}" for m in models.values()))
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+## LLM/bench_rate_limiter.py
+#
+# A burst of concurrent sessions against a stubbed upstream that answers 429 once its own
+# token bucket (upstream_rps per second, one second of burst) is empty. Without the limiter the 429s are retried with
+# backoff and, once retries run out, the turn falls back to the local recognizer; with it,
+# calls queue client-side, and what can't be sent before LLM_RATE_MAX_WAIT is shed locally
+# without touching upstream. Half the threads keep one session and start its next intent once
+# the previous dialog is confirmed or cancelled (HIGH priority), half start a new session per
+# conversation (NORMAL); latencies are of the turns that start an intent, i.e. go upstream.
+# Also checks that a cancelled async waiter leaves the queue instead of blocking it.
+# Run with: python bench_rate_limiter.py [threads] [seconds] [upstream_rps]
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import LLM1
+from fake_llm import FakeLLMClient, parse_latency
+from llm_transport import transport_from_env
+from rate_limiter import RateLimiter, TokenBucket
+from session_store import SessionStore
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_conversations() -> list:
+    import json
+
+    with open(os.path.join(HERE, "replay_corpus.jsonl")) as f:
+        return [json.loads(line)["turns"] for line in f if line.strip()]
+
+
+class QuotaClient(FakeLLMClient):
+    """FakeLLMClient that rejects requests over `rps` per second with a 429."""
+
+    def __init__(self, rps: int, latency):
+        super().__init__(latency)
+        self.quota = TokenBucket(rps * 60, burst_seconds=1.0)
+        self.rejected = 0
+        self._lock = threading.Lock()
+        error_base = LLM1._openai_error()
+
+        class UpstreamRateLimited(error_base):
+            status_code = 429
+
+        self._error = UpstreamRateLimited
+
+    def create(self, **body):
+        with self._lock:
+            if self.quota.wait_time(1, time.monotonic()) > 0:
+                self.rejected += 1
+                raise self._error("429 Too Many Requests")
+            self.quota.level -= 1
+        return super().create(**body)
+
+
+def run(limiter, threads: int, seconds: float, rps: int) -> dict:
+    LLM1.rate_limiter = limiter
+    LLM1.transport = transport_from_env()  # fresh breaker and retry counters
+    LLM1.client = QuotaClient(rps, parse_latency("lognormal:30:0.4", seed=1))
+    LLM1.session_store = SessionStore()
+    LLM1.cascade_stats.update(local=0, escalated=0, fallback=0)
+    LLM1.intent_cache.clear()
+    conversations = load_conversations()
+    latencies = {True: [], False: []}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def idle(session_id: str) -> bool:
+        state = LLM1.session_store.backend.load(session_id)
+        return state is None or (state.current_intent is None and not state.awaiting_confirmation)
+
+    def session(n: int) -> None:
+        resumed = n % 2 == 0
+        i = n
+        while time.monotonic() < deadline:
+            session_id = f"user-{n}" if resumed else f"user-{n}-{i}"
+            for turn in conversations[i % len(conversations)]:
+                if not idle(session_id):
+                    LLM1.conversation_manager(turn, session_id)  # slot value or yes/no, answered locally
+                    continue
+                # Starts an intent: distinct text so the intent cache doesn't absorb the burst
+                start = time.perf_counter()
+                LLM1.conversation_manager(f"{turn} #{n}-{i}", session_id)
+                with lock:
+                    latencies[resumed].append(time.perf_counter() - start)
+            if not idle(session_id):
+                # Leave the kept session ready for a new intent
+                state = LLM1.session_store.backend.load(session_id)
+                if state.awaiting_confirmation:
+                    LLM1.conversation_manager("no", session_id)
+                else:
+                    LLM1.session_store.reset(session_id)
+            i += threads
+
+    workers = [threading.Thread(target=session, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    def p99(values: list) -> float:
+        values = sorted(values)
+        return values[int(len(values) * 0.99)] * 1000 if values else 0.0
+
+    row = {"intent_turns_resumed": len(latencies[True]), "intent_turns_new": len(latencies[False]),
+           "llm_answers": LLM1.client.calls,
+           "upstream_429": LLM1.client.rejected, "fallbacks": LLM1.cascade_stats["fallback"],
+           "breaker_rejected": LLM1.transport.breaker.rejected,
+           "p99_resumed_ms": p99(latencies[True]), "p99_new_ms": p99(latencies[False])}
+    if limiter is not None:
+        stats = limiter.snapshot()
+        row.update(shed=stats["shed_deadline"] + stats["shed_queue_full"] + stats["shed_evicted"],
+                   shed_high=stats["shed_high"], admitted_high=stats["admitted_high"], admitted=stats["admitted"],
+                   wait_ms_p95=stats["wait_ms_p95"], max_queue_depth=stats["max_queue_depth"])
+    return row
+
+
+def cancellation_check() -> dict:
+    """Drain the bucket, cancel one queued acquire_async, then see whether three more get through."""
+    limiter = RateLimiter(requests_per_minute=120, max_wait=2.0)  # 2 per second, burst of 2
+
+    async def main() -> int:
+        limiter.acquire(), limiter.acquire()
+        waiting = asyncio.ensure_future(limiter.acquire_async())
+        await asyncio.sleep(0.05)
+        waiting.cancel()
+        results = await asyncio.gather(*(limiter.acquire_async() for _ in range(3)), return_exceptions=True)
+        return sum(1 for result in results if not isinstance(result, Exception))
+
+    admitted = asyncio.run(main())
+    stats = limiter.snapshot()
+    return {"admitted": admitted, "cancelled": stats["cancelled"], "queue_depth": stats["queue_depth"]}
+
+
+if __name__ == "__main__":
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 4.0
+    rps = int(sys.argv[3]) if len(sys.argv) > 3 else 40
+    LLM1.LOCAL_CASCADE_ENABLED = False  # every new intent goes upstream
+    print(f"{threads} threads for {seconds:.0f} s, upstream quota {rps} req/s")
+    for name, limiter in [("no limiter", None),
+                          ("limiter", RateLimiter(requests_per_minute=rps * 60 * 0.95, max_wait=1.0))]:
+        row = run(limiter, threads, seconds, rps)
+        print(f"{name}:")
+        for key, value in row.items():
+            print(f"  {key:<20} {value:>10.1f}" if isinstance(value, float) else f"  {key:<20} {value:>10}")
+    check = cancellation_check()
+    print(f"cancelled waiter: {check['admitted']}/3 later requests admitted, "
+          f"{check['cancelled']} cancelled, queue depth {check['queue_depth']}")
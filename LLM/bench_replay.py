@@ -0,0 +1,184 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Dict, List
+
+## LLM/bench_replay.py
+#
+# Replays a JSONL corpus of multi-turn conversations ({"id": ..., "turns": [...]}) through
+# LLM1.conversation_manager, one session per conversation, with the OpenAI client replaced
+# by fake_llm.FakeLLMClient and its latency drawn from --latency. Reports turns/s,
+# p50/p95/p99 turn latency, LLM calls per completed intent and peak traced memory, and
+# compares them with a stored baseline.
+#   python bench_replay.py                         run and compare with replay_baseline.json
+#   python bench_replay.py --save-baseline         run and overwrite the baseline
+#   python bench_replay.py --latency tail:30:500:0.05 --no-cascade
+#   python bench_replay.py --metrics               also print per-stage timings and tokens
+#   python bench_replay.py --turn-log turns.jsonl  replay sessions recorded by TURN_LOG_PATH
+# Every run first checks that a confirmed action ends the dialog (confirmation_check).
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import entity_extractor
+import instrumentation
+import LLM1
+from fake_llm import FakeLLMClient, parse_latency
+from session_store import SessionStore
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(HERE, "replay_corpus.jsonl")
+DEFAULT_BASELINE = os.path.join(HERE, "replay_baseline.json")
+# Responses that end an intent: a confirmed action, or an intent that needs no confirmation
+COMPLETED_PREFIXES = ("Confirmed.", "Querying info", "Welcome to")
+# Local-only turns take microseconds; smaller latency changes are timer noise
+MIN_LATENCY_DELTA_MS = 1.0
+
+
+def load_corpus(path: str) -> List[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def replay(conversations: List[dict], llm: FakeLLMClient, repeat: int) -> Dict:
+    LLM1.client = llm
+    LLM1.session_store = SessionStore()
+    LLM1.intent_cache.clear()
+    llm.calls = 0
+    latencies, completed = [], 0
+    start = time.perf_counter()
+    for round_no in range(repeat):
+        for conversation in conversations:
+            session_id = f"{conversation['id']}#{round_no}"
+            for turn in conversation["turns"]:
+                turn_start = time.perf_counter()
+                response = LLM1.conversation_manager(turn, session_id)
+                latencies.append(time.perf_counter() - turn_start)
+                completed += response.startswith(COMPLETED_PREFIXES)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "turns": len(latencies),
+        "turns_per_s": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "llm_calls": llm.calls,
+        "completed_intents": completed,
+        "llm_calls_per_intent": llm.calls / completed if completed else float("inf"),
+    }
+
+
+def confirmation_check() -> None:
+    # After "yes" the next message is a new request, not a slot value for the confirmed one
+    LLM1.client = FakeLLMClient()
+    LLM1.session_store = SessionStore()
+    turns = ["Create a liquidity pool with APT and USDC at 7% APY", "yes", "Join pool 12345"]
+    responses = [LLM1.conversation_manager(turn, "confirmation-check") for turn in turns]
+    assert responses[1].startswith("Confirmed."), responses
+    assert responses[2].startswith("Joining pool with ID 12345"), responses
+
+
+def peak_memory_kib(conversations: List[dict], llm: FakeLLMClient, repeat: int) -> float:
+    # Separate pass: tracemalloc slows every allocation, so it would skew the timings
+    tracemalloc.start()
+    try:
+        replay(conversations, llm, repeat)
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def regressions(metrics: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    found = []
+    if metrics["turns_per_s"] < baseline["turns_per_s"] * (1 - tolerance):
+        found.append("turns_per_s")
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        if metrics[key] > baseline[key] * (1 + tolerance) and metrics[key] - baseline[key] > MIN_LATENCY_DELTA_MS:
+            found.append(key)
+    if metrics["peak_kib"] > baseline["peak_kib"] * (1 + tolerance):
+        found.append("peak_kib")
+    # Deterministic for a given corpus and config, so any increase counts
+    if metrics["llm_calls_per_intent"] > baseline["llm_calls_per_intent"] + 1e-9:
+        found.append("llm_calls_per_intent")
+    return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--latency", default="lognormal:30:0.4", help="fake LLM latency spec, see fake_llm.parse_latency")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5, help="replays of the corpus, each with fresh session ids")
+    parser.add_argument("--no-cascade", action="store_true", help="send every new intent to the LLM")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--metrics", action="store_true", help="instrument LLM1 stages (see instrumentation.py)")
+    parser.add_argument("--turn-log", metavar="PATH", help="replay a production turn log (turn_log.py) instead of --corpus")
+    args = parser.parse_args()
+
+    confirmation_check()
+    LLM1.LOCAL_CASCADE_ENABLED = not args.no_cascade
+    LLM1.intent_cache.enabled = not args.no_cache
+    if args.metrics:
+        instrumentation.enable(LLM1, LLM1.METRIC_STAGES)
+        instrumentation.enable(entity_extractor, LLM1.EXTRACTOR_METRIC_STAGES)
+    if args.turn_log:
+        from turn_log import conversations_from_log, iter_records
+        conversations = conversations_from_log(iter_records(args.turn_log))
+    else:
+        conversations = load_corpus(args.corpus)
+    config = {key: getattr(args, key) for key in ("latency", "seed", "repeat", "no_cascade", "no_cache")}
+    config["corpus"] = os.path.basename(args.turn_log or args.corpus)
+
+    metrics = replay(conversations, FakeLLMClient(parse_latency(args.latency, args.seed)), args.repeat)
+    snapshot = instrumentation.snapshot()  # before the memory pass adds its own calls
+    metrics["peak_kib"] = peak_memory_kib(conversations, FakeLLMClient(parse_latency(args.latency, args.seed)), args.repeat)
+
+    print(f"{len(conversations)} conversations x {args.repeat}, fake LLM latency {args.latency} ms")
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        if stored["config"] == config:
+            baseline = stored["metrics"]
+        else:
+            print(f"baseline {args.baseline} was recorded with {stored['config']}; not comparing")
+    for key, value in metrics.items():
+        line = f"  {key:<22} {value:>12.2f}"
+        if baseline is not None and key in baseline and baseline[key]:
+            line += f"   baseline {baseline[key]:>12.2f}  ({(value / baseline[key] - 1) * 100:+.1f}%)"
+        print(line)
+
+    if args.metrics:
+        print(f"  {'stage':<34} {'calls':>7} {'mean ms':>9} {'total ms':>9}")
+        for name, stage in sorted(snapshot["stages"].items(), key=lambda item: -item[1]["total_ms"]):
+            print(f"  {name:<34} {stage['count']:>7} {stage['mean_ms']:>9.3f} {stage['total_ms']:>9.1f}")
+        for name, usage in snapshot["tokens"].items():
+            print(f"  tokens {name}: {usage}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"config": config, "metrics": metrics}, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if baseline is not None:
+        failed = regressions(metrics, baseline, args.tolerance)
+        if failed:
+            print(f"REGRESSION (> {args.tolerance:.0%}): {', '.join(failed)}")
+            return 1
+        print("no regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import sys
+import time
+
+import numpy as np
+
+from semantic_cache import HashingEmbedder, SemanticCache, TransformerEmbedder
+
+## LLM/bench_semantic_cache.py
+#
+# 1. Paraphrase reuse: seeds the cache with one phrasing per intent, then looks up
+#    paraphrases and near misses; reports hit rate and how many hits returned the wrong
+#    intent, per threshold (LLM1's SEMANTIC_CACHE_THRESHOLD defaults come from this table).
+# 2. Lookup cost: the vectorized nearest neighbour over a full matrix vs a Python loop.
+# Run with: python bench_semantic_cache.py [transformer]   (default: hashing embedder)
+
+SEEDS = [
+    ("Create a liquidity pool with APT and USDC at 7% APY", "create_pool"),
+    ("Launch a new token named CryptoGold with a supply of 1000000", "create_token"),
+    ("Join pool 12345", "join_pool"),
+    ("What is the status of pool 42?", "query_info"),
+    ("Help me with DeFi basics", "general_help"),
+]
+PARAPHRASES = [
+    ("make a pool APT/USDC 7%", "create_pool"),
+    ("create APT-USDC pool at 7% APY", "create_pool"),
+    ("Create a liquidity pool with ETH and USDT at 12% APY", "create_pool"),
+    ("launch a token named Ember with a supply of 500", "create_token"),
+    ("Launch new token named Nova, supply of 42", "create_token"),
+    ("join pool 987", "join_pool"),
+    ("Please join pool 31", "join_pool"),
+    ("what's the status of pool 7", "query_info"),
+    ("help me with defi basics please", "general_help"),
+    ("I need help with DeFi", "general_help"),
+    # Near misses: close in wording to a seed of another intent (None: nothing should match)
+    ("What is the status of token CryptoGold?", "query_info"),
+    ("Create a token named PoolCoin with a supply of 7", "create_token"),
+    ("Leave pool 12345", None),
+    ("Withdraw my liquidity from the APT and USDC pool", None),
+]
+
+
+def paraphrase_table(embed, dim: int) -> None:
+    print(f"{'threshold':>9} {'hit rate':>9} {'wrong intent':>13}")
+    for threshold in (0.5, 0.6, 0.65, 0.7, 0.75, 0.8, 0.9, 0.95):
+        cache = SemanticCache(embed, dim, capacity=64, threshold=threshold)
+        for text, intent in SEEDS:
+            cache.store(text, intent)
+        wrong = 0
+        for text, expected in PARAPHRASES:
+            hit = cache.lookup(text)
+            if hit is not None and hit["intent"] != expected:
+                wrong += 1
+        print(f"{threshold:>9.2f} {cache.stats()['hit_rate']:>9.0%} {wrong:>13}")
+
+
+def lookup_cost(dim: int) -> None:
+    rng = np.random.default_rng(0)
+    print(f"\n{'rows':>7} {'vectorized us':>14} {'python loop us':>15}")
+    for rows in (1_000, 10_000):
+        matrix = rng.standard_normal((rows, dim)).astype(np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        query = matrix[rows // 2]
+
+        start = time.perf_counter()
+        for _ in range(100):
+            int((matrix @ query).argmax())
+        vectorized = (time.perf_counter() - start) / 100
+
+        vectors = list(matrix)
+        start = time.perf_counter()
+        max(range(rows), key=lambda i: float(np.dot(vectors[i], query)))
+        loop = time.perf_counter() - start
+        print(f"{rows:>7} {vectorized * 1e6:>14.1f} {loop * 1e6:>15.1f}")
+
+
+if __name__ == "__main__":
+    embed = TransformerEmbedder() if sys.argv[1:] == ["transformer"] else HashingEmbedder()
+    print(f"embedder: {type(embed).__name__} ({embed.dim} dims)")
+    paraphrase_table(embed, embed.dim)
+    lookup_cost(embed.dim)
@@ -0,0 +1,107 @@
+import http.client
+import json
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+import time
+
+## LLM/bench_server.py
+#
+# Local load test for server.py: starts it with the OpenAI call stubbed (--stub-llm),
+# replays replay_corpus.jsonl conversations from several client processes over keep-alive
+# connections, and reports turns/s and latency for 1 worker vs one per core.
+# Run with: python bench_server.py [stub_latency_spec] [seconds]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CLIENT_PROCESSES = max(2, os.cpu_count() or 1)
+CONNECTIONS_PER_PROCESS = 8
+
+
+def load_conversations() -> list:
+    with open(os.path.join(HERE, "replay_corpus.jsonl")) as f:
+        return [json.loads(line)["turns"] for line in f if line.strip()]
+
+
+def client_worker(args) -> list:
+    port, seconds, offset = args
+    import threading
+
+    conversations = load_conversations()
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def run(connection_no: int) -> None:
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        i = offset * CONNECTIONS_PER_PROCESS + connection_no
+        while time.monotonic() < deadline:
+            session_id = f"load-{offset}-{connection_no}-{i}"
+            for turn in conversations[i % len(conversations)]:
+                start = time.perf_counter()
+                conn.request("POST", "/chat", json.dumps({"message": turn, "session_id": session_id}),
+                             {"Content-Type": "application/json"})
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    raise RuntimeError(f"HTTP {response.status}")
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+            i += 1
+        conn.close()
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(CONNECTIONS_PER_PROCESS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def start_server(workers: int, stub: str, session_db: str):
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "server.py"), "--port", "0", "--workers", str(workers),
+         "--stub-llm", stub, "--session-db", session_db],
+        stdout=subprocess.PIPE, text=True,
+    )
+    port = int(re.search(r":(\d+) with", proc.stdout.readline()).group(1))
+    for _ in range(50):
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                break
+        except OSError:
+            time.sleep(0.1)
+    return proc, port
+
+
+def measure(workers: int, stub: str, seconds: float) -> dict:
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        proc, port = start_server(workers, stub, os.path.join(tmp, "sessions.db"))
+        try:
+            start = time.perf_counter()
+            with multiprocessing.Pool(CLIENT_PROCESSES) as pool:
+                results = pool.map(client_worker, [(port, seconds, n) for n in range(CLIENT_PROCESSES)])
+            elapsed = time.perf_counter() - start
+        finally:
+            proc.terminate()
+            proc.wait(30)
+    latencies = sorted(latency for chunk in results for latency in chunk)
+    pick = lambda pct: latencies[min(len(latencies) - 1, int(len(latencies) * pct))] * 1000
+    return {"turns_per_s": len(latencies) / elapsed, "p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+
+
+if __name__ == "__main__":
+    stub = sys.argv[1] if len(sys.argv) > 1 else "lognormal:30:0.4"
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    cores = os.cpu_count() or 1
+    print(f"stubbed LLM latency {stub} ms, {CLIENT_PROCESSES}x{CONNECTIONS_PER_PROCESS} client connections, "
+          f"{seconds:.0f} s per row, {cores} cores")
+    print(f"{'workers':>7} {'turns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for workers in sorted({1, cores}):
+        row = measure(workers, stub, seconds)
+        print(f"{workers:>7} {row['turns_per_s']:>9.0f} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}")
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import time
+import tracemalloc
+
+from session_store import DialogState, MemorySessionBackend, SessionStore, SQLiteSessionBackend
+
+## LLM/bench_session_store.py
+#
+# Memory per idle session and get/save cost for each SessionStore backend.
+# Run with: python bench_session_store.py
+
+
+class LegacyDialogState:
+    # Shape of the old module-level DialogState (per-instance __dict__, no confirmation flag)
+    def __init__(self):
+        self.current_intent = None
+        self.collected_entities = {}
+        self.waiting_for = None
+
+
+def bytes_per_session(factory, n: int = 50000) -> float:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    sessions = {f"session-{i:08d}": factory() for i in range(n)}
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    keys_and_table = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del sessions
+    return keys_and_table / n
+
+
+def store_ops_per_sec(store: SessionStore, n: int = 20000) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        sid = f"s{i % 1000}"
+        state = store.get(sid)
+        state.collected_entities["pool_id"] = str(i)
+        store.save(sid, state)
+    return n / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    print("memory per idle session (incl. session-id key and mapping slot):")
+    legacy = bytes_per_session(LegacyDialogState)
+    compact = bytes_per_session(DialogState)
+    print(f"  legacy __dict__ DialogState : {legacy:7.0f} B")
+    print(f"  __slots__ DialogState       : {compact:7.0f} B  ({1 - compact / legacy:.0%} smaller)")
+
+    print("get+save turns/sec:")
+    print(f"  memory backend : {store_ops_per_sec(SessionStore(MemorySessionBackend())):>10.0f}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sessions.db")
+        sqlite_store = SessionStore(SQLiteSessionBackend(path))
+        print(f"  sqlite backend : {store_ops_per_sec(sqlite_store):>10.0f}")
+
+        # Survives a restart: reopen the same file
+        state = sqlite_store.get("alice")
+        state.current_intent, state.waiting_for = "create_pool", "apy"
+        sqlite_store.save("alice", state)
+        sqlite_store.backend.close()
+        reopened = SessionStore(SQLiteSessionBackend(path)).get("alice")
+        print(f"  reopened sqlite session    : {reopened}")
+        assert reopened.current_intent == "create_pool" and reopened.waiting_for == "apy"
+
+    bounded = SessionStore(max_sessions=100, idle_timeout=0.05)
+    for i in range(1000):
+        bounded.save(f"u{i}", bounded.get(f"u{i}"))
+    print(f"max_sessions=100 after 1000 sessions: {len(bounded)} kept, {bounded.evictions} evicted")
+    time.sleep(0.06)
+    print(f"idle sweep after timeout: {bounded.sweep()} evicted, {len(bounded)} kept")
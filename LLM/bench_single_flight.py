@@ -0,0 +1,72 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+## LLM/bench_single_flight.py
+#
+# "Help storm": many sessions send the same few messages at the same moment, with the
+# local cascade off so each one needs the LLM and the intent cache still cold. Counts
+# upstream calls and wall time with single-flight coalescing off and on, for threads
+# (conversation_manager) and one event loop (conversation_manager_async).
+# Run with: python bench_single_flight.py [sessions] [latency_spec]
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import LLM1
+from fake_llm import FakeAsyncLLMClient, FakeLLMClient, parse_latency
+from session_store import SessionStore
+from single_flight import SingleFlight
+
+MESSAGES = ["what can you do for me today", "join pool 4411 please", "tell me about pool 4411"]
+
+
+def reset(enabled: bool) -> None:
+    LLM1.SINGLE_FLIGHT_ENABLED = enabled
+    LLM1.single_flight = SingleFlight(copy=LLM1._coalesced)
+    LLM1.intent_cache.clear()
+    LLM1.session_store = SessionStore()
+
+
+def storm_threads(sessions: int, latency: str) -> tuple:
+    LLM1.client = FakeLLMClient(parse_latency(latency, seed=1))
+    barrier = threading.Barrier(sessions)
+
+    def session(n: int) -> None:
+        barrier.wait()
+        LLM1.conversation_manager(MESSAGES[n % len(MESSAGES)], f"storm-{n}")
+
+    threads = [threading.Thread(target=session, args=(n,)) for n in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return LLM1.client.calls, time.perf_counter() - start
+
+
+def storm_async(sessions: int, latency: str) -> tuple:
+    LLM1.async_client = FakeAsyncLLMClient(parse_latency(latency, seed=1))
+
+    async def main() -> None:
+        await asyncio.gather(*(LLM1.conversation_manager_async(MESSAGES[n % len(MESSAGES)], f"storm-{n}")
+                               for n in range(sessions)))
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    return LLM1.async_client.calls, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = sys.argv[2] if len(sys.argv) > 2 else "lognormal:300:0.3"
+    LLM1.LOCAL_CASCADE_ENABLED = False
+    print(f"{sessions} sessions, {len(MESSAGES)} distinct messages, LLM latency {latency} ms")
+    print(f"{'mode':<8} {'single-flight':<14} {'upstream calls':>14} {'coalesced':>10} {'wall s':>8}")
+    for mode, storm in [("threads", storm_threads), ("async", storm_async)]:
+        for enabled in (False, True):
+            reset(enabled)
+            calls, elapsed = storm(sessions, latency)
+            print(f"{mode:<8} {'on' if enabled else 'off':<14} {calls:>14} "
+                  f"{LLM1.single_flight.stats['coalesced']:>10} {elapsed:>8.2f}")
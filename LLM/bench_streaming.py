@@ -0,0 +1,65 @@
+import json
+import os
+import statistics
+import sys
+import time
+
+from fake_openai_server import FakeOpenAIServer, guess_intent, prompt_user_text
+
+## LLM/bench_streaming.py
+#
+# Time-to-first-decision for recognize_intent vs recognize_intent_streaming against the
+# local fake SSE endpoint. The fake echoes all eight entity keys like the real prompt asks
+# for, so cancelling once the intent's own entities are in skips the tail of the answer.
+# Both modes pay the same generation time per chunk; blocking just waits for all of it.
+# Run with: python bench_streaming.py [token_delay_seconds]
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["INTENT_CACHE_ENABLED"] = "0"
+
+import LLM1
+from openai import OpenAI
+
+ENTITY_KEYS = ["token1", "token2", "apy", "token_name", "supply", "pool_id", "entity_type", "entity_id"]
+INPUTS = [
+    "Join pool 12345",
+    "Create a liquidity pool with APT and USDC at 7% APY",
+    "Launch a new token named CryptoGold with a supply of 1000000",
+    "Help me with DeFi basics",
+]
+ROUNDS = 5
+
+
+def full_schema_responder(body: dict) -> str:
+    guessed = guess_intent(prompt_user_text(body))
+    entities = {key: guessed["entities"].get(key) for key in ENTITY_KEYS}
+    return json.dumps({"intent": guessed["intent"], "entities": entities}, indent=2)
+
+
+def measure(fn) -> dict:
+    first_decision, total = [], []
+    for _ in range(ROUNDS):
+        for text in INPUTS:
+            start = time.perf_counter()
+            decided = []
+            fn(text, lambda intent: decided.append(time.perf_counter()))
+            end = time.perf_counter()
+            first_decision.append((decided[0] if decided else end) - start)
+            total.append(end - start)
+    return {"decision_ms": statistics.median(first_decision) * 1000, "total_ms": statistics.median(total) * 1000}
+
+
+if __name__ == "__main__":
+    token_delay = float(sys.argv[1]) if len(sys.argv) > 1 else 0.01
+    with FakeOpenAIServer(latency=0.05, token_delay=token_delay, responder=full_schema_responder) as server:
+        LLM1.client = OpenAI(base_url=server.base_url, api_key="test", max_retries=0)
+
+        blocking = measure(lambda text, cb: cb(LLM1.recognize_intent(text)["intent"]))
+        streaming = measure(lambda text, cb: LLM1.recognize_intent_streaming(text, on_intent=cb, cancel_when_complete=False))
+        cancelling = measure(lambda text, cb: LLM1.recognize_intent_streaming(text, on_intent=cb))
+
+    print(f"50 ms to first token, {token_delay * 1000:.0f} ms per 4-char chunk (medians over {ROUNDS * len(INPUTS)} turns)")
+    print(f"{'mode':<22} {'first decision ms':>18} {'turn done ms':>13}")
+    for name, row in (("blocking", blocking), ("streaming", streaming), ("streaming + cancel", cancelling)):
+        print(f"{name:<22} {row['decision_ms']:>18.1f} {row['total_ms']:>13.1f}")
+    print(f"streams cancelled early: {server.streams_cancelled}")
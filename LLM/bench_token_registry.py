@@ -0,0 +1,133 @@
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+## LLM/bench_token_registry.py
+#
+# token_registry.TokenRegistry lookup cost (exact, fuzzy cold, memoized), entity extraction
+# with and without the registry, how many pool requests written with names or typos the local
+# cascade stage can answer on its own (instead of escalating to the LLM), and how many requests
+# with English words that look like tokens ("either", "the apt move") it answers wrongly; those
+# must escalate.
+# English prose is the held-out check: every sentence of the given text files (default: the
+# Python language reference shipped with the interpreter, which the rules were not tuned on)
+# goes through the extractor, and each symbol read from a word that isn't an all-caps ticker
+# counts as an English word taken for a token. For scale, the same words are also counted
+# when every one of them is looked up with fuzzy matching, i.e. without the position cues.
+# Run with: python bench_token_registry.py [english_text_file ...]
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import entity_extractor
+import LLM1
+from token_registry import load_registry
+
+UTTERANCES = [
+    "create a pool with apt and usdc at 5% APY",
+    "Create a liquidity pool with APT and USCD at 7% APY",
+    "make a pool with ethereum and tether at 3% apy",
+    "open a pool for wbtc and usdt with 4% APY",
+    "create a liquidity pool with Solana and USDC at 6%",
+    "start a pool with APT and USDT at 12% APY",
+    "create a liquidity pool pairing etherium and dai at 2%",
+    "make a liquidity pool with thl and apt at 9% APY",
+]
+# (utterance, the tokens it names)
+LOOKALIKES = [
+    ("create a pool with either APT or USDC at 5%", ("APT", "USDC")),
+    ("I think the apt move is to create a pool with APT and USDC at 5%", ("APT", "USDC")),
+    ("Either way, create a pool with SOL and USDT at 4%", ("SOL", "USDT")),
+    ("CREATE A POOL WITH APT AND USDC AT 5% APY", ("APT", "USDC")),
+    ("I USED to have USDC, make a pool with it and APT at 3%", ("USDC", "APT")),
+    ("start a pool with the other APT and USDT at 6%", ("APT", "USDT")),
+    ("create a pool with APT and APT at 5%", ("APT", "APT")),
+    ("optimise my yield: create a pool with ETH and DAI at 8%", ("ETH", "DAI")),
+]
+ROUNDS = 2000
+
+
+def per_call_us(fn, args: list, rounds: int = ROUNDS) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for arg in args:
+            fn(arg)
+    return (time.perf_counter() - start) / (rounds * len(args)) * 1e6
+
+
+def cold_fuzzy_us(words: list) -> float:
+    registry = load_registry()
+    start = time.perf_counter()
+    for word in words:
+        registry.resolve(word)
+    return (time.perf_counter() - start) / len(words) * 1e6
+
+
+def local_answers(utterances: list) -> int:
+    return sum(1 for text in utterances
+               if LLM1.recognize_intent_local(text)[1] >= LLM1.LOCAL_MIN_CONFIDENCE)
+
+
+def wrong_local_answers(cases: list) -> int:
+    """Requests answered locally with tokens other than the ones named (a pool of X with X never counts as right)."""
+    wrong = 0
+    for text, tokens in cases:
+        result, confidence = LLM1.recognize_intent_local(text)
+        entities = result["entities"]
+        if confidence >= LLM1.LOCAL_MIN_CONFIDENCE and (
+                (entities.get("token1"), entities.get("token2")) != tokens or tokens[0] == tokens[1]):
+            wrong += 1
+    return wrong
+
+
+def english_corpus(paths: list) -> list:
+    sentences = []
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            sentences += [s for s in re.split(r"[.!?\n]+", f.read()) if s.strip()]
+    return sentences
+
+
+def english_taken_for_tokens(sentences: list, registry) -> tuple:
+    """(words, Counter of "word->SYMBOL" with cues, the same without cues)"""
+    words, cued, uncued = 0, Counter(), Counter()
+    for sentence in sentences:
+        for match in entity_extractor._WORD.finditer(sentence):
+            words += 1
+            word = match.group()
+            symbol = registry.resolve(word)
+            if symbol and not word.isupper():
+                uncued[f"{word}->{symbol}"] += 1
+        for span in entity_extractor.extract(sentence).spans:
+            word = sentence[span.start:span.end]
+            if span.name == "symbol" and span.value in registry.tokens and not word.isupper():
+                cued[f"{word}->{span.value}"] += 1
+    return words, cued, uncued
+
+
+if __name__ == "__main__":
+    registry = load_registry()
+    print(f"{len(registry)} tokens")
+    print(f"resolve exact (memoized)    {per_call_us(registry.resolve, ['usdc', 'APT', 'Ethereum']):8.2f} us")
+    print(f"resolve fuzzy (memoized)    {per_call_us(registry.resolve, ['USCD', 'etherium', 'solanna']):8.2f} us")
+    print(f"resolve fuzzy (cold)        {cold_fuzzy_us(['USCD', 'etherium', 'solanna', 'tetherr', 'liquidity']):8.2f} us")
+
+    rows = {}
+    for name, value in [("regex only", None), ("registry", registry)]:
+        entity_extractor.use_registry(value)
+        LLM1.token_registry = value
+        rows[name] = (per_call_us(entity_extractor.extract, UTTERANCES, 500), local_answers(UTTERANCES),
+                      wrong_local_answers(LOOKALIKES))
+    print(f"{'':<12} {'extract us':>11} {'answered locally':>17} {'lookalikes wrong':>17}")
+    for name, (extract_us, local, wrong) in rows.items():
+        print(f"{name:<12} {extract_us:>11.2f} {local:>9}/{len(UTTERANCES)} {wrong:>12}/{len(LOOKALIKES)}")
+
+    import pydoc_data.topics
+    paths = sys.argv[1:] or [pydoc_data.topics.__file__]
+    words, cued, uncued = english_taken_for_tokens(english_corpus(paths), registry)
+    print(f"English held-out text: {words} words from {len(paths)} file(s)")
+    for name, found in (("position cues", cued), ("no cues, fuzzy everywhere", uncued)):
+        total = sum(found.values())
+        print(f"  {name:<26} {total:>6} words taken for tokens ({total / words * 1e4:.1f} per 10k)  "
+              + ", ".join(f"{key} x{n}" for key, n in found.most_common(6)))
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+from fake_openai_server import FakeOpenAIServer
+
+## LLM/bench_transport.py
+#
+# Resilience of recognize_intent against the local fake endpoint with injected tail
+# latency and errors:
+#   tail     5% of requests take 20x longer; plain vs hedged after the observed p95
+#   errors   a share of requests return 500; single attempt vs jittered retries
+#   outage   every request fails; how long turns take once the breaker opens and
+#            answers come from the local recognizer instead
+# probe_release_check: a half-open probe that is cancelled (asyncio.wait_for) or
+# interrupted must not leave the breaker rejecting every later call.
+# Run with: python bench_transport.py [turns]
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["INTENT_CACHE_ENABLED"] = "0"
+
+import LLM1
+from llm_transport import CircuitBreaker, Transport, create_openai_client
+
+TEXTS = [
+    "Create a liquidity pool with APT and USDC at 7% APY",
+    "Launch a new token named CryptoGold with a supply of 1000000",
+    "Join pool 12345",
+    "What's the status of pool 42?",
+]
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda pct: ordered[min(len(ordered) - 1, int(len(ordered) * pct))] * 1000
+    return pick(0.5), pick(0.95), pick(0.99)
+
+
+def run(transport: Transport, turns: int):
+    LLM1.transport = transport
+    fallback_before = LLM1.cascade_stats["fallback"]
+    latencies = []
+    for i in range(turns):
+        start = time.perf_counter()
+        LLM1.recognize_intent(TEXTS[i % len(TEXTS)])
+        latencies.append(time.perf_counter() - start)
+    return latencies, LLM1.cascade_stats["fallback"] - fallback_before
+
+
+def report(name: str, latencies, fallbacks: int, transport: Transport) -> None:
+    p50, p95, p99 = percentiles(latencies)
+    print(f"{name:<28} {p50:8.1f} {p95:8.1f} {p99:8.1f} {statistics.mean(latencies) * 1000:8.1f} "
+          f"{fallbacks:>9} {transport.stats['retries']:>7} {transport.stats['hedges']:>6}")
+
+
+def probe_release_check() -> None:
+    def half_open_transport() -> Transport:
+        transport = Transport(max_attempts=1, breaker=CircuitBreaker(1, reset_timeout=0))
+        transport.breaker.record_failure()  # open; reset_timeout=0 lets the next call probe
+        return transport
+
+    async def slow_call():
+        await asyncio.sleep(1)
+
+    async def cancelled_probe(transport: Transport) -> None:
+        try:
+            await asyncio.wait_for(transport.acall(slow_call), timeout=0.01)
+        except asyncio.TimeoutError:
+            pass
+        assert await transport.acall(lambda: asyncio.sleep(0, "ok")) == "ok"
+
+    transport = half_open_transport()
+    asyncio.run(cancelled_probe(transport))
+    assert transport.breaker.state == "closed"
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    transport = half_open_transport()
+    try:
+        transport.call(interrupted)
+    except KeyboardInterrupt:
+        pass
+    assert transport.call(lambda: "ok") == "ok" and transport.breaker.state == "closed"
+    print("probe release: cancelled and interrupted half-open probes let the next call through")
+
+
+def main(turns: int) -> None:
+    probe_release_check()
+    rng = random.Random(7)
+    tail = lambda: 0.5 if rng.random() < 0.05 else 0.025
+    print(f"{turns} sequential turns per row; times in ms")
+    print(f"{'scenario':<28} {'p50':>8} {'p95':>8} {'p99':>8} {'mean':>8} {'fallbacks':>9} {'retries':>7} {'hedges':>6}")
+
+    with FakeOpenAIServer(latency=tail, seed=1) as server:
+        LLM1.client = create_openai_client("test", base_url=server.base_url)
+        run(Transport(max_attempts=1), 10)  # open the keep-alive connections
+        for name, transport in (("tail: plain", Transport(max_attempts=1)),
+                                ("tail: hedged at p95", Transport(max_attempts=1, hedge=True))):
+            report(name, *run(transport, turns), transport)
+
+    with FakeOpenAIServer(latency=0.025, error_rate=0.2, seed=2) as server:
+        LLM1.client = create_openai_client("test", base_url=server.base_url)
+        for name, transport in (("20% errors: 1 attempt", Transport(max_attempts=1, breaker=CircuitBreaker(10 ** 9))),
+                                ("20% errors: 3 attempts", Transport(max_attempts=3, base_delay=0.01))):
+            report(name, *run(transport, turns), transport)
+
+    with FakeOpenAIServer(latency=0.025, error_rate=1.0) as server:
+        LLM1.client = create_openai_client("test", base_url=server.base_url)
+        for name, transport in (("outage: no breaker", Transport(max_attempts=3, base_delay=0.01,
+                                                                 breaker=CircuitBreaker(10 ** 9))),
+                                ("outage: breaker", Transport(max_attempts=3, base_delay=0.01,
+                                                              breaker=CircuitBreaker(5, reset_timeout=30)))):
+            report(name, *run(transport, turns), transport)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,80 @@
+import json
+import os
+import sys
+import tempfile
+import time
+
+## LLM/bench_turn_log.py
+#
+# Cost of logging a turn and of reading the log back.
+#   write: caller-side time per record for TurnLogWriter.append (queue + background batches)
+#          vs serializing, writing and flushing each record on the caller's thread. The queue
+#          is sized to hold the whole run; the same burst into the default queue_size is
+#          reported separately with the records it drops.
+#   read:  records/s for turn_log.iter_records (mmap) vs a plain `for line in file` loop
+# Run with: python bench_turn_log.py [records]
+
+from turn_log import TurnLogWriter, iter_records
+
+
+def make_record(i: int) -> dict:
+    return {"ts": time.time(), "session_id": f"s{i % 500}", "input": "Create a pool with ETH and USDC at 5% APY",
+            "response": "Please confirm creating a pool for ETH/USDC with 5% APY.", "intent": "create_pool",
+            "entities": {"token1": "ETH", "token2": "USDC", "apy": "5"}, "source": "llm",
+            "recognize_ms": 31.2, "total_ms": 31.9, "usage": {"prompt_tokens": 412, "completion_tokens": 18}}
+
+
+def sync_writes(path: str, records: list) -> float:
+    with open(path, "ab") as f:
+        start = time.perf_counter()
+        for record in records:
+            f.write(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+            f.flush()
+        return time.perf_counter() - start
+
+
+def async_writes(path: str, records: list, queue_size: int):
+    writer = TurnLogWriter(path, max_bytes=1 << 40, queue_size=queue_size)
+    start = time.perf_counter()
+    for record in records:
+        writer.append(record)
+    caller = time.perf_counter() - start
+    writer.close()
+    return caller, time.perf_counter() - start, writer.stats()
+
+
+def plain_read(path: str) -> int:
+    count = 0
+    with open(path, "rb") as f:
+        for line in f:
+            json.loads(line)
+            count += 1
+    return count
+
+
+def timed_read(fn) -> tuple:
+    start = time.perf_counter()
+    count = fn()
+    return count, count / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    records = [make_record(i) for i in range(n)]
+    with tempfile.TemporaryDirectory() as tmp:
+        sync_s = sync_writes(os.path.join(tmp, "sync.jsonl"), records)
+        path = os.path.join(tmp, "turns.jsonl")
+        caller_s, total_s, stats = async_writes(path, records, queue_size=n)
+        _, _, default_stats = async_writes(os.path.join(tmp, "default.jsonl"), records, queue_size=100_000)
+        print(f"{n} records, {os.path.getsize(path) / 1e6:.1f} MB")
+        print(f"{'write':<22} {'us/record (caller)':>19}")
+        print(f"{'sync write+flush':<22} {sync_s / n * 1e6:>19.2f}")
+        print(f"{'TurnLogWriter.append':<22} {caller_s / n * 1e6:>19.2f}   (drained in {total_s:.2f} s, {stats})")
+        print(f"same burst into the default 100000-record queue: {default_stats['written']} written, "
+              f"{default_stats['dropped']} dropped")
+        mmap_count, mmap_rate = timed_read(lambda: sum(1 for _ in iter_records(path)))
+        plain_count, plain_rate = timed_read(lambda: plain_read(path))
+        assert mmap_count == plain_count == stats["written"], (mmap_count, plain_count, stats)
+        print(f"{'read':<22} {'records/s':>19}")
+        print(f"{'plain line loop':<22} {plain_rate:>19.0f}")
+        print(f"{'iter_records (mmap)':<22} {mmap_rate:>19.0f}")
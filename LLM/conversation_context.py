@@ -0,0 +1,96 @@
+import re
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+## LLM/conversation_context.py
+#
+# Per-session context for LLM intent recognition, so a follow-up such as "make it 9%
+# instead" can be read against the request it refers to.
+#   - recent turns are kept as rendered lines in a ring buffer (deque with maxlen)
+#   - each line's token count is taken once, when the turn is added, with the model's
+#     tokenizer (tiktoken) if installed, else a local approximation
+#   - turns pushed out of the buffer or over the token budget are folded into a summary
+#     that holds only the latest intent and its entities, so the rendered context (and the
+#     prompt) stays within budget however long the conversation runs
+# to_dict()/from_dict() keep it JSON-serializable for the SQLite session backend.
+
+TOKENIZER_ENCODING = "o200k_base"  # gpt-4o / gpt-4o-mini
+
+# BPE-like approximation: a short word or a punctuation mark is one token, longer words one per 4 characters
+_PIECE = re.compile(r"\w{1,4}|[^\w\s]")
+
+# A pasted essay must not take the whole budget as one unfoldable turn
+MAX_TURN_CHARS = 200
+
+_encoder = None  # False once tiktoken turned out to be unavailable
+
+
+def count_tokens(text: str) -> int:
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except (ImportError, OSError):  # not installed, or the encoding file can't be fetched
+            _encoder = False
+    if _encoder:
+        return len(_encoder.encode(text))
+    return len(_PIECE.findall(text))
+
+
+def _entities_text(entities: Dict) -> str:
+    return " ".join(f"{name}={value}" for name, value in entities.items())
+
+
+class ConversationContext:
+    __slots__ = ("turns", "summary", "token_budget", "_summary_tokens")
+
+    def __init__(self, max_turns: int = 6, token_budget: int = 120, turns: Iterable[list] = (),
+                 summary: Optional[Dict] = None):
+        self.turns = deque(turns, maxlen=max_turns)  # [rendered line, tokens, intent, entities]
+        self.summary = summary  # {"intent": ..., "entities": {...}} for everything folded so far
+        self.token_budget = token_budget
+        self._summary_tokens = count_tokens(self._summary_line()) if summary else 0
+
+    def add(self, text: str, intent: Optional[str], entities: Dict) -> None:
+        entities = {name: value for name, value in (entities or {}).items() if value}
+        line = f'User: "{text[:MAX_TURN_CHARS]}" -> {intent or "unclear"}'
+        if entities:
+            line += " " + _entities_text(entities)
+        if len(self.turns) == self.turns.maxlen:
+            self._fold(self.turns[0])
+        self.turns.append([line, count_tokens(line), intent, entities])
+        while len(self.turns) > 1 and self.tokens() > self.token_budget:
+            self._fold(self.turns.popleft())
+
+    def _fold(self, turn: list) -> None:
+        _, _, intent, entities = turn
+        if intent is None and not entities:
+            return
+        if self.summary is None or (intent is not None and intent != self.summary["intent"]):
+            self.summary = {"intent": intent, "entities": dict(entities)}
+        else:
+            self.summary["entities"].update(entities)
+        self._summary_tokens = count_tokens(self._summary_line())
+
+    def _summary_line(self) -> str:
+        return f'Earlier: {self.summary["intent"] or "unclear"} {_entities_text(self.summary["entities"])}'.rstrip()
+
+    def tokens(self) -> int:
+        return self._summary_tokens + sum(turn[1] for turn in self.turns)
+
+    def render(self) -> str:
+        lines = [self._summary_line()] if self.summary else []
+        lines.extend(turn[0] for turn in self.turns)
+        return "\n".join(lines)
+
+    def __bool__(self) -> bool:
+        return bool(self.turns) or self.summary is not None
+
+    def to_dict(self) -> Dict:
+        return {"max_turns": self.turns.maxlen, "token_budget": self.token_budget,
+                "turns": [list(turn) for turn in self.turns], "summary": self.summary}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ConversationContext":
+        return cls(data["max_turns"], data["token_budget"], data["turns"], data["summary"])
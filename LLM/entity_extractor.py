@@ -0,0 +1,206 @@
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+## LLM/entity_extractor.py
+#
+# Single-pass entity extraction for the DeFi intents. Every entity pattern is compiled
+# into one alternation and the text is scanned once with finditer. Entity values are
+# captured inside lookaheads so the scan can still see them (e.g. "token APT" yields both
+# the entity id and the APT symbol), which keeps results identical to the separate
+# re.findall/re.search extractors this replaces:
+#   symbols      \b[A-Z]{2,5}\b      all of them, in order
+#   apy          (\d+(?:\.\d+)?)%    first, decimals included ("3.5%")
+#   supply       supply of (\d+)     first
+#   token_name   named (\w+)         first
+#   pool_id      pool (\d+)          first
+#   entity_type/entity_id  \b([Tt]oken|[Pp]ool) (\w+), first
+# With a token registry installed (use_registry), symbols come from a second pass over the
+# words instead: known symbols and names resolve to the canonical symbol ("APT",
+# "Ethereum"), unknown all-caps tickers are kept as before, and the registry's reserved
+# words ("APY") are dropped. Where the text puts a token pair ("with apt and usdc",
+# "between X and Y", "X/Y") or answers a token question (lowercase_symbols=True), lowercase
+# words are looked up too and typos resolve ("USCD", "etherium"). Elsewhere a lowercase
+# word is too often plain English ("the apt move") and an English word too often one edit
+# from a token ("either" -> ether), so neither is tried.
+
+_ENTITY_PATTERN = re.compile(
+    # Cheap first-character guard so most positions are rejected before trying each branch
+    r"(?=[A-Z0-9snTtPp])(?:"
+    r"(?P<symbol>\b[A-Z]{2,5}\b)"
+    r"|(?P<apy>\d+(?:\.\d+)?)%"
+    r"|supply of (?=(?P<supply>\d+))"
+    r"|named (?=(?P<token_name>\w+))"
+    r"|(?P<entity_type>[Tt]oken|[Pp]ool) (?=(?P<entity_id>\w+))"
+    r")"
+)
+_LEADING_DIGITS = re.compile(r"\d+")
+_WORD = re.compile(r"\b[A-Za-z][A-Za-z0-9]{1,19}\b")
+_TICKER = re.compile(r"[A-Z]{2,5}")
+# Where a pool request names its two tokens
+_TOKEN_PAIR = re.compile(
+    r"\b(?:with|for|between|pairing|of)\s+(?P<first>[A-Za-z]\w*)\s*(?:and|or|&|,|/)\s*(?P<second>[A-Za-z]\w*)"
+    r"|\b(?P<left>[A-Za-z]\w*)/(?P<right>[A-Za-z]\w*)\b",
+    re.IGNORECASE,
+)
+
+_registry = None
+
+# Never produced by the pattern, so it separates texts in bulk mode
+_SEPARATOR = "\x00"
+
+
+class EntitySpan(NamedTuple):
+    name: str
+    value: str
+    start: int
+    end: int
+
+
+class Extraction:
+    """Everything found in one utterance, plus the spans it came from."""
+
+    __slots__ = ("symbols", "apy", "supply", "token_name", "pool_id", "entity_type", "entity_id", "spans")
+
+    def __init__(self):
+        self.symbols: List[str] = []
+        self.apy: Optional[str] = None
+        self.supply: Optional[str] = None
+        self.token_name: Optional[str] = None
+        self.pool_id: Optional[str] = None
+        self.entity_type: Optional[str] = None
+        self.entity_id: Optional[str] = None
+        self.spans: List[EntitySpan] = []
+
+    def _add(self, match: "re.Match", offset: int) -> None:
+        kind = match.lastgroup
+        if kind == "symbol":
+            value = match.group(kind)
+            self.symbols.append(value)
+            self.spans.append(EntitySpan(kind, value, match.start() - offset, match.end() - offset))
+        elif kind == "entity_id":
+            # lastgroup is the last group to close; the same match also set entity_type
+            entity_type, entity_id = match.group("entity_type", "entity_id")
+            id_start = match.start(kind) - offset
+            start = match.start()
+            # pool_id has no word boundary ("mypool 5" counts, as before); entity_type/id do
+            if self.entity_type is None and (start == 0 or not match.string[start - 1].isalnum() and match.string[start - 1] != "_"):
+                self.entity_type, self.entity_id = entity_type.lower(), entity_id
+                self.spans.append(EntitySpan("entity_type", entity_type, match.start() - offset, id_start - 1))
+                self.spans.append(EntitySpan("entity_id", entity_id, id_start, id_start + len(entity_id)))
+            if self.pool_id is None and entity_type == "pool":
+                digits = _LEADING_DIGITS.match(entity_id)
+                if digits:
+                    self.pool_id = digits.group(0)
+                    self.spans.append(EntitySpan("pool_id", self.pool_id, id_start, id_start + len(self.pool_id)))
+        else:
+            if kind == "apy":
+                if self.apy is not None:
+                    return
+                self.apy = value = match.group(kind)
+            elif kind == "supply":
+                if self.supply is not None:
+                    return
+                self.supply = value = match.group(kind)
+            else:
+                if self.token_name is not None:
+                    return
+                self.token_name = value = match.group(kind)
+            start = match.start(kind) - offset
+            self.spans.append(EntitySpan(kind, value, start, start + len(value)))
+
+    def pool_entities(self) -> Dict:
+        return {
+            "token1": self.symbols[0] if len(self.symbols) > 0 else None,
+            "token2": self.symbols[1] if len(self.symbols) > 1 else None,
+            "apy": self.apy
+        }
+
+    def token_entities(self) -> Dict:
+        return {"token_name": self.token_name, "supply": self.supply}
+
+    def join_pool_entities(self) -> Dict:
+        return {"pool_id": self.pool_id}
+
+    def query_entities(self) -> Dict:
+        return {"entity_type": self.entity_type, "entity_id": self.entity_id}
+
+    def for_intent(self, intent: Optional[str]) -> Dict:
+        if intent == "create_pool":
+            return self.pool_entities()
+        if intent == "create_token":
+            return self.token_entities()
+        if intent == "join_pool":
+            return self.join_pool_entities()
+        if intent == "query_info":
+            return self.query_entities()
+        return {}
+
+
+def use_registry(registry) -> None:
+    """Resolve symbols through a token_registry.TokenRegistry; None restores the regex-only symbols."""
+    global _registry
+    _registry = registry
+
+
+def _token_slots(text: str) -> set:
+    """Start offsets of the words in a token pair."""
+    slots = set()
+    for match in _TOKEN_PAIR.finditer(text):
+        slots.update(match.start(group) for group in ("first", "second", "left", "right") if match.start(group) >= 0)
+    return slots
+
+
+def _resolve_symbols(result: Extraction, text: str, lowercase: bool = False) -> None:
+    symbols, spans = [], [span for span in result.spans if span.name != "symbol"]
+    slots = () if lowercase else _token_slots(text)
+    for match in _WORD.finditer(text):
+        word = match.group()
+        expected = lowercase or match.start() in slots
+        if word.islower() and not expected:
+            continue
+        symbol = _registry.resolve(word, fuzzy=expected)
+        if symbol is None:
+            if word.lower() in _registry.reserved or not _TICKER.fullmatch(word):
+                continue
+            symbol = word
+        symbols.append(symbol)
+        spans.append(EntitySpan("symbol", symbol, match.start(), match.end()))
+    spans.sort(key=lambda span: span.start)
+    result.symbols, result.spans = symbols, spans
+
+
+def extract(text: str, lowercase_symbols: bool = False) -> Extraction:
+    """Scan text once and collect every entity."""
+    result = Extraction()
+    for match in _ENTITY_PATTERN.finditer(text):
+        result._add(match, 0)
+    if _registry is not None:
+        _resolve_symbols(result, text, lowercase_symbols)
+    return result
+
+
+def extract_many(texts: Iterable[str]) -> List[Extraction]:
+    """
+    Bulk mode: joins the utterances and runs a single finditer over all of them.
+    Matches come back in text order, so each is routed to its utterance by walking
+    the start offsets forward.
+    """
+    texts = [text.replace(_SEPARATOR, " ") if _SEPARATOR in text else text for text in texts]
+    results = [Extraction() for _ in texts]
+    if not texts:
+        return results
+    ends = []
+    offset = 0
+    for text in texts:
+        offset += len(text) + 1
+        ends.append(offset)
+    idx, start, end = 0, 0, ends[0]
+    for match in _ENTITY_PATTERN.finditer(_SEPARATOR.join(texts)):
+        while match.start() >= end:
+            idx += 1
+            start, end = end, ends[idx]
+        results[idx]._add(match, start)
+    if _registry is not None:
+        for text, result in zip(texts, results):
+            _resolve_symbols(result, text)
+    return results
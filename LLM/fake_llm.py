@@ -0,0 +1,117 @@
+import random
+import time
+from types import SimpleNamespace
+from typing import Callable, Optional
+
+from fake_openai_server import chunk_payload, completion_payload, default_responder
+
+## LLM/fake_llm.py
+#
+# In-process stand-in for the OpenAI client: assign FakeLLMClient() to LLM1.client (or
+# FakeAsyncLLMClient() to LLM1.async_client) and chat.completions.create answers like
+# FakeOpenAIServer does, after a sleep drawn from a latency distribution, without HTTP
+# or the openai package. Used where the pipeline itself is measured, not the network.
+
+Latency = Callable[[], float]
+
+
+def parse_latency(spec: str, seed: Optional[int] = None) -> Latency:
+    """
+    Latency distribution from a short spec, in milliseconds:
+      "50"                 constant
+      "uniform:20:80"      uniform between the bounds
+      "lognormal:50:0.5"   median 50, sigma 0.5 (long right tail)
+      "tail:30:500:0.05"   30 normally, 500 for 5% of calls
+    """
+    rng = random.Random(seed)
+    kind, *args = spec.split(":")
+    if not args:
+        value = float(kind) / 1000
+        return lambda: value
+    args = [float(a) for a in args]
+    if kind == "uniform":
+        low, high = args
+        return lambda: rng.uniform(low, high) / 1000
+    if kind == "lognormal":
+        median, sigma = args
+        import math
+        mu = math.log(median)
+        return lambda: rng.lognormvariate(mu, sigma) / 1000
+    if kind == "tail":
+        base, slow, share = args
+        return lambda: (slow if rng.random() < share else base) / 1000
+    raise ValueError(f"unknown latency spec {spec!r}")
+
+
+def _to_namespace(value):
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(item) for item in value]
+    return value
+
+
+class _FakeStream:
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.closed:
+            raise StopIteration
+        return next(self._chunks)
+
+    def close(self):
+        self.closed = True
+
+
+class _AsyncFakeStream(_FakeStream):
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return self.__next__()
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeLLMClient:
+    """chat.completions.create(**kwargs) -> response object shaped like the SDK's."""
+
+    def __init__(self, latency: Latency = lambda: 0.0, responder: Callable[[dict], str] = default_responder):
+        self.latency = latency
+        self.responder = responder
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _respond(self, body: dict):
+        self.calls += 1
+        content = self.responder(body)
+        model = body.get("model", "gpt-4o-mini")
+        if body.get("stream"):
+            pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+            chunks = [chunk_payload(model, {"content": piece}, None) for piece in pieces]
+            chunks.append(chunk_payload(model, {"content": None}, "stop"))
+            return [_to_namespace(chunk) for chunk in chunks]
+        return _to_namespace(completion_payload(model, content, body))
+
+    def create(self, **body):
+        time.sleep(self.latency())
+        result = self._respond(body)
+        return _FakeStream(result) if body.get("stream") else result
+
+
+class FakeAsyncLLMClient(FakeLLMClient):
+    async def create(self, **body):
+        import asyncio
+
+        await asyncio.sleep(self.latency())
+        result = self._respond(body)
+        return _AsyncFakeStream(result) if body.get("stream") else result
@@ -0,0 +1,259 @@
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from typing import Callable, Optional, Union
+
+## LLM/fake_openai_server.py
+#
+# Local stand-in for the OpenAI chat completions endpoint, used by the benchmarks.
+# Point a client at it with OpenAI(base_url=server.base_url, api_key="test").
+# It answers POST /v1/chat/completions after a configurable delay with an intent
+# JSON guessed from the "User input" line of the prompt; stream=True requests get
+# server-sent events paced by token_delay, and non-streamed answers wait the same
+# token_delay per 4-char chunk before returning, as a model generating them would.
+# error_rate makes that fraction of non-streamed requests fail with error_status
+# (settable while running, e.g. 1.0 for an outage).
+
+Latency = Union[float, Callable[[], float]]
+
+
+def guess_intent(user_text: str) -> dict:
+    lowered = user_text.lower()
+    entities = {}
+    if "pool" in lowered and ("create" in lowered or "liquidity" in lowered):
+        intent = "create_pool"
+        tokens = re.findall(r'\b[A-Z]{2,5}\b', user_text)
+        apy = re.search(r'(\d+(?:\.\d+)?)%', user_text)
+        entities = {"token1": tokens[0] if tokens else None,
+                    "token2": tokens[1] if len(tokens) > 1 else None,
+                    "apy": apy.group(1) if apy else None}
+    elif "token" in lowered and ("create" in lowered or "launch" in lowered):
+        intent = "create_token"
+        name = re.search(r'named (\w+)', user_text)
+        supply = re.search(r'supply of (\d+)', user_text)
+        entities = {"token_name": name.group(1) if name else None,
+                    "supply": supply.group(1) if supply else None}
+    elif "join" in lowered and "pool" in lowered:
+        intent = "join_pool"
+        pool_id = re.search(r'pool (\d+)', user_text)
+        entities = {"pool_id": pool_id.group(1) if pool_id else None}
+    elif "status" in lowered or "info" in lowered:
+        intent = "query_info"
+    elif "help" in lowered:
+        intent = "general_help"
+    else:
+        intent = None
+    return {"intent": intent, "entities": entities}
+
+
+def prompt_user_text(body: dict) -> str:
+    content = body.get("messages", [{}])[-1].get("content", "")
+    match = re.search(r'User input: \\?"(.*?)\\?"\n', content)
+    return match.group(1) if match else content
+
+
+# Short keys of LLM1's compact structured-output mode
+COMPACT_KEYS = {"token1": "t1", "token2": "t2", "apy": "apy", "token_name": "n",
+                "supply": "s", "pool_id": "p", "entity_type": "et", "entity_id": "eid"}
+
+
+def compact_intent(guessed: dict) -> dict:
+    entities = {COMPACT_KEYS[key]: value for key, value in guessed["entities"].items() if value is not None}
+    return {"i": guessed["intent"], "e": entities} if entities else {"i": guessed["intent"]}
+
+
+def default_responder(body: dict) -> str:
+    content = body.get("messages", [{}])[-1].get("content", "")
+    if (body.get("response_format") or {}).get("json_schema", {}).get("name") == "intent_compact":
+        return json.dumps(compact_intent(guess_intent(content)), separators=(",", ":"))
+    batch = re.search(r'User inputs \(JSON array\): (\[.*\])\n', content)
+    if batch:
+        return json.dumps([guess_intent(text) for text in json.loads(batch.group(1))])
+    return json.dumps(guess_intent(prompt_user_text(body)))
+
+
+class FakeOpenAIServer:
+    """
+    Runs an asyncio HTTP/1.1 server on a background thread. Use as a context manager.
+    latency is seconds per request, or a callable returning it (for distributions).
+    """
+
+    def __init__(self, latency: Latency = 0.05, host: str = "127.0.0.1", port: int = 0,
+                 responder: Optional[Callable[[dict], str]] = None, token_delay: float = 0.0,
+                 error_rate: float = 0.0, error_status: str = "500 Internal Server Error", seed: Optional[int] = None):
+        self.latency = latency
+        self.token_delay = token_delay  # seconds between streamed chunks (stream=True requests)
+        self.host = host
+        self.port = port
+        self.responder = responder or default_responder
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.streams_cancelled = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def _delay(self) -> float:
+        return self.latency() if callable(self.latency) else self.latency
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", "0"))
+                raw = await reader.readexactly(length) if length else b""
+                self.requests += 1
+                body = json.loads(raw or b"{}")
+                if body.get("stream"):
+                    if not await self._stream(writer, body):
+                        break
+                    continue
+
+                status, payload = await self.respond(request_line.decode("latin-1"), body)
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\nConnection: keep-alive\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, request_line: str, body: dict):
+        """Returns (status line suffix, JSON payload). Override to inject behaviour."""
+        await asyncio.sleep(self._delay())
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.errors += 1
+            return self.error_status, {"error": {"message": "injected failure", "type": "server_error"}}
+        payload = completion_payload(body.get("model", "gpt-4o-mini"), self.responder(body), body)
+        if self.token_delay:
+            # The generation time a stream of the same answer pays between its chunks
+            content = payload["choices"][0]["message"]["content"]
+            await asyncio.sleep(-(-len(content) // 4) * self.token_delay)
+        return "200 OK", payload
+
+    async def _stream(self, writer: asyncio.StreamWriter, body: dict) -> bool:
+        """Server-sent events, one chat.completion.chunk per ~4 characters. False if the client hung up."""
+        await asyncio.sleep(self._delay())
+        content = self.responder(body)
+        model = body.get("model", "gpt-4o-mini")
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: keep-alive\r\n\r\n")
+        pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+        events = [chunk_payload(model, {"role": "assistant", "content": ""}, None)]
+        events += [chunk_payload(model, {"content": piece}, None) for piece in pieces]
+        events.append(chunk_payload(model, {}, "stop"))
+        try:
+            for event in events:
+                data = f"data: {json.dumps(event)}\n\n".encode()
+                writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                await writer.drain()
+                if self.token_delay:
+                    await asyncio.sleep(self.token_delay)
+            done = b"data: [DONE]\n\n"
+            writer.write(f"{len(done):x}\r\n".encode() + done + b"\r\n0\r\n\r\n")
+            await writer.drain()
+            return True
+        except (ConnectionResetError, BrokenPipeError):
+            self.streams_cancelled += 1
+            return False
+
+    async def _serve(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start(self) -> "FakeOpenAIServer":
+        self._loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._task = self._loop.create_task(self._serve())
+            try:
+                self._loop.run_until_complete(self._task)
+            except asyncio.CancelledError:
+                pass
+            finally:
+                # Drop keep-alive connection handlers still waiting on idle clients
+                pending = asyncio.all_tasks(self._loop)
+                for task in pending:
+                    task.cancel()
+                self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+                self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="fake-openai", daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+        return self
+
+    def stop(self) -> None:
+        if self._task is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread:
+            self._thread.join(5)
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def completion_payload(model: str, content: str, body: Optional[dict] = None) -> dict:
+    prompt_chars = sum(len(m.get("content", "")) for m in (body or {}).get("messages", []))
+    prompt_tokens, completion_tokens = prompt_chars // 4, len(content) // 4
+    finish_reason = "stop"
+    max_tokens = (body or {}).get("max_tokens")
+    if max_tokens is not None and completion_tokens > max_tokens:
+        content, completion_tokens, finish_reason = content[:max_tokens * 4], max_tokens, "length"
+    return {
+        "id": f"chatcmpl-fake-{time.monotonic_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": finish_reason,
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def chunk_payload(model: str, delta: dict, finish_reason: Optional[str]) -> dict:
+    return {
+        "id": "chatcmpl-fake-stream",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
@@ -0,0 +1,200 @@
+import bisect
+import functools
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+## LLM/instrumentation.py
+#
+# Per-stage wall time and token usage for the dialog pipeline.
+#
+# enable(module, stages) rebinds the module's stage functions (LLM1.recognize_intent,
+# entity_extractor.extract, ...) to timed wrappers; callers reach them through module
+# globals or module attributes, so every internal call is timed. A function imported by
+# name into another module keeps the unwrapped original. disable() puts the originals back. While disabled nothing
+# is wrapped and the only remaining cost is the `enabled` check in record_usage().
+#
+# Cache, cascade and transport outcomes are already counted where they happen; they are
+# registered as sources and read when a snapshot is taken.
+# Set LLM_METRICS_ENABLED=1 to instrument LLM1 at import, LLM_METRICS_PORT to serve /metrics.
+
+# Seconds; Prometheus-style cumulative buckets
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+Hook = Callable[[str, float, Optional[BaseException]], None]
+
+enabled = False
+_lock = threading.Lock()
+_stages: Dict[str, dict] = {}
+_tokens: Dict[tuple, int] = {}
+_sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+_hooks: List[Hook] = []
+_originals: Dict[tuple, Callable] = {}
+
+
+def _observe(stage: str, seconds: float, error: Optional[BaseException]) -> None:
+    with _lock:
+        entry = _stages.get(stage)
+        if entry is None:
+            entry = _stages[stage] = {"count": 0, "errors": 0, "sum": 0.0, "max": 0.0,
+                                      "buckets": [0] * len(LATENCY_BUCKETS)}
+        entry["count"] += 1
+        entry["sum"] += seconds
+        if seconds > entry["max"]:
+            entry["max"] = seconds
+        if error is not None:
+            entry["errors"] += 1
+        i = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        if i < len(LATENCY_BUCKETS):
+            entry["buckets"][i] += 1
+    for hook in _hooks:
+        hook(stage, seconds, error)
+
+
+def timed(stage: str, fn: Callable) -> Callable:
+    """Wrap fn (sync or async) so each call is observed as `stage`."""
+    import inspect
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = await fn(*args, **kwargs)
+            except BaseException as e:
+                _observe(stage, time.perf_counter() - start, e)
+                raise
+            _observe(stage, time.perf_counter() - start, None)
+            return result
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            _observe(stage, time.perf_counter() - start, e)
+            raise
+        _observe(stage, time.perf_counter() - start, None)
+        return result
+    return wrapper
+
+
+def enable(module, stages: Iterable[str]) -> None:
+    """Replace module.<stage> with a timed wrapper for each stage name."""
+    global enabled
+    for name in stages:
+        key = (module.__name__, name)
+        if key not in _originals:
+            _originals[key] = getattr(module, name)
+            setattr(module, name, timed(name, _originals[key]))
+    enabled = True
+
+
+def disable(module) -> None:
+    global enabled
+    for (module_name, name), fn in list(_originals.items()):
+        if module_name == module.__name__:
+            setattr(module, name, fn)
+            del _originals[(module_name, name)]
+    enabled = bool(_originals)
+
+
+def add_hook(hook: Hook) -> None:
+    """hook(stage, seconds, error) runs after every observed call, e.g. to forward to a tracer."""
+    _hooks.append(hook)
+
+
+def register_source(name: str, stats: Callable[[], Dict[str, Any]]) -> None:
+    """stats() returns a flat dict of counters, read at snapshot time."""
+    _sources[name] = stats
+
+
+def record_usage(stage: str, usage) -> None:
+    """Count prompt/completion tokens from a response's usage block; callers check `enabled` first."""
+    if usage is None:
+        return
+    with _lock:
+        for kind in ("prompt_tokens", "completion_tokens"):
+            key = (stage, kind)
+            _tokens[key] = _tokens.get(key, 0) + (getattr(usage, kind, 0) or 0)
+
+
+def reset() -> None:
+    with _lock:
+        _stages.clear()
+        _tokens.clear()
+
+
+def snapshot() -> Dict[str, Any]:
+    with _lock:
+        stages = {
+            name: {"count": e["count"], "errors": e["errors"], "total_ms": e["sum"] * 1000,
+                   "mean_ms": e["sum"] / e["count"] * 1000 if e["count"] else 0.0, "max_ms": e["max"] * 1000}
+            for name, e in _stages.items()
+        }
+        tokens: Dict[str, Dict[str, int]] = {}
+        for (stage, kind), count in _tokens.items():
+            tokens.setdefault(stage, {})[kind] = count
+    return {"enabled": enabled, "stages": stages, "tokens": tokens,
+            "sources": {name: stats() for name, stats in _sources.items()}}
+
+
+def prometheus_text() -> str:
+    lines = ["# TYPE llm_stage_seconds histogram"]
+    with _lock:
+        for name, e in sorted(_stages.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, e["buckets"]):
+                cumulative += count
+                lines.append(f'llm_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'llm_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {e["count"]}')
+            lines.append(f'llm_stage_seconds_sum{{stage="{name}"}} {e["sum"]:.6f}')
+            lines.append(f'llm_stage_seconds_count{{stage="{name}"}} {e["count"]}')
+        lines.append("# TYPE llm_stage_errors_total counter")
+        for name, e in sorted(_stages.items()):
+            lines.append(f'llm_stage_errors_total{{stage="{name}"}} {e["errors"]}')
+        lines.append("# TYPE llm_tokens_total counter")
+        for (stage, kind), count in sorted(_tokens.items()):
+            lines.append(f'llm_tokens_total{{stage="{stage}",kind="{kind[:-len("_tokens")]}"}} {count}')
+    # Source counters are read as-is, so they are exported as gauges
+    for source, stats in sorted(_sources.items()):
+        for key, value in sorted(stats().items()):
+            if isinstance(value, (bool, int, float)):
+                lines.append(f"# TYPE llm_{source}_{key} gauge")
+                lines.append(f"llm_{source}_{key} {float(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def serve_metrics(port: int, host: str = "127.0.0.1"):
+    """Serve GET /metrics (Prometheus text) and /metrics.json from a daemon thread."""
+    import json
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = prometheus_text().encode(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, content_type = json.dumps(snapshot()).encode(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="llm-metrics", daemon=True).start()
+    return server
+
+
+ENABLED_BY_ENV = os.getenv("LLM_METRICS_ENABLED", "0").lower() in ("1", "true", "yes")
+METRICS_PORT = int(os.getenv("LLM_METRICS_PORT", "0"))
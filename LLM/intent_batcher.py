@@ -0,0 +1,95 @@
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Sequence, Tuple
+
+## LLM/intent_batcher.py
+#
+# Micro-batching queue: collects recognize requests for a few milliseconds and
+# sends them upstream as one batched call (LLM1.recognize_intents).
+# Each request carries a copy of its caller's contextvars; the batch runs in the one
+# pick_context chooses (default: the first request's), so context-dependent settings
+# such as the rate-limit priority survive the hop to the worker thread.
+
+Item = Tuple[str, Future, contextvars.Context]
+
+
+class IntentBatcher:
+    def __init__(self, recognize_batch: Callable[[List[str]], List[dict]], max_batch: int = 16,
+                 max_wait: float = 0.005,
+                 pick_context: Optional[Callable[[Sequence[contextvars.Context]], contextvars.Context]] = None):
+        self.recognize_batch = recognize_batch
+        self.pick_context = pick_context or (lambda contexts: contexts[0])
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self.cancelled = 0
+        self._queue: "queue.Queue[Optional[Item]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="intent-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        future: Future = Future()
+        self._queue.put((text, future, contextvars.copy_context()))
+        return future
+
+    def recognize(self, text: str) -> dict:
+        return self.submit(text).result()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self, first: Item) -> Tuple[List[Item], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        closing = False
+        while not closing:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, closing = self._collect(first)
+            # Drop requests whose caller gave up (e.g. a cancelled asyncio.wrap_future); the rest
+            # are marked running, so they can no longer be cancelled and setting them can't raise
+            live = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            self.cancelled += len(batch) - len(live)
+            if not live:
+                continue
+            self.batches += 1
+            self.items += len(live)
+            try:
+                context = self.pick_context([context for _, _, context in live])
+                results = context.run(self.recognize_batch, [text for text, _, _ in live])
+                if len(results) != len(live):
+                    raise ValueError(f"recognize_batch returned {len(results)} results for {len(live)} texts")
+            except Exception as e:
+                for _, future, _ in live:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), result in zip(live, results):
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "cancelled": self.cancelled,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
@@ -0,0 +1,129 @@
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+## LLM/intent_matcher.py
+#
+# Precompiled matcher for the few-shot + keyword intent lookup in LLM/LLM.py.
+# An Aho-Corasick automaton over every example token and fallback keyword finds
+# all of them in one pass over the input; an inverted index from token to
+# example then tells us which examples have all of their tokens present.
+
+
+class AhoCorasick:
+    """Multi-pattern substring automaton. Patterns are matched as raw substrings."""
+
+    def __init__(self, patterns: Sequence[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        for pattern_id, pattern in enumerate(patterns):
+            self._add(pattern, pattern_id)
+        self._build_failure_links()
+
+    def _add(self, pattern: str, pattern_id: int) -> None:
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(pattern_id)
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                # Inherit the outputs of the failure state so each node reports every suffix match
+                self._out[child].extend(self._out[self._fail[child]])
+
+    def find(self, text: str) -> set:
+        """Return the set of pattern ids occurring anywhere in text."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+
+class IntentMatcher:
+    """
+    Compiled form of the few-shot examples and keyword fallbacks.
+    match() returns the same (intent, entities) the original linear scan picked:
+    the first example whose tokens all occur in the input, else the first keyword rule hit.
+    """
+
+    def __init__(self, examples: Iterable[Dict], keyword_rules: Sequence[Tuple[str, Sequence[str]]]):
+        self.examples = list(examples)
+        self.keyword_rules = [(intent, tuple(k.lower() for k in keywords)) for intent, keywords in keyword_rules]
+
+        pattern_ids: Dict[str, int] = {}
+        patterns: List[str] = []
+
+        def pattern_id(pattern: str) -> int:
+            if pattern not in pattern_ids:
+                pattern_ids[pattern] = len(patterns)
+                patterns.append(pattern)
+            return pattern_ids[pattern]
+
+        # Inverted index: pattern id -> example indexes that need it
+        self._postings: Dict[int, List[int]] = {}
+        self._required: List[int] = []
+        self._always: Optional[int] = None  # first example with no tokens, matches anything
+        for idx, example in enumerate(self.examples):
+            token_ids = {pattern_id(token.lower()) for token in example["user_input"].split()}
+            self._required.append(len(token_ids))
+            if not token_ids and self._always is None:
+                self._always = idx
+            for tid in token_ids:
+                self._postings.setdefault(tid, []).append(idx)
+
+        self._keyword_ids = {}
+        for rule_idx, (_, keywords) in enumerate(self.keyword_rules):
+            for keyword in keywords:
+                self._keyword_ids.setdefault(pattern_id(keyword), []).append(rule_idx)
+
+        self._automaton = AhoCorasick(patterns)
+
+    def match(self, user_text: str) -> Optional[Tuple[str, Optional[Dict]]]:
+        """
+        Returns (intent, example_entities) for an example hit, (intent, None) for a
+        keyword hit (caller extracts entities), or None if nothing matched.
+        """
+        found = self._automaton.find(user_text.lower())
+
+        best = self._always
+        hits: Dict[int, int] = {}
+        required = self._required
+        for pid in found:
+            for idx in self._postings.get(pid, ()):
+                count = hits.get(idx, 0) + 1
+                hits[idx] = count
+                if count == required[idx] and (best is None or idx < best):
+                    best = idx
+        if best is not None:
+            example = self.examples[best]
+            return example["intent"], example["entities"]
+
+        rule_hit = None
+        for pid in found:
+            for rule_idx in self._keyword_ids.get(pid, ()):
+                if rule_hit is None or rule_idx < rule_hit:
+                    rule_hit = rule_idx
+        if rule_hit is not None:
+            return self.keyword_rules[rule_hit][0], None
+        return None
@@ -0,0 +1,293 @@
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+## LLM/llm_transport.py
+#
+# Shared transport for every OpenAI call in LLM.py / LLM1.py:
+#   - one tuned httpx connection pool per process (keep-alive, bounded size)
+#   - per-call timeouts
+#   - jittered exponential retry on timeouts, connection errors, 429 and 5xx
+#   - optional hedging: a duplicate request once the first runs past the observed p95
+#   - a circuit breaker that fails fast (CircuitOpenError) while upstream is degraded,
+#     so callers can drop straight to the local recognizer
+# openai/httpx are imported on first client construction.
+
+T = TypeVar("T")
+
+
+def _env_float(name: str, default: str) -> float:
+    return float(os.getenv(name, default))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the breaker is open."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    # APITimeoutError is a subclass of APIConnectionError
+    return "APIConnectionError" in names or isinstance(exc, (TimeoutError, ConnectionError))
+
+
+class CircuitBreaker:
+    """
+    closed -> open after failure_threshold consecutive failures; open -> half-open after
+    reset_timeout, letting a single probe through; the probe's outcome closes or reopens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """For a call abandoned without an outcome (cancelled, interrupted): the next call may probe."""
+        with self._lock:
+            self._probe_in_flight = False
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies, for the hedging delay."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class Transport:
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 2.0,
+                 hedge: bool = False, hedge_min_delay: float = 0.05,
+                 breaker: Optional[CircuitBreaker] = None, latencies: Optional[LatencyTracker] = None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = latencies or LatencyTracker()
+        self.stats = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "failures": 0, "short_circuited": 0}
+        self._executor = None
+
+    def backoff(self, attempt: int) -> float:
+        # "Full jitter": uniform between 0 and the capped exponential step
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge:
+            return None
+        p95 = self.latencies.percentile(0.95)
+        return None if p95 is None else max(self.hedge_min_delay, p95)
+
+    def _check_breaker(self) -> None:
+        if not self.breaker.allow():
+            self.stats["short_circuited"] += 1
+            raise CircuitOpenError("LLM upstream circuit is open")
+
+    def call(self, fn: Callable[[], T], hedge: bool = True) -> T:
+        """
+        Run fn (one blocking upstream request) with retries, hedging and the breaker.
+        Pass hedge=False for calls whose duplicate could not be discarded, e.g. opening a stream.
+        """
+        self.stats["calls"] += 1
+        for attempt in range(self.max_attempts):
+            self._check_breaker()
+            start = time.monotonic()
+            try:
+                result = self._hedged(fn) if hedge else fn()
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.record_success()  # upstream answered; the request was at fault
+                    raise
+                self.breaker.record_failure()
+                if attempt + 1 == self.max_attempts:
+                    self.stats["failures"] += 1
+                    raise
+                self.stats["retries"] += 1
+                time.sleep(self.backoff(attempt))
+                continue
+            except BaseException:
+                # Says nothing about upstream, but a half-open probe must not stay in flight forever
+                self.breaker.release_probe()
+                raise
+            self.breaker.record_success()
+            self.latencies.record(time.monotonic() - start)
+            return result
+        raise AssertionError("unreachable")
+
+    def _hedged(self, fn: Callable[[], T]) -> T:
+        delay = self.hedge_delay()
+        if delay is None:
+            return fn()
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+        # Each attempt runs in a copy of the caller's contextvars (one copy can't be entered by two threads)
+        primary = self._executor.submit(contextvars.copy_context().run, fn)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        self.stats["hedges"] += 1
+        pending = {primary, self._executor.submit(contextvars.copy_context().run, fn)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        self.stats["hedge_wins"] += 1
+                    # The slower duplicate finishes in the background and is discarded
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def acall(self, make_call: Callable[[], Awaitable[T]], hedge: bool = True) -> T:
+        """Async twin of call(); make_call returns a fresh awaitable per attempt."""
+        import asyncio
+
+        self.stats["calls"] += 1
+        for attempt in range(self.max_attempts):
+            self._check_breaker()
+            start = time.monotonic()
+            try:
+                result = await (self._ahedged(make_call) if hedge else make_call())
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt + 1 == self.max_attempts:
+                    self.stats["failures"] += 1
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.backoff(attempt))
+                continue
+            except BaseException:  # CancelledError, e.g. from asyncio.wait_for
+                self.breaker.release_probe()
+                raise
+            self.breaker.record_success()
+            self.latencies.record(time.monotonic() - start)
+            return result
+        raise AssertionError("unreachable")
+
+    async def _ahedged(self, make_call: Callable[[], Awaitable[T]]) -> T:
+        import asyncio
+
+        delay = self.hedge_delay()
+        if delay is None:
+            return await make_call()
+        primary = asyncio.ensure_future(make_call())
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+        self.stats["hedges"] += 1
+        pending = {primary, asyncio.ensure_future(make_call())}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+def transport_from_env() -> Transport:
+    return Transport(
+        max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", "3")),
+        base_delay=_env_float("LLM_RETRY_BASE_DELAY", "0.2"),
+        max_delay=_env_float("LLM_RETRY_MAX_DELAY", "2.0"),
+        hedge=os.getenv("LLM_HEDGE", "0").lower() in ("1", "true", "yes"),
+        hedge_min_delay=_env_float("LLM_HEDGE_MIN_DELAY", "0.05"),
+        breaker=CircuitBreaker(
+            failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+            reset_timeout=_env_float("LLM_BREAKER_RESET", "30"),
+        ),
+    )
+
+
+def _http_settings():
+    import httpx
+
+    timeout = httpx.Timeout(_env_float("LLM_TIMEOUT", "10"), connect=_env_float("LLM_CONNECT_TIMEOUT", "3"))
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("LLM_POOL_SIZE", "100")),
+        max_keepalive_connections=int(os.getenv("LLM_POOL_KEEPALIVE", "20")),
+        keepalive_expiry=_env_float("LLM_POOL_KEEPALIVE_EXPIRY", "30"),
+    )
+    return httpx, timeout, limits
+
+
+def create_openai_client(api_key: str, base_url: Optional[str] = None):
+    """OpenAI client on a tuned keep-alive pool; the SDK's own retries are off, Transport retries."""
+    from openai import OpenAI
+
+    httpx, timeout, limits = _http_settings()
+    return OpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout,
+                  http_client=httpx.Client(limits=limits, timeout=timeout))
+
+
+def create_async_openai_client(api_key: str, base_url: Optional[str] = None):
+    from openai import AsyncOpenAI
+
+    httpx, timeout, limits = _http_settings()
+    return AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout,
+                       http_client=httpx.AsyncClient(limits=limits, timeout=timeout))
+
+
+# Process-wide transport shared by LLM.py and LLM1.py
+default_transport = transport_from_env()
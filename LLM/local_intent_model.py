@@ -0,0 +1,101 @@
+import os
+from typing import List, Optional
+
+import entity_extractor
+
+## LLM/local_intent_model.py
+#
+# CPU seq2seq intent recognizer with the same {intent, entities} contract as
+# LLM1.recognize_intent, so dialog turns need no OpenAI call at all.
+#   - the model only generates the intent label (a few tokens); entities come from the
+#     compiled extractor, which is exact for the patterns the dialog relies on
+#   - requests queue in an IntentBatcher and are run together; each collected batch is
+#     sorted by token length and split into buckets so padding stays small
+#   - generation runs under torch.inference_mode with a fixed thread count, optionally
+#     on an int8 dynamically quantized copy of the Linear layers
+# transformers/torch are imported when the model is built.
+
+INTENT_LABELS = ["create_pool", "create_token", "join_pool", "query_info", "general_help"]
+
+DEFAULT_MODEL = os.getenv("LOCAL_INTENT_MODEL", "google/flan-t5-small")
+
+# Instruction the label is generated from; a model fine-tuned on LLM1's few-shot data can use it as is
+PROMPT_TEMPLATE = (
+    "Classify the DeFi request as create_pool, create_token, join_pool, query_info, "
+    "general_help or none.\nRequest: {text}\nLabel:"
+)
+
+
+def parse_label(generated: str) -> Optional[str]:
+    label = generated.strip().lower().replace(" ", "_")
+    for intent in INTENT_LABELS:
+        if label.startswith(intent):
+            return intent
+    return None
+
+
+class Seq2SeqIntentModel:
+    def __init__(self, model_name: str = DEFAULT_MODEL, quantize: bool = False, threads: Optional[int] = None,
+                 bucket_width: int = 8, max_bucket: int = 32, max_new_tokens: int = 6):
+        import torch
+        from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self._torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_name).eval()
+        if quantize:
+            # int8 weights for every Linear layer, activations quantized on the fly
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+        self.bucket_width = bucket_width
+        self.max_bucket = max_bucket
+        self.max_new_tokens = max_new_tokens
+        self.buckets = 0
+
+    def _buckets(self, prompts: List[str]) -> List[List[int]]:
+        """Indices grouped so lengths within a bucket differ by at most bucket_width tokens."""
+        lengths = [len(ids) for ids in self.tokenizer(prompts)["input_ids"]]
+        order = sorted(range(len(prompts)), key=lengths.__getitem__)
+        buckets, current = [], []
+        for i in order:
+            if current and (lengths[i] - lengths[current[0]] > self.bucket_width or len(current) == self.max_bucket):
+                buckets.append(current)
+                current = []
+            current.append(i)
+        if current:
+            buckets.append(current)
+        return buckets
+
+    def labels(self, texts: List[str]) -> List[Optional[str]]:
+        prompts = [PROMPT_TEMPLATE.format(text=text) for text in texts]
+        labels: List[Optional[str]] = [None] * len(texts)
+        with self._torch.inference_mode():
+            for bucket in self._buckets(prompts):
+                self.buckets += 1
+                batch = self.tokenizer([prompts[i] for i in bucket], return_tensors="pt", padding=True)
+                # Only the inputs a seq2seq model takes; some tokenizers add token_type_ids, which generate rejects
+                output = self.model.generate(input_ids=batch["input_ids"], attention_mask=batch["attention_mask"],
+                                             max_new_tokens=self.max_new_tokens, do_sample=False)
+                for i, generated in zip(bucket, self.tokenizer.batch_decode(output, skip_special_tokens=True)):
+                    labels[i] = parse_label(generated)
+        return labels
+
+    def recognize_batch(self, texts: List[str]) -> List[dict]:
+        extractions = entity_extractor.extract_many(texts)
+        return [
+            {"intent": intent, "entities": extraction.for_intent(intent)}
+            for intent, extraction in zip(self.labels(texts), extractions)
+        ]
+
+    def recognize(self, text: str) -> dict:
+        return self.recognize_batch([text])[0]
+
+
+def model_from_env() -> Seq2SeqIntentModel:
+    return Seq2SeqIntentModel(
+        model_name=DEFAULT_MODEL,
+        quantize=os.getenv("LOCAL_INTENT_QUANTIZE", "0").lower() in ("1", "true", "yes"),
+        threads=int(os.getenv("LOCAL_INTENT_THREADS", "0")) or None,
+    )
@@ -0,0 +1,232 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from llm_transport import LatencyTracker
+
+## LLM/rate_limiter.py
+#
+# Client-side admission control for OpenAI calls, so bursts queue here instead of
+# coming back as upstream 429s.
+#   - two token buckets: requests/min and tokens/min (a request is charged its estimated
+#     prompt tokens plus max_tokens up front, the way upstream counts it; settle() trues
+#     the bucket up with the real usage once the response arrives)
+#   - one bounded wait queue ordered by (priority, arrival); only its head may draw from
+#     the buckets, so a HIGH request never waits behind a NORMAL one
+#   - a request whose wait would run past its deadline is shed (RateLimitShed) instead of
+#     queueing; when the queue is full, a HIGH arrival evicts the newest NORMAL waiter
+#   - a waiter that goes away (task cancelled, KeyboardInterrupt) leaves the queue, or
+#     everyone behind it would wait on a head that never draws
+# Callers treat RateLimitShed like an open circuit and answer from the local recognizer.
+
+HIGH = 0  # sessions already in a conversation
+NORMAL = 1  # brand-new sessions, batch traffic
+
+# Async waiters that are not at the head re-check this often; sync waiters are notified
+ASYNC_POLL_SECONDS = 0.01
+
+
+class RateLimitShed(Exception):
+    """Raised instead of queueing when a request can't be admitted before its deadline."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"rate limit: request shed ({reason})")
+        self.reason = reason
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, burst_seconds: float = 60.0):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available; amounts above capacity are charged as a full bucket."""
+        self.refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def drain_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` has been handed out, possibly across several refills."""
+        self.refill(now)
+        return max(0.0, (amount - self.level) / self.rate)
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "tokens", "deadline", "shed")
+
+    def __init__(self, priority: int, seq: int, tokens: int, deadline: float):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.deadline = deadline
+        self.shed: Optional[str] = None
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 max_queue: int = 256, max_wait: float = 2.0, burst_seconds: float = 1.0):
+        # Upstream enforces per-minute limits over shorter windows too, so by default at most
+        # one second's share goes out back to back
+        self.requests = TokenBucket(requests_per_minute, burst_seconds) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute, burst_seconds) if tokens_per_minute > 0 else None
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.waits = LatencyTracker(window=1000, min_samples=1)
+        self.stats = {"admitted": 0, "admitted_high": 0, "shed_deadline": 0,
+                      "shed_queue_full": 0, "shed_evicted": 0, "shed_high": 0, "cancelled": 0, "max_queue_depth": 0,
+                      "wait_seconds_max": 0.0}
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _wait_time(self, tokens: float, now: float) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = self.requests.wait_time(1, now)
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        return wait
+
+    def _estimated_wait(self, waiter: _Waiter, now: float) -> float:
+        # Time for the buckets to cover everyone queued ahead of this request plus itself
+        ahead = [w for w in self._queue if w < waiter]
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.drain_time(len(ahead) + 1, now))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.drain_time(sum(w.tokens for w in ahead) + waiter.tokens, now))
+        return wait
+
+    def _enqueue(self, tokens: int, priority: int, now: float, max_wait: Optional[float]) -> _Waiter:
+        waiter = _Waiter(priority, next(self._seq), tokens, now + (self.max_wait if max_wait is None else max_wait))
+        if len(self._queue) >= self.max_queue:
+            victim = max(self._queue) if priority == HIGH else None
+            if victim is None or victim.priority == HIGH:
+                self._shed(waiter, "queue_full")
+            self._remove(victim, "evicted")
+        if now + self._estimated_wait(waiter, now) > waiter.deadline:
+            self._shed(waiter, "deadline")
+        heapq.heappush(self._queue, waiter)
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(self._queue))
+        return waiter
+
+    def _remove(self, waiter: _Waiter, reason: str) -> None:
+        waiter.shed = reason
+        self._queue.remove(waiter)
+        heapq.heapify(self._queue)
+        self._cond.notify_all()
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        if waiter.shed is None and waiter in self._queue:
+            self._remove(waiter, "cancelled")
+            self.stats["cancelled"] += 1
+
+    def _shed(self, waiter: _Waiter, reason: str) -> None:
+        if waiter.shed is None and waiter in self._queue:
+            self._remove(waiter, reason)
+        self.stats[f"shed_{reason}"] += 1
+        self.stats["shed_high"] += waiter.priority == HIGH
+        raise RateLimitShed(reason)
+
+    def _try_admit(self, waiter: _Waiter, started: float, now: float) -> Optional[float]:
+        """None once admitted, otherwise how long to sleep before trying again (raises when shed)."""
+        if waiter.shed is not None:
+            self._shed(waiter, waiter.shed)  # evicted by a HIGH arrival
+        if self._queue[0] is not waiter:
+            if now >= waiter.deadline:
+                self._shed(waiter, "deadline")
+            return waiter.deadline - now
+        wait = self._wait_time(waiter.tokens, now)
+        if wait > 0:
+            if now + wait > waiter.deadline:
+                self._shed(waiter, "deadline")
+            return wait
+        if self.requests is not None:
+            self.requests.level -= 1
+        if self.tokens is not None:
+            self.tokens.level -= waiter.tokens
+        heapq.heappop(self._queue)
+        self._cond.notify_all()
+        waited = now - started
+        self.waits.record(waited)
+        self.stats["admitted"] += 1
+        self.stats["admitted_high"] += waiter.priority == HIGH
+        self.stats["wait_seconds_max"] = max(self.stats["wait_seconds_max"], waited)
+        return None
+
+    def acquire(self, tokens: int = 0, priority: int = NORMAL, max_wait: Optional[float] = None) -> float:
+        """Block until the request may be sent; returns the seconds waited. Raises RateLimitShed."""
+        started = time.monotonic()
+        with self._cond:
+            waiter = self._enqueue(tokens, priority, started, max_wait)
+            try:
+                while True:
+                    now = time.monotonic()
+                    sleep = self._try_admit(waiter, started, now)
+                    if sleep is None:
+                        return now - started
+                    self._cond.wait(sleep)
+            except BaseException:
+                self._abandon(waiter)
+                raise
+
+    async def acquire_async(self, tokens: int = 0, priority: int = NORMAL, max_wait: Optional[float] = None) -> float:
+        import asyncio
+
+        started = time.monotonic()
+        with self._cond:
+            waiter = self._enqueue(tokens, priority, started, max_wait)
+        try:
+            while True:
+                now = time.monotonic()
+                with self._cond:
+                    sleep = self._try_admit(waiter, started, now)
+                if sleep is None:
+                    return now - started
+                await asyncio.sleep(min(sleep, ASYNC_POLL_SECONDS))
+        except BaseException:  # asyncio.CancelledError included
+            with self._cond:
+                self._abandon(waiter)
+            raise
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Refund (or charge) the difference between the up-front estimate and the real usage."""
+        if self.tokens is None or actual_tokens is None:
+            return
+        with self._cond:
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + estimated_tokens - actual_tokens)
+            self._cond.notify_all()
+
+    def snapshot(self) -> Dict:
+        p50, p95 = self.waits.percentile(0.5), self.waits.percentile(0.95)
+        return dict(self.stats, queue_depth=len(self._queue),
+                    wait_ms_p50=(p50 or 0.0) * 1000, wait_ms_p95=(p95 or 0.0) * 1000)
+
+
+def estimate_tokens(request: dict) -> int:
+    """Prompt tokens at ~4 characters each, plus the completion budget upstream reserves."""
+    chars = sum(len(message.get("content") or "") for message in request.get("messages", []))
+    return chars // 4 + int(request.get("max_tokens") or 0)
+
+
+def rate_limiter_from_env() -> Optional[RateLimiter]:
+    """None unless LLM_RPM_LIMIT or LLM_TPM_LIMIT is set."""
+    rpm = float(os.getenv("LLM_RPM_LIMIT", "0"))
+    tpm = float(os.getenv("LLM_TPM_LIMIT", "0"))
+    if rpm <= 0 and tpm <= 0:
+        return None
+    return RateLimiter(rpm, tpm, max_queue=int(os.getenv("LLM_RATE_QUEUE_SIZE", "256")),
+                       max_wait=float(os.getenv("LLM_RATE_MAX_WAIT", "2.0")),
+                       burst_seconds=float(os.getenv("LLM_RATE_BURST_SECONDS", "1.0")))
@@ -0,0 +1,153 @@
+import functools
+import os
+import threading
+import zlib
+from typing import Callable, Dict, Optional
+
+import entity_extractor
+
+## LLM/semantic_cache.py
+#
+# Similarity cache for intents: paraphrases ("make a pool APT/USDC 7%" vs "create APT-USDC
+# pool at 7% APY") reuse an earlier LLM answer. Utterances are embedded on CPU, vectors
+# live in one preallocated float32 matrix, and a lookup is a single matrix-vector product
+# over the filled rows. Only the intent is reused; entities are extracted again from the
+# new text, since paraphrases rarely share token symbols or amounts.
+# numpy (and transformers/torch for TransformerEmbedder) are imported on first use.
+
+DEFAULT_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+
+class TransformerEmbedder:
+    """Mean-pooled, L2-normalized sentence embeddings from a small Hugging Face encoder."""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL):
+        from transformers import AutoModel, AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).eval()
+        self.dim = self.model.config.hidden_size
+
+    def __call__(self, text: str):
+        import torch
+
+        with torch.inference_mode():
+            batch = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=64)
+            hidden = self.model(**batch).last_hidden_state[0]
+            mask = batch["attention_mask"][0].unsqueeze(-1).to(hidden.dtype)
+            vector = (hidden * mask).sum(0) / mask.sum()
+        return vector.numpy()
+
+
+class HashingEmbedder:
+    """
+    Character-trigram hashing embedder: no model download, numpy only. Coarser than a
+    sentence encoder but enough for word-order and punctuation paraphrases.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def __call__(self, text: str):
+        import numpy as np
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        padded = f"  {text.lower()}  "
+        for i in range(len(padded) - 2):
+            # crc32, not hash(): str hashes are salted per process, so buckets (and hits) would
+            # differ between runs and between server workers
+            vector[zlib.crc32(padded[i:i + 3].encode()) % self.dim] += 1.0
+        return vector
+
+
+class SemanticCache:
+    def __init__(self, embed: Callable, dim: int, capacity: int = 1024, threshold: float = 0.92,
+                 embed_memo: int = 256):
+        import numpy as np
+
+        self._np = np
+        self.capacity = capacity
+        self.threshold = threshold
+        # Lookup and store embed the same text on a miss; memoize so it is encoded once
+        self._embed = functools.lru_cache(maxsize=embed_memo)(embed)
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._intents = [None] * capacity
+        self._rows: Dict[str, int] = {}  # normalized text -> row, so repeats refresh instead of duplicating
+        self._texts = [None] * capacity
+        self._size = 0
+        self._clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def _vector(self, text: str):
+        vector = self._np.asarray(self._embed(" ".join(text.split())), dtype=self._np.float32)
+        norm = float(self._np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def lookup(self, text: str) -> Optional[dict]:
+        """Intent result for the nearest stored utterance, or None below the threshold."""
+        query = self._vector(text)
+        with self._lock:
+            if self._size == 0:
+                self.misses += 1
+                return None
+            scores = self._matrix[:self._size] @ query
+            row = int(scores.argmax())
+            if scores[row] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._clock += 1
+            self._last_used[row] = self._clock
+            intent = self._intents[row]
+        return {"intent": intent, "entities": entity_extractor.extract(text).for_intent(intent)}
+
+    def store(self, text: str, intent: Optional[str]) -> None:
+        if intent is None:
+            return
+        key = " ".join(text.split())
+        vector = self._vector(text)
+        with self._lock:
+            self._clock += 1
+            row = self._rows.get(key)
+            if row is None:
+                if self._size < self.capacity:
+                    row = self._size
+                    self._size += 1
+                else:
+                    # Least recently used row
+                    row = int(self._last_used.argmin())
+                    del self._rows[self._texts[row]]
+                    self.evictions += 1
+                self._rows[key] = row
+                self._texts[row] = key
+            self._matrix[row] = vector
+            self._intents[row] = intent
+            self._last_used[row] = self._clock
+
+    def clear(self) -> None:
+        with self._lock:
+            self._size = 0
+            self._rows.clear()
+            self._last_used[:] = 0
+            self._texts = [None] * self.capacity
+            self._intents = [None] * self.capacity
+            self._clock = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "size": self._size,
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
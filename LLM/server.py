@@ -0,0 +1,265 @@
+import argparse
+import json
+import os
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+## LLM/server.py
+#
+# HTTP entry point for the dialog engine (LLM1.conversation_manager).
+#   POST /chat     {"message": "...", "session_id": "..."} -> {"success": true, "response": "...", "session_id": "..."}
+#                  session_id is optional; a new one is returned when it is missing
+#   GET  /health   200 {"status": "ok"} while serving, 503 while draining
+#   GET  /metrics  Prometheus text from instrumentation.py (per worker process)
+# With TURN_LOG_PATH set, each worker logs turns to TURN_LOG_PATH.<pid>.
+#
+# Pre-fork model: the parent imports LLM1 and warms the heavy dependencies once, freezes
+# the GC so those pages stay shared copy-on-write, binds the socket and forks --workers
+# processes that all accept on it. Each worker serves requests on threads. Dialog state is
+# kept in one SQLite file (WAL) so a session may land on any worker. SIGTERM/SIGINT drain:
+# workers stop accepting, end keep-alive connections, finish in-flight turns, flush the turn
+# log, then exit; the parent restarts workers that die unexpectedly.
+# Run with: python server.py --port 8000 --workers 4 [--stub-llm lognormal:30:0.4]
+
+SHUTDOWN_GRACE = float(os.getenv("SERVER_SHUTDOWN_GRACE", "30"))
+# Idle keep-alive connections are closed after this long (and at once on drain)
+KEEPALIVE_TIMEOUT = float(os.getenv("SERVER_KEEPALIVE_TIMEOUT", "75"))
+
+import LLM1
+import instrumentation
+from session_store import SessionStore, SQLiteSessionBackend
+
+
+def preload(stub_llm: str) -> None:
+    """Import and build what every worker needs before fork, so it is loaded once and shared."""
+    if not stub_llm:
+        import httpx  # noqa: F401
+        import openai  # noqa: F401  the SDK import alone is several hundred ms per process
+    if LLM1.SEMANTIC_CACHE_ENABLED:
+        LLM1.get_semantic_cache()  # embedding model weights
+    if LLM1.LOCAL_MODEL_ENABLED:
+        LLM1.get_local_intent_model()  # seq2seq weights; the batcher thread starts in each worker
+
+
+class ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive for the frontend's connection pool
+    # Headers and body go out as separate writes; with Nagle on, each keep-alive reply stalls ~40 ms on delayed ACK
+    disable_nagle_algorithm = True
+    timeout = KEEPALIVE_TIMEOUT
+
+    def setup(self):
+        super().setup()
+        self.server.track(self.connection, True)
+
+    def finish(self):
+        self.server.track(self.connection, False)
+        super().finish()
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.server.draining:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            draining = self.server.draining
+            self._send_json(503 if draining else 200,
+                            {"status": "draining" if draining else "ok", "pid": os.getpid()})
+        elif self.path == "/metrics":
+            body = instrumentation.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path != "/chat":
+            self._send_json(404, {"error": "Not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", "0"))
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "Invalid JSON"})
+            return
+        if not isinstance(request, dict):
+            self._send_json(400, {"error": "Request body must be a JSON object"})
+            return
+        message = request.get("message")
+        if not isinstance(message, str) or not message.strip():
+            self._send_json(400, {"error": "Message is required"})
+            return
+        session_id = request.get("session_id") or uuid.uuid4().hex
+        try:
+            response = LLM1.conversation_manager(message, str(session_id))
+        except Exception as e:
+            print(f"[worker {os.getpid()}] chat error:", e, file=sys.stderr)
+            self._send_json(500, {"error": "Failed to process chat message"})
+            return
+        self._send_json(200, {"success": True, "response": response, "session_id": session_id})
+
+    def log_message(self, *args):
+        pass
+
+
+class WorkerServer(ThreadingHTTPServer):
+    daemon_threads = False  # server_close() waits for in-flight turns
+    draining = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+
+    def track(self, connection: socket.socket, open_: bool) -> None:
+        with self._connections_lock:
+            if open_:
+                self._connections.add(connection)
+            else:
+                self._connections.discard(connection)
+
+    def stop_reading(self) -> None:
+        """
+        Ends every keep-alive connection after its current response: a handler idle in
+        readline() gets EOF at once, a busy one still writes its reply. Without this,
+        server_close() waits on idle connections until the parent's SIGKILL.
+        """
+        with self._connections_lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RD)
+            except OSError:
+                pass  # already closed by the client
+
+
+def _setup_worker(session_db: str, stub_llm: str) -> None:
+    # Connections and thread pools must not be inherited across fork; every worker opens its own
+    LLM1.client = None
+    LLM1.async_client = None
+    LLM1.session_store = SessionStore(SQLiteSessionBackend(session_db))
+    if LLM1.TURN_LOG_PATH:
+        # One file per worker; the writer thread and its file handle can't be shared across fork
+        LLM1.TURN_LOG_PATH = f"{LLM1.TURN_LOG_PATH}.{os.getpid()}"
+        LLM1._turn_log = None
+    if stub_llm:
+        from fake_llm import FakeLLMClient, parse_latency
+        LLM1.client = FakeLLMClient(parse_latency(stub_llm, seed=os.getpid()))
+
+
+def run_worker(listener: socket.socket, session_db: str, stub_llm: str, forked: bool = True) -> None:
+    _setup_worker(session_db, stub_llm)
+    server = WorkerServer(listener.getsockname(), ChatHandler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = listener
+
+    def drain(signum, frame):
+        server.draining = True
+        # shutdown() blocks until serve_forever returns, so it can't run on this thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, drain)
+    # Under the pre-fork parent, Ctrl-C reaches the parent, which forwards SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN if forked else drain)
+    try:
+        server.serve_forever(poll_interval=0.2)
+    finally:
+        server.stop_reading()
+        server.server_close()  # joins request threads
+        LLM1.session_store.backend.close()
+        if LLM1._turn_log is not None:
+            LLM1._turn_log.close()  # os._exit skips atexit; write out what is still queued
+
+
+def serve(host: str, port: int, workers: int, session_db: str, stub_llm: str) -> None:
+    preload(stub_llm)
+    listener = socket.create_server((host, port), backlog=1024)
+    # Every worker selects on the same socket; the ones that lose the accept race must not block in accept()
+    listener.setblocking(False)
+    print(f"serving on http://{host}:{listener.getsockname()[1]} with {workers} workers "
+          f"(sessions in {session_db}{', stubbed LLM ' + stub_llm if stub_llm else ''})", flush=True)
+
+    if workers <= 1 or not hasattr(os, "fork"):
+        run_worker(listener, session_db, stub_llm, forked=False)
+        return
+
+    import gc
+    gc.freeze()  # keep preloaded objects out of GC passes so children don't dirty their pages
+    children = {}
+    stopping = False
+
+    def spawn(slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(listener, session_db, stub_llm)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = slot
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for slot in range(workers):
+        spawn(slot)
+
+    deadline = None
+    while children:
+        if stopping and deadline is None:
+            deadline = time.monotonic() + SHUTDOWN_GRACE
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            if deadline is not None and time.monotonic() > deadline:
+                for pid in children:
+                    os.kill(pid, signal.SIGKILL)
+            time.sleep(0.1)
+            continue
+        slot = children.pop(pid)
+        if not stopping:
+            print(f"worker {pid} exited with status {status}; restarting", file=sys.stderr, flush=True)
+            spawn(slot)
+    listener.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=os.getenv("SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVER_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVER_WORKERS", str(os.cpu_count() or 1))))
+    parser.add_argument("--session-db", default=os.getenv("SESSION_DB", os.path.join(tempfile.gettempdir(), "dexxy_sessions.db")))
+    parser.add_argument("--stub-llm", default="", metavar="LATENCY",
+                        help="answer intents with fake_llm at this latency spec instead of OpenAI (load testing)")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.session_db, args.stub_llm)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+## LLM/session_store.py
+#
+# Per-session dialog state for LLM.py / LLM1.py. Each conversation is keyed by a
+# session ID and holds one compact DialogState record (confirmation flag included).
+# Backends are pluggable: MemorySessionBackend (in-process) or SQLiteSessionBackend
+# (on disk, survives restarts). SessionStore adds idle-timeout and max-sessions eviction.
+
+DEFAULT_SESSION_ID = "default"
+
+
+# Dialog State to handle multi-turn conversations
+class DialogState:
+    __slots__ = ("current_intent", "collected_entities", "waiting_for", "awaiting_confirmation", "last_seen",
+                 "resumed", "context")
+
+    def __init__(self, current_intent: Optional[str] = None, collected_entities: Optional[Dict] = None,
+                 waiting_for: Optional[str] = None, awaiting_confirmation: bool = False,
+                 last_seen: float = 0.0, context=None):
+        self.current_intent = current_intent
+        self.collected_entities = collected_entities if collected_entities is not None else {}
+        self.waiting_for = waiting_for  # entity name we expect next
+        self.awaiting_confirmation = awaiting_confirmation
+        self.last_seen = last_seen
+        self.resumed = False  # set by SessionStore.get for a live session; not persisted
+        self.context = context  # conversation_context.ConversationContext, when LLM1 keeps one
+
+    def reset(self) -> None:
+        self.current_intent = None
+        self.collected_entities = {}
+        self.waiting_for = None
+        self.awaiting_confirmation = False
+
+    def __repr__(self) -> str:
+        return (f"DialogState(current_intent={self.current_intent!r}, collected_entities={self.collected_entities!r}, "
+                f"waiting_for={self.waiting_for!r}, awaiting_confirmation={self.awaiting_confirmation!r})")
+
+
+class MemorySessionBackend:
+    """Sessions in an OrderedDict kept in least-recently-seen order."""
+
+    def __init__(self):
+        self._sessions: "OrderedDict[str, DialogState]" = OrderedDict()
+
+    def load(self, session_id: str) -> Optional[DialogState]:
+        return self._sessions.get(session_id)
+
+    def store(self, session_id: str, state: DialogState) -> None:
+        self._sessions[session_id] = state
+        self._sessions.move_to_end(session_id)
+
+    def delete(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+    def evict_idle(self, older_than: float) -> int:
+        evicted = 0
+        while self._sessions:
+            session_id, state = next(iter(self._sessions.items()))
+            if state.last_seen >= older_than:
+                break
+            del self._sessions[session_id]
+            evicted += 1
+        return evicted
+
+    def evict_oldest(self, count: int) -> int:
+        evicted = 0
+        while self._sessions and evicted < count:
+            self._sessions.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteSessionBackend:
+    """Sessions in a SQLite table so conversations survive a process restart."""
+
+    def __init__(self, path: str = "sessions.db"):
+        import sqlite3  # only paid for when the on-disk backend is used
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, current_intent TEXT, collected_entities TEXT, "
+            "waiting_for TEXT, awaiting_confirmation INTEGER, last_seen REAL, context TEXT)"
+        )
+        if "context" not in {row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")}:
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN context TEXT")  # databases from before it existed
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str) -> Optional[DialogState]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT current_intent, collected_entities, waiting_for, awaiting_confirmation, last_seen, context "
+                "FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        context = None
+        if row[5] is not None:
+            from conversation_context import ConversationContext
+            context = ConversationContext.from_dict(json.loads(row[5]))
+        return DialogState(row[0], json.loads(row[1]), row[2], bool(row[3]), row[4], context)
+
+    def store(self, session_id: str, state: DialogState) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, current_intent, collected_entities, waiting_for, "
+                "awaiting_confirmation, last_seen, context) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (session_id, state.current_intent, json.dumps(state.collected_entities),
+                 state.waiting_for, int(state.awaiting_confirmation), state.last_seen,
+                 json.dumps(state.context.to_dict()) if state.context else None)
+            )
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def evict_idle(self, older_than: float) -> int:
+        with self._lock:
+            return self._conn.execute("DELETE FROM sessions WHERE last_seen < ?", (older_than,)).rowcount
+
+    def evict_oldest(self, count: int) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM sessions WHERE session_id IN "
+                "(SELECT session_id FROM sessions ORDER BY last_seen LIMIT ?)", (count,)
+            ).rowcount
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+class SessionStore:
+    """
+    get() returns the session's DialogState (a fresh one if unknown or idle too long);
+    save() writes it back after the turn and enforces max_sessions.
+    """
+
+    def __init__(self, backend=None, idle_timeout: float = 1800.0, max_sessions: int = 10000,
+                 sweep_interval: float = 60.0):
+        self.backend = backend if backend is not None else MemorySessionBackend()
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.sweep_interval = sweep_interval
+        self.evictions = 0
+        self._next_sweep = time.time() + sweep_interval
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str = DEFAULT_SESSION_ID) -> DialogState:
+        now = time.time()
+        if now >= self._next_sweep:
+            self.sweep(now)
+        state = self.backend.load(session_id)
+        if state is None or now - state.last_seen > self.idle_timeout:
+            state = DialogState()
+        else:
+            state.resumed = True
+        state.last_seen = now
+        return state
+
+    def save(self, session_id: str, state: DialogState) -> None:
+        with self._lock:
+            self.backend.store(session_id, state)
+            overflow = len(self.backend) - self.max_sessions
+            if overflow > 0:
+                self.evictions += self.backend.evict_oldest(overflow)
+
+    def reset(self, session_id: str = DEFAULT_SESSION_ID) -> None:
+        self.backend.delete(session_id)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Drop sessions idle for longer than idle_timeout."""
+        now = time.time() if now is None else now
+        self._next_sweep = now + self.sweep_interval
+        with self._lock:
+            evicted = self.backend.evict_idle(now - self.idle_timeout)
+        self.evictions += evicted
+        return evicted
+
+    def __len__(self) -> int:
+        return len(self.backend)
@@ -0,0 +1,78 @@
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+## LLM/single_flight.py
+#
+# Request coalescing: while a call for a key is in flight, later callers with the same key
+# wait for it and share its result instead of starting their own. Nothing is kept once the
+# call finishes (that is the intent cache's job); this only covers the cache-miss window in
+# which a burst of identical messages would otherwise each reach upstream.
+#   do(key, fn)              threads: the first caller runs fn, the rest block on its Future
+#   do_async(key, make_coro) one event loop: the call runs as its own task that every caller
+#                            awaits through asyncio.shield, so a cancelled caller doesn't
+#                            cancel the others
+# Errors are shared the same way. `copy` is applied to the result handed to each follower,
+# so callers that mutate their result don't see each other's changes.
+
+
+class SingleFlight:
+    def __init__(self, copy: Optional[Callable[[Any], Any]] = None):
+        self.copy = copy
+        self.stats = {"leaders": 0, "coalesced": 0}
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self._tasks: Dict[tuple, Any] = {}
+
+    def _follow(self, result: Any) -> Any:
+        return self.copy(result) if self.copy is not None else result
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.stats["leaders"] += 1
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            return self._follow(future.result())
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key)
+            future.set_exception(e)
+            raise
+        self._finish(key)
+        future.set_result(result)
+        return result
+
+    def _finish(self, key: Hashable) -> None:
+        with self._lock:
+            del self._calls[key]
+
+    async def do_async(self, key: Hashable, make_coro: Callable[[], Awaitable[Any]]) -> Any:
+        import asyncio
+
+        # Tasks belong to one loop; callers on another loop get their own flight
+        loop_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            task = self._tasks.get(loop_key)
+            leader = task is None
+            if leader:
+                task = self._tasks[loop_key] = asyncio.ensure_future(make_coro())
+                task.add_done_callback(lambda _: self._finish_task(loop_key))
+                self.stats["leaders"] += 1
+            else:
+                self.stats["coalesced"] += 1
+        result = await asyncio.shield(task)
+        return result if leader else self._follow(result)
+
+    def _finish_task(self, loop_key: tuple) -> None:
+        with self._lock:
+            self._tasks.pop(loop_key, None)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, in_flight=len(self._calls) + len(self._tasks))
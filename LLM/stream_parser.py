@@ -0,0 +1,110 @@
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+## LLM/stream_parser.py
+#
+# Incremental JSON reader for streamed completions. feed() takes text as it
+# arrives and returns every scalar member that became complete, as
+# (path, value) pairs, e.g. (("intent",), "join_pool") or
+# (("entities", "pool_id"), "12345"), without waiting for the closing brace.
+
+_NUMBER_RUN = re.compile(r'[-+0-9.eE]+')
+_KEYWORDS = (("true", True), ("false", False), ("null", None))
+_WHITESPACE = " \t\r\n"
+
+
+class _Frame:
+    __slots__ = ("is_object", "key", "expecting_key")
+
+    def __init__(self, is_object: bool):
+        self.is_object = is_object
+        self.key: Any = None if is_object else 0
+        self.expecting_key = is_object
+
+
+class StreamingJSONParser:
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.done = False
+        self._stack: List[_Frame] = []
+
+    def feed(self, text: str) -> List[Tuple[tuple, Any]]:
+        self.buffer += text
+        events = []
+        while not self.done:
+            token = self._next_token()
+            if token is None:
+                break
+            kind, value = token
+            top = self._stack[-1] if self._stack else None
+            if kind in "{[":
+                self._stack.append(_Frame(kind == "{"))
+            elif kind in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if not self._stack:
+                    self.done = True
+            elif kind == ",":
+                if top is not None:
+                    if top.is_object:
+                        top.expecting_key = True
+                    else:
+                        top.key += 1
+            elif kind == "value":
+                if top is not None and top.is_object and top.expecting_key:
+                    top.key = value
+                    top.expecting_key = False
+                elif top is not None:
+                    events.append((tuple(frame.key for frame in self._stack), value))
+            # ':' needs no bookkeeping
+        return events
+
+    def _next_token(self) -> Optional[Tuple[str, Any]]:
+        buffer, pos = self.buffer, self.pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if not self._stack:
+                # Skip anything the model put before the object, e.g. a ```json fence
+                start = buffer.find("{", pos)
+                pos = start if start >= 0 else len(buffer)
+            self.pos = pos
+            if pos >= len(buffer):
+                return None
+
+            ch = buffer[pos]
+            if ch in "{}[]:,":
+                self.pos = pos + 1
+                return ch, None
+            if ch == '"':
+                end = pos + 1
+                while True:
+                    end = buffer.find('"', end)
+                    if end < 0:
+                        return None  # string still streaming
+                    backslashes = 0
+                    while buffer[end - 1 - backslashes] == "\\":
+                        backslashes += 1
+                    if backslashes % 2 == 0:
+                        break
+                    end += 1
+                self.pos = end + 1
+                return "value", json.loads(buffer[pos:end + 1])
+            if ch in "-0123456789":
+                match = _NUMBER_RUN.match(buffer, pos)
+                if match.end() == len(buffer):
+                    return None  # number may continue in the next chunk
+                pos = self.pos = match.end()
+                try:
+                    return "value", json.loads(match.group(0))
+                except ValueError:
+                    continue
+            for word, value in _KEYWORDS:
+                if buffer.startswith(word, pos):
+                    self.pos = pos + len(word)
+                    return "value", value
+                if len(buffer) - pos < len(word) and word.startswith(buffer[pos:]):
+                    return None  # keyword split across chunks
+            pos += 1  # not valid JSON here; skip it
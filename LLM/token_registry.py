@@ -0,0 +1,209 @@
+import json
+import os
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+## LLM/token_registry.py
+#
+# Known tokens for local entity resolution, loaded from token_registry.json:
+#   {"reserved": [words that are never symbols, e.g. "APY"],
+#    "tokens": [{"symbol": "USDC", "name": "USD Coin", "aliases": [...], "case_sensitive": false}]}
+# resolve(word) maps one word to a canonical symbol:
+#   - exact: a dict keyed by lowercased symbol, name and aliases ("apt", "Aptos" -> APT);
+#     the symbol of a case_sensitive token that is also an English word (LINK, CAKE) only
+#     matches when written in capitals; its name and aliases match in any case
+#   - fuzzy: a BK-tree (Levenshtein) over the same keys finds typos ("etherium" -> ETH);
+#     a swapped pair of letters ("USCD" -> USDC) is one edit too, found by looking up each
+#     adjacent swap in the exact index. Only all-caps words of 5+ letters and lowercase or
+#     capitalized words of 6+ letters get the BK-tree; all-caps words of 4 letters only get
+#     the swap lookup, since most short English words in capitals are one substitution
+#     from some ticker ("WITH" -> WETH, "HAVE" -> AAVE). A tie between two tokens resolves
+#     to nothing. English words are often one edit from a token ("either" -> ether), so
+#     callers only ask for fuzzy matches where a token is expected (fuzzy=True): in a
+#     pool's token pair or a slot-filling answer, see entity_extractor
+# Matching is per word, so multi-word names need a one-word alias ("usdcoin").
+# Fuzzy results are memoized; a warm lookup is a dict hit.
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "token_registry.json")
+
+MEMO_SIZE = 4096
+
+
+class Token(NamedTuple):
+    symbol: str
+    name: str
+    case_sensitive: bool
+
+
+def levenshtein(a: str, b: str, limit: int = 1 << 30) -> int:
+    """Edit distance, or any value above `limit` once it is certain to exceed it."""
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        left = lowest = i
+        for j, cb in enumerate(b):
+            best = previous[j] + (ca != cb)
+            if left + 1 < best:
+                best = left + 1
+            if previous[j + 1] + 1 < best:
+                best = previous[j + 1] + 1
+            current.append(best)
+            left = best
+            if best < lowest:
+                lowest = best
+        if lowest > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _swaps(word: str) -> Iterable[str]:
+    for i in range(len(word) - 1):
+        if word[i] != word[i + 1]:
+            yield word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree: metric-space index that prunes subtrees by the triangle inequality.
+    distance(a, b, limit) may stop early once the result exceeds limit.
+    """
+
+    def __init__(self, distance: Callable[[str, str, int], int] = levenshtein):
+        self.distance = distance
+        self._root: Optional[list] = None  # [key, value, {edge distance: child}]
+        self.size = 0
+
+    def add(self, key: str, value) -> None:
+        if self._root is None:
+            self._root = [key, value, {}]
+            self.size = 1
+            return
+        node = self._root
+        while True:
+            d = self.distance(key, node[0])
+            if d == 0:
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [key, value, {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, key: str, radius: int) -> List[Tuple[int, str, object]]:
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            children = node[2]
+            # Past radius + the longest edge no child can be in range, so the exact value is moot
+            d = self.distance(key, node[0], radius + max(children, default=0))
+            if d <= radius:
+                found.append((d, node[0], node[1]))
+            for edge, child in children.items():
+                if d - radius <= edge <= d + radius:
+                    stack.append(child)
+        return found
+
+
+class TokenRegistry:
+    def __init__(self, tokens: Iterable[Token], aliases: Optional[Dict[str, str]] = None,
+                 reserved: Iterable[str] = ()):
+        self.tokens: Dict[str, Token] = {}
+        self._exact: Dict[str, Tuple[Token, bool]] = {}  # key -> (token, capitals only)
+        self._fuzzy = BKTree()
+        self.reserved = {word.lower() for word in reserved}
+        for token in tokens:
+            self.tokens[token.symbol] = token
+            self._index(token.symbol.lower(), token, token.case_sensitive)
+            self._index(token.name.lower(), token, False)
+        for alias, symbol in (aliases or {}).items():
+            self._index(alias.lower(), self.tokens[symbol], False)
+        self._memo: Dict[str, Optional[str]] = {}
+        self.stats = {"exact": 0, "fuzzy": 0, "misses": 0}
+
+    def _index(self, key: str, token: Token, caps_only: bool) -> None:
+        if key in self._exact:
+            return
+        self._exact[key] = (token, caps_only)
+        if " " not in key:
+            self._fuzzy.add(key, (token, caps_only))
+
+    def resolve(self, word: str, fuzzy: bool = True) -> Optional[str]:
+        """Canonical symbol for one word, or None; fuzzy=False only takes exact matches."""
+        if not fuzzy:
+            return self._exact_symbol(word)
+        symbol = self._memo.get(word, self)
+        if symbol is not self:
+            return symbol
+        symbol = self._resolve(word)
+        if len(self._memo) >= MEMO_SIZE:
+            self._memo.clear()
+        self._memo[word] = symbol
+        return symbol
+
+    def _exact_symbol(self, word: str) -> Optional[str]:
+        key = word.lower()
+        if key in self.reserved:
+            return None
+        entry = self._exact.get(key)
+        if entry is None:
+            return None
+        token, caps_only = entry
+        return None if caps_only and not word.isupper() else token.symbol
+
+    def _resolve(self, word: str) -> Optional[str]:
+        key = word.lower()
+        if key in self.reserved:
+            return None
+        if key in self._exact:
+            symbol = self._exact_symbol(word)
+            if symbol is not None:
+                self.stats["exact"] += 1
+            return symbol
+        if word.isupper():
+            max_edits = 1 if len(word) >= 5 else 0 if len(word) == 4 else None
+        elif (word.islower() or word.istitle()) and len(word) >= 6:
+            max_edits = 1 if len(word) < 9 else 2
+        else:
+            max_edits = None
+        if max_edits is None:
+            self.stats["misses"] += 1
+            return None
+        symbol = self._closest(key, max_edits, word.isupper())
+        self.stats["fuzzy" if symbol else "misses"] += 1
+        return symbol
+
+    def _closest(self, key: str, max_edits: int, caps: bool) -> Optional[str]:
+        # max_edits 0: adjacent swaps only
+        candidates = [(d, entry) for d, _, entry in self._fuzzy.search(key, max_edits)] if max_edits else []
+        candidates.extend((1, self._exact[swapped]) for swapped in _swaps(key) if swapped in self._exact)
+        best, symbols = max(max_edits, 1) + 1, set()
+        for d, (token, caps_only) in candidates:
+            if caps_only and not caps:
+                continue
+            if d < best:
+                best, symbols = d, {token.symbol}
+            elif d == best:
+                symbols.add(token.symbol)
+        return symbols.pop() if len(symbols) == 1 else None
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+
+def load_registry(path: str = DEFAULT_PATH) -> TokenRegistry:
+    with open(path) as f:
+        data = json.load(f)
+    tokens, aliases = [], {}
+    for entry in data["tokens"]:
+        tokens.append(Token(entry["symbol"], entry.get("name", entry["symbol"]), bool(entry.get("case_sensitive"))))
+        for alias in entry.get("aliases", ()):
+            aliases[alias] = entry["symbol"]
+    return TokenRegistry(tokens, aliases, data.get("reserved", ()))
@@ -0,0 +1,126 @@
+import json
+import mmap
+import os
+import queue
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+## LLM/turn_log.py
+#
+# Append-only JSONL log of dialog turns.
+#   TurnLogWriter.append() only enqueues; a background thread serializes records in batches,
+#   writes each batch with one write() and rotates the file by size (path, path.1, ... path.N).
+#   If the queue is full the record is dropped and counted, so a slow disk never stalls a turn.
+#   iter_records() memory-maps each file and walks it line by line, so millions of records
+#   stream without being loaded at once; a torn last line (writer mid-batch) is skipped.
+
+
+class TurnLogWriter:
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024, backups: int = 5,
+                 batch_size: int = 512, flush_interval: float = 0.2, queue_size: int = 100_000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue(maxsize=queue_size)
+        self._file = open(path, "ab")
+        self._size = self._file.tell()
+        self._thread = threading.Thread(target=self._run, name="turn-log", daemon=True)
+        self._thread.start()
+
+    def append(self, record: Dict) -> None:
+        """
+        Never blocks: when queue_size records are already waiting, the record is dropped
+        silently; only stats()["dropped"] shows it. Size the queue for the peak burst.
+        """
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        """Writes everything queued so far, then stops the thread."""
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            batch: List[dict] = [] if first is None else [first]
+            closing = first is None
+            deadline = time.monotonic() + self.flush_interval
+            while not closing and len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    record = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    closing = True
+                else:
+                    batch.append(record)
+            if batch:
+                self._write(b"".join(json.dumps(record, separators=(",", ":")).encode() + b"\n" for record in batch),
+                            len(batch))
+            if closing:
+                return
+
+    def _write(self, data: bytes, count: int) -> None:
+        if self._size and self._size + len(data) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+        self.written += count
+
+    def _rotate(self) -> None:
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "ab")
+        self._size = 0
+        self.rotations += 1
+
+    def stats(self) -> Dict:
+        return {"written": self.written, "dropped": self.dropped, "queued": self._queue.qsize(),
+                "rotations": self.rotations}
+
+
+def log_files(path: str) -> List[str]:
+    """The log and its rotated backups, oldest first."""
+    backups = []
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        backups.append(f"{path}.{i}")
+        i += 1
+    return backups[::-1] + ([path] if os.path.exists(path) else [])
+
+
+def iter_records(path: str) -> Iterator[Dict]:
+    for name in log_files(path):
+        with open(name, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                continue
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for line in iter(mm.readline, b""):
+                    if line.endswith(b"\n") and len(line) > 1:
+                        yield json.loads(line)
+
+
+def conversations_from_log(records: Iterable[Dict]) -> List[Dict]:
+    """Groups logged turns by session into the {"id", "turns"} shape bench_replay.py reads."""
+    sessions: Dict[str, List[str]] = {}
+    for record in records:
+        sessions.setdefault(record["session_id"], []).append(record["input"])
+    return [{"id": session_id, "turns": turns} for session_id, turns in sessions.items()]